@@ -10,6 +10,12 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 from fastapi import WebSocket, WebSocketDisconnect
 
+try:
+	import orjson
+	ORJSON_AVAILABLE = True
+except ImportError:
+	ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,18 +70,21 @@ class WebSocketMessage:
 	
 	def to_json(self) -> str:
 		"""Convert message to JSON."""
-		return json.dumps({
+		payload = {
 			"type": self.type.value,
 			"data": self.data,
 			"timestamp": self.timestamp.isoformat(),
 			"message_id": self.message_id,
 			"correlation_id": self.correlation_id
-		})
+		}
+		if ORJSON_AVAILABLE:
+			return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode()
+		return json.dumps(payload)
 	
 	@classmethod
 	def from_json(cls, json_str: str) -> "WebSocketMessage":
 		"""Create message from JSON."""
-		msg_dict = json.loads(json_str)
+		msg_dict = orjson.loads(json_str) if ORJSON_AVAILABLE else json.loads(json_str)
 		return cls(
 			type=MessageType(msg_dict["type"]),
 			data=msg_dict["data"],
@@ -352,7 +361,8 @@ class WebSocketManager:
 	async def send_message(
 		self,
 		connection_id: str,
-		message: WebSocketMessage
+		message: WebSocketMessage,
+		text: Optional[str] = None
 	) -> bool:
 		"""
 		Send a message to a specific connection.
@@ -360,6 +370,7 @@ class WebSocketManager:
 		Args:
 			connection_id: Connection identifier
 			message: Message to send
+			text: Pre-serialized message, reused across broadcast recipients
 			
 		Returns:
 			True if message sent successfully
@@ -370,7 +381,7 @@ class WebSocketManager:
 		connection = self.connections[connection_id]
 		
 		try:
-			await connection.websocket.send_text(message.to_json())
+			await connection.websocket.send_text(text if text is not None else message.to_json())
 			connection.last_activity = datetime.utcnow()
 			return True
 		except Exception as e:
@@ -393,15 +404,13 @@ class WebSocketManager:
 		if channel not in self.channel_connections:
 			return
 		
-		# Send to all connections in channel
-		disconnected = []
-		for conn_id in self.channel_connections[channel]:
-			if not await self.send_message(conn_id, message):
-				disconnected.append(conn_id)
-		
-		# Clean up disconnected connections
-		for conn_id in disconnected:
-			await self.disconnect(conn_id, "Broadcast error")
+		# Serialize once; send_message disconnects failed connections, which
+		# mutates the channel set, so iterate over a snapshot
+		text = message.to_json()
+		await asyncio.gather(*(
+			self.send_message(conn_id, message, text)
+			for conn_id in list(self.channel_connections[channel])
+		))
 		
 		logger.debug(f"Broadcast to {channel}: {message.type.value}")
 	
@@ -620,6 +629,8 @@ class WebSocketManager:
 					timestamp=now
 				)
 				
+				ping_text = ping_message.to_json()
+				
 				disconnected = []
 				for conn_id, connection in list(self.connections.items()):
 					if connection.is_authenticated:
@@ -628,7 +639,7 @@ class WebSocketManager:
 							logger.warning(f"Removing stale WebSocket: {conn_id}")
 							disconnected.append(conn_id)
 						else:
-							await self.send_message(conn_id, ping_message)
+							await self.send_message(conn_id, ping_message, ping_text)
 				
 				# Clean up stale connections
 				for conn_id in disconnected:
@@ -1,23 +1,37 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 # Phoenix/OpenTelemetry observability - OpenAI client is auto-instrumented
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, RateLimitError
 try:
     from opentelemetry import trace
     TRACING_AVAILABLE = True
 except ImportError:
     TRACING_AVAILABLE = False
+try:
+    import hnswlib
+    HNSW_AVAILABLE = True
+except ImportError:
+    HNSW_AVAILABLE = False
 import os
 from dotenv import load_dotenv
 import asyncio
+import contextlib
+import functools
+from collections import OrderedDict
 from typing import Optional
 import httpx
 import logging
+import logging.handlers
+import queue
+import atexit
 import time
-import json
+import orjson
 import hashlib
+import heapq
+import math
+import random
 import numpy as np
 
 # Import firewall services for security checks
@@ -30,8 +44,14 @@ evaluation_path = os.path.join(os.path.dirname(__file__), '../../services/Evalua
 if evaluation_path not in sys.path:
     sys.path.append(evaluation_path)
     
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging - records are queued and written by a listener thread so request handlers never block on stderr
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 try:
@@ -40,6 +60,7 @@ try:
     from goal_accuracy import evaluate_goal_accuracy
     from hallucination import evaluate_hallucination
     from summarization import evaluate_summarization
+    from comprehensive import evaluate_comprehensive
     logger.info("Evaluation services imported successfully")
 except ImportError as e:
     logger.warning(f"Could not import evaluation services: {e}")
@@ -54,6 +75,9 @@ except ImportError as e:
         return {"score": 0.0, "explanation": "Evaluation service unavailable"}
     async def evaluate_summarization(query: str, answer: str) -> dict:
         return {"score": 0.0, "explanation": "Evaluation service unavailable"}
+    async def evaluate_comprehensive(query: str, answer: str) -> dict:
+        unavailable = {"score": 0.0, "explanation": "Evaluation service unavailable"}
+        return {metric: dict(unavailable) for metric in ("correctness", "relevance", "goal_accuracy", "hallucination", "summarization")}
 
 # Import monitoring middleware - conditional to avoid import issues
 monitoring_middleware = None
@@ -98,8 +122,44 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-# Initialize OpenAI client - Phoenix OpenTelemetry instrumentation handles tracing automatically  
-client = AsyncOpenAI(api_key=openai_api_key)
+# One HTTP/2 keep-alive pool for every OpenAI call in the process; concurrent requests multiplex over it
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0, connect=5.0)
+)
+
+class OpenAIClientPool:
+    """Spread completions across API keys, steering traffic toward fast keys that aren't being throttled"""
+    
+    def __init__(self, api_keys: list, http_client: httpx.AsyncClient):
+        self.clients = [AsyncOpenAI(api_key=key, http_client=http_client) for key in api_keys]
+        self.stats = [{"ewma_latency": 0.0, "weight": 1.0} for _ in self.clients]
+    
+    def pick(self) -> int:
+        """Choose a client index, weighted by health and inversely by recent latency"""
+        if len(self.clients) == 1:
+            return 0
+        weights = [stat["weight"] / (1.0 + stat["ewma_latency"]) for stat in self.stats]
+        return random.choices(range(len(self.clients)), weights=weights)[0]
+    
+    def record(self, index: int, latency: float, error: Optional[Exception] = None):
+        """Fold one call's outcome into the key's sliding estimate"""
+        stat = self.stats[index]
+        stat["ewma_latency"] = 0.9 * stat["ewma_latency"] + 0.1 * latency
+        if error is None:
+            stat["weight"] = min(stat["weight"] * 1.05, 1.0)
+        elif isinstance(error, (RateLimitError, APIConnectionError)) or (
+            isinstance(error, APIStatusError) and error.status_code >= 500
+        ):
+            stat["weight"] = max(stat["weight"] / 2, 0.01)
+
+# OPENAI_API_KEYS (comma-separated) enables balancing across keys; otherwise the single OPENAI_API_KEY is used
+openai_api_keys = [key.strip() for key in os.getenv("OPENAI_API_KEYS", "").split(",") if key.strip()] or [openai_api_key]
+
+# Initialize OpenAI clients - Phoenix OpenTelemetry instrumentation handles tracing automatically  
+client_pool = OpenAIClientPool(openai_api_keys, http_client)
+client = client_pool.clients[0]
 
 # Cache service configuration
 ENABLE_CACHING = os.getenv("ENABLE_CACHING", "true").lower() == "true"
@@ -107,14 +167,67 @@ LLM_CACHE_REDIS_URL = os.getenv("REDIS_LLM_CACHE_URL", "redis://localhost:6379/1
 
 # Firewall service configuration
 ENABLE_FIREWALL = os.getenv("ENABLE_FIREWALL", "true").lower() == "true"
+FIREWALL_BLOCKED_ANSWER = "Request blocked by security firewall due to sensitive content detection."
+
+class EmbeddingBatcher:
+    """Coalesce concurrent encode calls into one batched, normalized forward pass"""
+    
+    def __init__(self, model, max_batch: int = 32, max_wait: float = 0.005):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def encode(self, text: str) -> np.ndarray:
+        """Return the unit embedding for text once its batch has been encoded"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                embeddings = await asyncio.to_thread(
+                    self.model.encode,
+                    [text for text, _ in batch],
+                    batch_size=self.max_batch,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
 
 # Initialize dedicated LLM cache (completely separate from monitoring cache)
 llm_cache_client = None
 if ENABLE_CACHING:
     # Create dedicated Redis client for LLM cache only
     import redis
+    import redis.asyncio
     from urllib.parse import urlparse
-    import json
     import hashlib
     from sentence_transformers import SentenceTransformer
     
@@ -124,7 +237,7 @@ if ENABLE_CACHING:
     redis_db = int(parsed_url.path.lstrip('/')) if parsed_url.path else 1
     
     try:
-        llm_cache_client = redis.Redis(
+        redis_options = dict(
             host=redis_host,
             port=redis_port,
             db=redis_db,
@@ -134,12 +247,21 @@ if ENABLE_CACHING:
             health_check_interval=30,
         )
         
-        # Test connection
-        llm_cache_client.ping()
+        # Test connection once at import with a throwaway sync client
+        redis.Redis(**redis_options).ping()
+        
+        # Request-path cache I/O goes through the asyncio client so it never blocks the event loop
+        llm_cache_client = redis.asyncio.Redis(**redis_options)
         logger.info(f"LLM cache connected to Redis DB {redis_db} at {redis_host}:{redis_port}")
         
-        # Initialize sentence transformer for semantic similarity
-        sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Initialize sentence transformer for semantic similarity, in fp16 on GPU when available
+        import torch
+        embedding_device = os.getenv("EMBEDDING_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+        sentence_model = SentenceTransformer('all-MiniLM-L6-v2', device=embedding_device)
+        if embedding_device.startswith("cuda"):
+            sentence_model.half()
+        embedding_batcher = EmbeddingBatcher(sentence_model)
+        logger.info(f"Sentence model loaded on {embedding_device}")
         
     except Exception as e:
         logger.warning(f"Failed to initialize LLM cache: {e}")
@@ -214,100 +336,568 @@ class CacheConfigUpdate(BaseModel):
 app = FastAPI(
     title="LLM Response API",
     description="A minimal FastAPI app that returns LLM responses for user queries",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
-# Add CORS middleware for local development
+# Add CORS middleware for local development. Credentialed calls stay allowed as before; with the default
+# "*" Starlette echoes the request origin, so set CORS_ALLOWED_ORIGINS to an explicit list outside development.
+CORS_ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=CORS_ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# System instruction
+# System instruction - always sent first and byte-for-byte stable so the provider's prompt-prefix cache can hit;
+# the user query is appended after it
 SYSTEM_INSTRUCTION = "You are a helpful assistant. Provide clear, concise, and accurate responses to user questions."
+SYSTEM_PREFIX_HASH = hashlib.sha256(SYSTEM_INSTRUCTION.encode()).hexdigest()[:16]
+
+# Embeddings are stored int8-quantized: a float16 scale followed by one signed byte per dimension
+def _quantize_embedding(embedding) -> bytes:
+    """Pack an embedding as int8 components with its float16 scale factor"""
+    scale = 127.0 / max(float(np.max(np.abs(embedding))), 1e-12)
+    quantized = np.round(embedding * scale).astype(np.int8)
+    return np.float16(scale).tobytes() + quantized.tobytes()
+
+def _unpack_embedding(blob: bytes):
+    """Return (int8 components, scale) from a packed embedding"""
+    return np.frombuffer(blob, dtype=np.int8, offset=2), float(np.frombuffer(blob[:2], dtype=np.float16)[0])
+
+async def _embed_norm(query: str) -> np.ndarray:
+    """Encode a query to a unit vector so cosine similarity reduces to a dot product"""
+    return await embedding_batcher.encode(query)
+
+def _quantized_similarity(query_blob: bytes, candidate_blobs: list) -> np.ndarray:
+    """Cosine similarity of one packed unit embedding against many, using an int32 dot product"""
+    query_q, query_scale = _unpack_embedding(query_blob)
+    candidates = [_unpack_embedding(blob) for blob in candidate_blobs]
+    matrix = np.stack([q for q, _ in candidates]).astype(np.int32)
+    scales = np.array([scale for _, scale in candidates], dtype=np.float32)
+    
+    return (matrix @ query_q.astype(np.int32)) / (scales * query_scale)
+
+# Sessions below this many cached queries are searched by brute force; an HNSW graph only pays off beyond it
+SEMANTIC_INDEX_MIN_ENTRIES = int(os.getenv("SEMANTIC_INDEX_MIN_ENTRIES", "2000"))
+
+class SemanticIndex:
+    """Per-session nearest-neighbour index over unit query embeddings, labelled by cache key suffix.
+    
+    Entries are kept in a flat matrix searched with one matrix-vector product until the session
+    reaches SEMANTIC_INDEX_MIN_ENTRIES, then moved into an HNSW graph. Each entry carries the expiry
+    of its Redis keys and is dropped once that passes.
+    """
+    
+    def __init__(self, dim: int, min_entries: int = SEMANTIC_INDEX_MIN_ENTRIES):
+        self.dim = dim
+        self.min_entries = min_entries
+        self.index = None  # hnswlib.Index once promoted; the flat matrix is dropped then
+        self._matrix = np.zeros((64, dim), dtype=np.float32)  # row i holds label i while flat
+        self._next_label = 0
+        self._suffixes = {}  # label -> key suffix
+        self._labels = {}    # key suffix -> label
+        self._expiry = {}    # key suffix -> unix time its Redis keys expire
+        self._expiry_heap = []  # (expires_at, key suffix), soonest first; stale pairs are skipped
+    
+    def __len__(self) -> int:
+        return len(self._labels)
+    
+    def add(self, embedding: np.ndarray, key_suffix: str, expires_at: float = math.inf):
+        """Insert an embedding, or refresh the expiry of a key suffix that is already indexed"""
+        self._expire()
+        if key_suffix not in self._labels:
+            vector = embedding.reshape(1, -1).astype(np.float32)
+            if self.index is None:
+                label = len(self._labels)
+                if label == len(self._matrix):
+                    self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                self._matrix[label] = vector
+            else:
+                label = self._next_label
+                self._next_label += 1
+                if len(self._labels) >= self.index.get_max_elements():
+                    self.index.resize_index(self.index.get_max_elements() * 2)
+                self.index.add_items(vector, [label], replace_deleted=True)
+            self._suffixes[label] = key_suffix
+            self._labels[key_suffix] = label
+        self._expiry[key_suffix] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, key_suffix))
+        if self.index is None and HNSW_AVAILABLE and len(self._labels) >= self.min_entries:
+            self._promote()
+    
+    def _promote(self):
+        count = len(self._labels)
+        self.index = hnswlib.Index(space="ip", dim=self.dim)
+        self.index.init_index(max_elements=count * 2, ef_construction=200, M=16, allow_replace_deleted=True)
+        self.index.set_ef(64)
+        self.index.add_items(self._matrix[:count], np.arange(count))
+        self._next_label = count
+        self._matrix = None
+    
+    def remove(self, key_suffix: str):
+        """Drop an entry whose cache keys have expired"""
+        label = self._labels.pop(key_suffix, None)
+        if label is None:
+            return
+        del self._suffixes[label]
+        self._expiry.pop(key_suffix, None)
+        if self.index is not None:
+            self.index.mark_deleted(label)
+            return
+        # Keep the flat rows contiguous by moving the last one into the hole
+        last = len(self._labels)
+        if label != last:
+            moved = self._suffixes.pop(last)
+            self._matrix[label] = self._matrix[last]
+            self._suffixes[label] = moved
+            self._labels[moved] = label
+    
+    def _expire(self):
+        now = time.time()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, key_suffix = heapq.heappop(heap)
+            if self._expiry.get(key_suffix) == expires_at:
+                self.remove(key_suffix)
+    
+    def nearest(self, embedding: np.ndarray) -> Optional[tuple]:
+        """Return (key suffix, cosine similarity) of the closest live entry"""
+        self._expire()
+        if not self._labels:
+            return None
+        vector = embedding.reshape(-1).astype(np.float32)
+        if self.index is None:
+            scores = self._matrix[:len(self._labels)] @ vector
+            best = int(np.argmax(scores))
+            return self._suffixes[best], float(scores[best])
+        labels, distances = self.index.knn_query(vector.reshape(1, -1), k=1)
+        return self._suffixes[int(labels[0, 0])], 1.0 - float(distances[0, 0])
+
+# Session ID -> SemanticIndex, least recently used first. Indexes start small and grow on demand;
+# an evicted session is rebuilt from Redis on its next lookup.
+SEMANTIC_INDEX_MAX_SESSIONS = int(os.getenv("SEMANTIC_INDEX_MAX_SESSIONS", "1000"))
+_semantic_indexes: OrderedDict = OrderedDict()
+# Session ID -> task bootstrapping its index, shared by concurrent first lookups
+_index_builds: dict = {}
+
+async def _build_semantic_index(session_id: str, dim: int) -> SemanticIndex:
+    """Load a session's cached embeddings from Redis into a new index"""
+    emb_keys = [key async for key in llm_cache_client.scan_iter(match=f"llm_emb:{session_id}:*", count=500)]
+    index = SemanticIndex(dim)
+    if not emb_keys:
+        return index
+    pipe = llm_cache_client.pipeline(transaction=False)
+    pipe.mget(emb_keys)
+    for key in emb_keys:
+        pipe.pttl(key)
+    blobs, *ttls_ms = await pipe.execute()
+    now = time.time()
+    for key, blob, ttl_ms in zip(emb_keys, blobs, ttls_ms):
+        if blob:
+            quantized, scale = _unpack_embedding(blob)
+            expires_at = now + ttl_ms / 1000 if ttl_ms >= 0 else math.inf
+            index.add(quantized.astype(np.float32) / scale, key.decode()[len("llm_emb:"):], expires_at)
+    return index
+
+def _finish_index_build(session_id: str, build: asyncio.Task):
+    """Publish a fully bootstrapped index, evicting the least recently used session when over the cap"""
+    del _index_builds[session_id]
+    if build.cancelled() or build.exception() is not None:
+        return
+    _semantic_indexes[session_id] = build.result()
+    while len(_semantic_indexes) > SEMANTIC_INDEX_MAX_SESSIONS:
+        _semantic_indexes.popitem(last=False)
+
+async def _ann_lookup(session_id: str, query_embedding: np.ndarray) -> Optional[tuple]:
+    """Nearest cached query for a session via its HNSW index"""
+    index = _semantic_indexes.get(session_id)
+    if index is not None:
+        _semantic_indexes.move_to_end(session_id)
+    else:
+        # The index is only published once bootstrapped, so no lookup searches a half-filled one
+        build = _index_builds.get(session_id)
+        if build is None:
+            build = _index_builds[session_id] = asyncio.create_task(_build_semantic_index(session_id, len(query_embedding)))
+            build.add_done_callback(functools.partial(_finish_index_build, session_id))
+        index = await asyncio.shield(build)
+    return index.nearest(query_embedding)
+
+async def _scan_lookup(session_id: str, query_embedding: np.ndarray) -> Optional[tuple]:
+    """Nearest cached query for a session by brute-force over a capped set of keys"""
+    # Limit to 10 keys for performance when no ANN index is available
+    emb_keys = []
+    async for key in llm_cache_client.scan_iter(match=f"llm_emb:{session_id}:*", count=100):
+        emb_keys.append(key)
+        if len(emb_keys) == 10:
+            break
+    candidates = [(key, blob) for key, blob in zip(emb_keys, await llm_cache_client.mget(emb_keys) if emb_keys else []) if blob]
+    if not candidates:
+        return None
+    
+    similarities = _quantized_similarity(_quantize_embedding(query_embedding), [blob for _, blob in candidates])
+    best = int(np.argmax(similarities))
+    return candidates[best][0].decode()[len("llm_emb:"):], float(similarities[best])
 
 # LLM Cache integration - completely separate from monitoring cache
-async def get_cached_response(query: str, session_id: str = "default") -> Optional[dict]:
+# Each entry is split across three keys sharing the {session_id}:{md5(query)} suffix:
+#   llm_resp:  the answer as raw UTF-8 bytes, so hits never parse JSON
+#   llm_meta:  small orjson blob with the original query and timestamp
+#   llm_emb:   the quantized query embedding used for semantic lookup
+def _query_hash(query: str) -> str:
+    """Hash a query once so the cache read and write paths can share the key"""
+    return hashlib.md5(query.encode()).hexdigest()
+
+async def get_cached_response(query: str, session_id: str = "default", query_hash: Optional[str] = None) -> Optional[dict]:
     """Try to get response from dedicated LLM cache"""
     if not ENABLE_CACHING or not llm_cache_client:
         return None
         
     try:
         # Create cache key from query
-        cache_key = f"llm_cache:{session_id}:{hashlib.md5(query.encode()).hexdigest()}"
+        cache_key = f"llm_resp:{session_id}:{query_hash or _query_hash(query)}"
         
         # Check for exact match first
-        cached_data = llm_cache_client.get(cache_key)
-        if cached_data:
-            result = json.loads(cached_data.decode('utf-8'))
+        answer_bytes = await llm_cache_client.get(cache_key)
+        if answer_bytes is not None:
             logger.info(f"LLM cache hit (exact): {cache_key}")
             return {
-                "response": result["response"],
+                "response": answer_bytes.decode(),
                 "from_cache": True,
                 "similarity": 1.0,
                 "session_id": session_id,
                 "cache_key": cache_key
             }
         
-        # Semantic similarity search (simplified)
-        if 'sentence_model' in globals():
-            query_embedding = sentence_model.encode(query)
+        # Semantic similarity search: HNSW index when available, capped scan otherwise
+        if 'embedding_batcher' in globals():
+            query_embedding = await _embed_norm(query)
+            if HNSW_AVAILABLE:
+                match = await _ann_lookup(session_id, query_embedding)
+            else:
+                match = await _scan_lookup(session_id, query_embedding)
             
-            # Search for similar queries in cache (simplified approach)
-            # For production, you'd want a more sophisticated vector search
-            pattern = f"llm_cache:{session_id}:*"
-            cache_keys = llm_cache_client.keys(pattern)
-            
-            for key in cache_keys[:10]:  # Limit to 10 most recent for performance
-                try:
-                    cached_data = llm_cache_client.get(key)
-                    if cached_data:
-                        cached_result = json.loads(cached_data.decode('utf-8'))
-                        if 'original_query' in cached_result:
-                            cached_embedding = sentence_model.encode(cached_result['original_query'])
-                            similarity = float(np.dot(query_embedding, cached_embedding) / 
-                                             (np.linalg.norm(query_embedding) * np.linalg.norm(cached_embedding)))
-                            
-                            if similarity >= 0.75:  # 75% similarity threshold
-                                logger.info(f"LLM cache hit (semantic): similarity={similarity:.3f}")
-                                return {
-                                    "response": cached_result["response"],
-                                    "from_cache": True,
-                                    "similarity": similarity,
-                                    "session_id": session_id,
-                                    "cache_key": key.decode('utf-8') if isinstance(key, bytes) else key
-                                }
-                except Exception as e:
-                    logger.debug(f"Error checking cached item {key}: {e}")
-                    continue
+            if match and match[1] >= 0.75:  # 75% similarity threshold
+                key_suffix, similarity = match
+                key = f"llm_resp:{key_suffix}"
+                answer_bytes = await llm_cache_client.get(key)
+                if answer_bytes is not None:
+                    logger.info(f"LLM cache hit (semantic): similarity={similarity:.3f}")
+                    return {
+                        "response": answer_bytes.decode(),
+                        "from_cache": True,
+                        "similarity": similarity,
+                        "session_id": session_id,
+                        "cache_key": key
+                    }
+                if session_id in _semantic_indexes:
+                    _semantic_indexes[session_id].remove(key_suffix)
         
         return None
     except Exception as e:
         logger.error(f"LLM cache error: {e}")
         return None
 
-async def store_cached_response(query: str, response: str, session_id: str = "default", ttl: int = 3600):
+async def store_cached_response(query: str, response: str, session_id: str = "default", ttl: int = 3600, query_hash: Optional[str] = None):
     """Store response in dedicated LLM cache"""
     if not ENABLE_CACHING or not llm_cache_client:
         return
         
     try:
-        cache_key = f"llm_cache:{session_id}:{hashlib.md5(query.encode()).hexdigest()}"
-        cache_data = {
-            "response": response,
+        key_suffix = f"{session_id}:{query_hash or _query_hash(query)}"
+        cache_meta = {
             "original_query": query,
             "timestamp": time.time(),
             "session_id": session_id
         }
         
-        llm_cache_client.setex(cache_key, ttl, json.dumps(cache_data))
-        logger.info(f"Stored in LLM cache: {cache_key}")
+        pipe = llm_cache_client.pipeline()
+        pipe.setex(f"llm_resp:{key_suffix}", ttl, response.encode())
+        pipe.setex(f"llm_meta:{key_suffix}", ttl, orjson.dumps(cache_meta))
+        embedding = None
+        if 'embedding_batcher' in globals():
+            embedding = await _embed_norm(query)
+            pipe.setex(f"llm_emb:{key_suffix}", ttl, _quantize_embedding(embedding))
+        await pipe.execute()
+        
+        # Sessions without an index yet pick this entry up when it is bootstrapped from Redis
+        if embedding is not None and session_id in _semantic_indexes:
+            _semantic_indexes[session_id].add(embedding, key_suffix, time.time() + ttl)
+        logger.info(f"Stored in LLM cache: llm_resp:{key_suffix}")
     except Exception as e:
         logger.error(f"Error storing in LLM cache: {e}")
 
+# Background cache writes are kept referenced until done so they are not garbage collected mid-flight
+_background_tasks: set = set()
+
+def _schedule_cache_store(query: str, response: str, session_id: str = "default", query_hash: Optional[str] = None):
+    """Store a response in the LLM cache without blocking the caller"""
+    task = asyncio.create_task(store_cached_response(query, response, session_id, query_hash=query_hash))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def _open_completion_stream(query: str, model: str):
+    """Open a streamed chat completion; the final chunk carries the usage block"""
+    index = client_pool.pick()
+    start = time.monotonic()
+    try:
+        stream = await client_pool.clients[index].chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_INSTRUCTION},
+                {"role": "user", "content": query}
+            ],
+            max_tokens=1000,
+            temperature=0.2,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+    except Exception as e:
+        client_pool.record(index, time.monotonic() - start, e)
+        raise
+    client_pool.record(index, time.monotonic() - start)
+    return stream
+
+async def _collect_completion(query: str, model: str):
+    """Consume a streamed chat completion and return (answer, usage)"""
+    stream = await _open_completion_stream(query, model)
+    chunks = []
+    usage = None
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            chunks.append(chunk.choices[0].delta.content)
+        if getattr(chunk, "usage", None):
+            usage = chunk.usage
+    return "".join(chunks), usage
+
+# cost_calculator lives in monitoring/utils, which is not a package import from here
+_COST_CALCULATOR_PATH = os.path.join(os.path.dirname(__file__), '../../monitoring/utils')
+
+def _usage_cost(model: str, usage) -> float:
+    """Dollar cost of a completion's usage block; 0.0 when the stream reported no usage"""
+    if not usage:
+        return 0.0
+    try:
+        if _COST_CALCULATOR_PATH not in sys.path:
+            sys.path.append(_COST_CALCULATOR_PATH)
+        from cost_calculator import calculate_cost
+        
+        cost = calculate_cost(
+            model=model,
+            input_tokens=usage.prompt_tokens or 0,
+            output_tokens=usage.completion_tokens or 0
+        )
+        logger.debug(f"Calculated cost: ${cost:.6f} for {usage.total_tokens} tokens")
+        return cost
+    except Exception as e:
+        logger.warning(f"Could not calculate cost: {e}")
+        # Fallback calculation
+        return ((usage.prompt_tokens or 0) * 0.0000005 + 
+                (usage.completion_tokens or 0) * 0.0000015)
+
+def _set_usage_attributes(llm_span, request_span, usage, cost: float):
+    """Record token counts and cost on the LLM span and, for top-level visibility, the request span"""
+    if not usage:
+        return
+    llm_span.set_attribute("moolai.llm.input_tokens", usage.prompt_tokens or 0)
+    llm_span.set_attribute("moolai.llm.output_tokens", usage.completion_tokens or 0)
+    llm_span.set_attribute("moolai.llm.total_tokens", usage.total_tokens or 0)
+    llm_span.set_attribute("moolai.llm.cost", cost)
+    
+    if request_span:
+        request_span.set_attribute("moolai.tokens.input", usage.prompt_tokens or 0)
+        request_span.set_attribute("moolai.tokens.output", usage.completion_tokens or 0)
+        request_span.set_attribute("moolai.tokens.total", usage.total_tokens or 0)
+        request_span.set_attribute("moolai.cost", cost)
+
+def _usage_fields(usage, cost: float) -> dict:
+    """Token and cost fields added to a fresh response"""
+    if not usage:
+        return {}
+    return {
+        "tokens_used": usage.total_tokens or 0,
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cost": cost
+    }
+
+async def _track_request(user_id: str, query: str, session_id: str):
+    """Start monitoring a request; returns None when monitoring is unavailable"""
+    if not monitoring_middleware:
+        return None
+    try:
+        async with MonitoringSessionLocal() as db_session:
+            monitoring_middleware.db_session = db_session
+            return await monitoring_middleware.track_request(
+                user_id=user_id,
+                agent_type="prompt_response",
+                prompt=query,
+                session_id=session_id
+            )
+    except Exception as e:
+        logger.warning(f"Failed to start monitoring: {e}")
+        return None
+
+async def _track_response(request_context, answer: str, model: str, cache_hit: bool, cache_similarity=None):
+    """Record the response for a request started with _track_request"""
+    if not (monitoring_middleware and request_context):
+        return
+    try:
+        async with MonitoringSessionLocal() as db_session:
+            monitoring_middleware.db_session = db_session
+            await monitoring_middleware.track_response(
+                request_context=request_context,
+                response=answer,
+                model=model,
+                cache_hit=cache_hit,
+                cache_similarity=cache_similarity
+            )
+    except Exception as e:
+        logger.warning(f"Failed to track {'cached' if cache_hit else 'fresh'} response: {e}")
+
+def _in_span(span):
+    """Make span current for a block without ending it; a no-op when tracing is off"""
+    return trace.use_span(span, end_on_exit=False) if span is not None else contextlib.nullcontext()
+
+async def stream_llm_response(query: str, session_id: str = "default", model: str = "gpt-3.5-turbo", meta: Optional[dict] = None, user_id: str = "default_user"):
+    """Yield the LLM answer as it is generated, serving firewall blocks, cache hits and joined duplicates in one piece.
+    
+    Traced, costed, monitored and coalesced like generate_llm_response. When given, meta is filled
+    with the fields that function returns apart from the answer; firewall_blocked is already set
+    when the block text is yielded.
+    """
+    meta = {} if meta is None else meta
+    meta.update(from_cache=False, similarity=None, firewall_blocked=False)
+    query = query.strip()
+    query_hash = _query_hash(query)
+    key = (session_id, model, query_hash)
+    result = await _join_inflight(key)
+    if result is not None:
+        logger.info(f"Coalescing duplicate in-flight query for session {session_id}")
+        meta.update((k, v) for k, v in result.items() if k != "answer")
+        yield result["answer"]
+        return
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    result = {}
+    try:
+        async for delta in _stream_llm_response_traced(query, session_id, user_id, model, query_hash, result):
+            if result.get("firewall_blocked"):
+                meta.update(firewall_blocked=True, firewall_reasons=result.get("firewall_reasons"))
+            yield delta
+        future.set_result(result)
+    except (asyncio.CancelledError, GeneratorExit):
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so a leader without followers doesn't log a warning
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+    meta.update((k, v) for k, v in result.items() if k != "answer")
+
+async def _stream_llm_response_traced(query: str, session_id: str, user_id: str, model: str, query_hash: str, result: dict):
+    """Streaming counterpart of _generate_llm_response_traced.
+    
+    The request span is started detached and only made current around awaits: a context
+    attached in an async generator can't be detached safely across a yield.
+    """
+    request_span = None
+    if TRACING_AVAILABLE:
+        try:
+            request_span = trace.get_tracer(__name__).start_span("moolai.request.process")
+        except Exception:
+            request_span = None
+    if request_span:
+        request_span.set_attribute("moolai.session_id", session_id)
+        request_span.set_attribute("moolai.user_id", user_id)
+        request_span.set_attribute("moolai.query.length", len(query))
+        request_span.set_attribute("moolai.query.hash", query_hash[:8])
+        request_span.set_attribute("moolai.request.streamed", True)
+    
+    try:
+        async for delta in _stream_llm_response_internal(query, session_id, user_id, model, request_span, query_hash, result):
+            yield delta
+    except Exception as e:
+        if request_span:
+            request_span.record_exception(e)
+            request_span.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        if request_span:
+            request_span.end()
+
+async def _stream_llm_response_internal(query: str, session_id: str, user_id: str, model: str, request_span, query_hash: str, result: dict):
+    """Streamed generation; fills result with the same fields _generate_llm_response_internal returns"""
+    result.update(answer="", session_id=session_id, from_cache=False, similarity=None)
+    
+    if ENABLE_FIREWALL:
+        with _in_span(request_span):
+            scan_result = await firewall_scan(query, request_span)
+        if scan_result["pii"]["contains_pii"] or scan_result["secrets"]["contains_secrets"] or scan_result["toxicity"]["contains_toxicity"]:
+            logger.warning(f"FIREWALL BLOCKING STREAM - PII: {scan_result['pii']['contains_pii']}, Secrets: {scan_result['secrets']['contains_secrets']}, Toxicity: {scan_result['toxicity']['contains_toxicity']}")
+            result.update(answer=FIREWALL_BLOCKED_ANSWER, firewall_blocked=True, firewall_reasons=scan_result)
+            yield FIREWALL_BLOCKED_ANSWER
+            return
+    
+    request_context = await _track_request(user_id, query, session_id)
+    
+    if ENABLE_CACHING:
+        with _in_span(request_span):
+            cached = await get_cached_response(query, session_id, query_hash)
+        if request_span:
+            request_span.set_attribute("moolai.cache.hit", bool(cached))
+            request_span.set_attribute("moolai.cache.similarity", (cached.get("similarity") or 1.0) if cached else 0.0)
+        if cached:
+            logger.info(f"LLM Cache HIT for session {session_id} (similarity: {cached.get('similarity', 'exact')})")
+            await _track_response(request_context, cached["response"], model, cache_hit=True, cache_similarity=cached.get("similarity"))
+            result.update(answer=cached["response"], from_cache=True, similarity=cached.get("similarity"), tokens_used=0, cost=0.0)
+            yield cached["response"]
+            return
+    
+    logger.info(f"LLM Cache MISS - streaming fresh response for session {session_id}")
+    llm_span = None
+    if request_span:
+        llm_span = trace.get_tracer(__name__).start_span("moolai.llm.call", context=trace.set_span_in_context(request_span))
+        llm_span.set_attribute("moolai.llm.model", model)
+        llm_span.set_attribute("moolai.llm.temperature", 0.2)
+        llm_span.set_attribute("moolai.llm.max_tokens", 1000)
+        llm_span.set_attribute("moolai.llm.cache_miss", True)
+        llm_span.set_attribute("moolai.llm.streamed", True)
+        request_span.set_attribute("moolai.llm.model", model)
+        request_span.set_attribute("moolai.llm.fresh_call", True)
+    
+    chunks = []
+    usage = None
+    try:
+        with _in_span(llm_span):
+            stream = await _open_completion_stream(query, model)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                delta = chunk.choices[0].delta.content
+                chunks.append(delta)
+                yield delta
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+        cost = _usage_cost(model, usage)
+        if llm_span:
+            _set_usage_attributes(llm_span, request_span, usage, cost)
+    finally:
+        if llm_span:
+            llm_span.end()
+    
+    answer = "".join(chunks)
+    await _track_response(request_context, answer, model, cache_hit=False)
+    if ENABLE_CACHING:
+        _schedule_cache_store(query, answer, session_id, query_hash)
+    result["answer"] = answer
+    result.update(_usage_fields(usage, cost))
+
 async def firewall_scan(text: str, request_span=None) -> dict:
     """
     Enhanced firewall scanning with Phoenix tracing.
@@ -404,7 +994,53 @@ async def firewall_scan(text: str, request_span=None) -> dict:
             logger.error(f"Firewall service error: {e}")
             raise HTTPException(status_code=500, detail=f"Firewall error: {str(e)}")
 
+# Single-flight map of in-progress generations; identical concurrent queries await the leader's future.
+# The get-or-create below has no await in between, so it is atomic on the event loop without a lock.
+_inflight: dict = {}
+
+async def _join_inflight(key) -> Optional[dict]:
+    """Wait for an identical in-flight generation and return a copy of its result.
+    
+    Returns None when there is nothing to join, so the caller can lead. A leader that is cancelled
+    (client disconnect, timeout) wakes its followers and the next one in line retries as the new
+    leader instead of failing a request nobody cancelled.
+    """
+    while (future := _inflight.get(key)) is not None:
+        try:
+            return dict(await asyncio.shield(future))
+        except asyncio.CancelledError:
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+    return None
+
 async def generate_llm_response(query: str, session_id: str = "default", user_id: str = "default_user", model: str = "gpt-3.5-turbo") -> dict:
+    """Generate LLM response, coalescing identical in-flight queries into one upstream call"""
+    query = query.strip()  # Stripped once here; everything downstream reuses this string
+    query_hash = _query_hash(query)
+    key = (session_id, model, query_hash)
+    result = await _join_inflight(key)
+    if result is not None:
+        logger.info(f"Coalescing duplicate in-flight query for session {session_id}")
+        return result
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _generate_llm_response_traced(query, session_id, user_id, model, query_hash)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so a leader without followers doesn't log a warning
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+async def _generate_llm_response_traced(query: str, session_id: str, user_id: str, model: str, query_hash: str) -> dict:
     """Generate LLM response with enhanced Phoenix OpenTelemetry observability and comprehensive tracing"""
     
     # Create root span with vendor-prefixed attributes for comprehensive request tracing
@@ -422,27 +1058,27 @@ async def generate_llm_response(query: str, session_id: str = "default", user_id
             request_span.set_attribute("moolai.session_id", session_id)
             request_span.set_attribute("moolai.user_id", user_id)
             request_span.set_attribute("moolai.query.length", len(query))
-            request_span.set_attribute("moolai.query.hash", hashlib.md5(query.encode()).hexdigest()[:8])
+            request_span.set_attribute("moolai.query.hash", query_hash[:8])
             
-            return await _generate_llm_response_internal(query, session_id, user_id, model, request_span)
+            return await _generate_llm_response_internal(query, session_id, user_id, model, request_span, query_hash)
     else:
-        return await _generate_llm_response_internal(query, session_id, user_id, model, None)
+        return await _generate_llm_response_internal(query, session_id, user_id, model, None, query_hash)
 
-async def _generate_llm_response_internal(query: str, session_id: str, user_id: str, model: str, request_span) -> dict:
+async def _generate_llm_response_internal(query: str, session_id: str, user_id: str, model: str, request_span, query_hash: str) -> dict:
     """Internal LLM response generation with Phoenix tracing context"""
     
     # Firewall scanning with enhanced tracing - MUST be first to protect the system
-    logger.info(f"Firewall check starting - ENABLE_FIREWALL={ENABLE_FIREWALL}")
+    logger.debug(f"Firewall check starting - ENABLE_FIREWALL={ENABLE_FIREWALL}")
     if ENABLE_FIREWALL:
-        logger.info(f"Running firewall scan on query: {query[:50]}...")
+        logger.debug(f"Running firewall scan on query: {query[:50]}...")
         if TRACING_AVAILABLE:
             tracer = trace.get_tracer(__name__)
             with tracer.start_as_current_span("moolai.firewall.scan") as firewall_span:
-                scan_result = await firewall_scan(query.strip(), request_span)
+                scan_result = await firewall_scan(query, request_span)
         else:
-            scan_result = await firewall_scan(query.strip(), request_span)
+            scan_result = await firewall_scan(query, request_span)
         
-        logger.info(f"Firewall scan results: PII={scan_result['pii']['contains_pii']}, Secrets={scan_result['secrets']['contains_secrets']}, Toxicity={scan_result['toxicity']['contains_toxicity']}")
+        logger.debug(f"Firewall scan results: PII={scan_result['pii']['contains_pii']}, Secrets={scan_result['secrets']['contains_secrets']}, Toxicity={scan_result['toxicity']['contains_toxicity']}")
         
         # Check if content should be blocked
         if scan_result["pii"]["contains_pii"] or scan_result["secrets"]["contains_secrets"] or scan_result["toxicity"]["contains_toxicity"]:
@@ -451,7 +1087,7 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
             
             # Return blocked response
             return {
-                "answer": "Request blocked by security firewall due to sensitive content detection.",
+                "answer": FIREWALL_BLOCKED_ANSWER,
                 "session_id": session_id,
                 "from_cache": False,
                 "similarity": None,
@@ -462,20 +1098,7 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
         logger.info("Firewall is disabled, skipping scan")
     
     # Start monitoring if available (legacy - will be removed in Phase 4)
-    request_context = None
-    if monitoring_middleware:
-        try:
-            # Create database session for monitoring
-            async with MonitoringSessionLocal() as db_session:
-                monitoring_middleware.db_session = db_session
-                request_context = await monitoring_middleware.track_request(
-                    user_id=user_id,
-                    agent_type="prompt_response",
-                    prompt=query,
-                    session_id=session_id
-                )
-        except Exception as e:
-            logger.warning(f"Failed to start monitoring: {e}")
+    request_context = await _track_request(user_id, query, session_id)
     
     # Cache lookup with enhanced tracing
     cache_hit = False
@@ -488,7 +1111,7 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
                 cache_span.set_attribute("moolai.cache.enabled", True)
                 cache_span.set_attribute("moolai.cache.session_id", session_id)
                 
-                cache_result = await get_cached_response(query, session_id)
+                cache_result = await get_cached_response(query, session_id, query_hash)
                 if cache_result and cache_result.get("from_cache"):
                     cache_hit = True
                     cache_similarity = cache_result.get("similarity")
@@ -512,26 +1135,15 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
                         request_span.set_attribute("moolai.cache.hit", False)
                         request_span.set_attribute("moolai.cache.similarity", 0.0)
         else:
-            cache_result = await get_cached_response(query, session_id)
+            cache_result = await get_cached_response(query, session_id, query_hash)
             if cache_result and cache_result.get("from_cache"):
                 cache_hit = True
                 cache_similarity = cache_result.get("similarity")
                 logger.info(f"LLM Cache HIT for session {session_id} (similarity: {cache_result.get('similarity', 'exact')})")
-            
+        
+        if cache_hit:
             # Track response with monitoring
-            if monitoring_middleware and request_context:
-                try:
-                    async with MonitoringSessionLocal() as db_session:
-                        monitoring_middleware.db_session = db_session
-                        await monitoring_middleware.track_response(
-                            request_context=request_context,
-                            response=cache_result["response"],
-                            model=model,
-                            cache_hit=True,
-                            cache_similarity=cache_similarity
-                        )
-                except Exception as e:
-                    logger.warning(f"Failed to track cached response: {e}")
+            await _track_response(request_context, cache_result["response"], model, cache_hit=True, cache_similarity=cache_similarity)
             
             return {
                 "answer": cache_result["response"],
@@ -558,101 +1170,23 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
                 request_span.set_attribute("moolai.llm.model", model)
                 request_span.set_attribute("moolai.llm.fresh_call", True)
             
-            response = await client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": SYSTEM_INSTRUCTION},
-                    {"role": "user", "content": query.strip()}
-                ],
-                max_tokens=1000,
-                temperature=0.2
-            )
-            
-            # Calculate cost using our cost calculator
-            cost = 0.0
-            if hasattr(response, 'usage') and response.usage:
-                try:
-                    # Import cost calculator dynamically
-                    import sys
-                    import os
-                    sys.path.append(os.path.join(os.path.dirname(__file__), '../../monitoring/utils'))
-                    from cost_calculator import calculate_cost
-                    
-                    cost = calculate_cost(
-                        model=model,
-                        input_tokens=response.usage.prompt_tokens or 0,
-                        output_tokens=response.usage.completion_tokens or 0
-                    )
-                    logger.info(f"Calculated cost: ${cost:.6f} for {response.usage.total_tokens} tokens")
-                except Exception as e:
-                    logger.warning(f"Could not calculate cost: {e}")
-                    # Fallback calculation
-                    cost = ((response.usage.prompt_tokens or 0) * 0.0000005 + 
-                           (response.usage.completion_tokens or 0) * 0.0000015)
+            answer, usage = await _collect_completion(query, model)
             
-            # Set response attributes including cost
-            if hasattr(response, 'usage') and response.usage:
-                llm_span.set_attribute("moolai.llm.input_tokens", response.usage.prompt_tokens or 0)
-                llm_span.set_attribute("moolai.llm.output_tokens", response.usage.completion_tokens or 0)
-                llm_span.set_attribute("moolai.llm.total_tokens", response.usage.total_tokens or 0)
-                llm_span.set_attribute("moolai.llm.cost", cost)
-                
-                if request_span:
-                    request_span.set_attribute("moolai.tokens.input", response.usage.prompt_tokens or 0)
-                    request_span.set_attribute("moolai.tokens.output", response.usage.completion_tokens or 0)
-                    request_span.set_attribute("moolai.tokens.total", response.usage.total_tokens or 0)
-                    request_span.set_attribute("moolai.cost", cost)
+            # Calculate cost using our cost calculator and record it with the token counts
+            cost = _usage_cost(model, usage)
+            _set_usage_attributes(llm_span, request_span, usage, cost)
     else:
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": SYSTEM_INSTRUCTION},
-                {"role": "user", "content": query.strip()}
-            ],
-            max_tokens=1000,
-            temperature=0.2
-        )
+        answer, usage = await _collect_completion(query, model)
         
         # Calculate cost even without tracing
-        cost = 0.0
-        if hasattr(response, 'usage') and response.usage:
-            try:
-                import sys
-                import os
-                sys.path.append(os.path.join(os.path.dirname(__file__), '../../monitoring/utils'))
-                from cost_calculator import calculate_cost
-                
-                cost = calculate_cost(
-                    model=model,
-                    input_tokens=response.usage.prompt_tokens or 0,
-                    output_tokens=response.usage.completion_tokens or 0
-                )
-            except Exception:
-                # Fallback calculation
-                cost = ((response.usage.prompt_tokens or 0) * 0.0000005 + 
-                       (response.usage.completion_tokens or 0) * 0.0000015)
-    
-    answer = response.choices[0].message.content
+        cost = _usage_cost(model, usage)
     
     # Track response with monitoring
-    if monitoring_middleware and request_context:
-        try:
-            async with MonitoringSessionLocal() as db_session:
-                monitoring_middleware.db_session = db_session
-                await monitoring_middleware.track_response(
-                    request_context=request_context,
-                    response=response,
-                    model=model,
-                    cache_hit=False,
-                    cache_similarity=None
-                )
-        except Exception as e:
-            logger.warning(f"Failed to track fresh response: {e}")
+    await _track_response(request_context, answer, model, cache_hit=False)
     
-    # Store in dedicated LLM cache (completely separate from monitoring)
+    # Store in dedicated LLM cache (completely separate from monitoring) off the critical path
     if ENABLE_CACHING:
-        await store_cached_response(query, answer, session_id)
-        logger.info(f"Stored fresh response in dedicated LLM cache for session {session_id}")
+        _schedule_cache_store(query, answer, session_id, query_hash)
     
     # Include cost and token information in response
     result = {
@@ -663,11 +1197,7 @@ async def _generate_llm_response_internal(query: str, session_id: str, user_id:
     }
     
     # Add usage and cost information if available
-    if hasattr(response, 'usage') and response.usage:
-        result["tokens_used"] = response.usage.total_tokens or 0
-        result["prompt_tokens"] = response.usage.prompt_tokens or 0
-        result["completion_tokens"] = response.usage.completion_tokens or 0
-        result["cost"] = cost if 'cost' in locals() else 0.0
+    result.update(_usage_fields(usage, cost))
     
     return result
 
@@ -690,7 +1220,8 @@ async def get_response(
     Returns:
         JSON response with the LLM's answer and cache metadata
     """
-    if not query or not query.strip():
+    query = query.strip() if query else ""
+    if not query:
         raise HTTPException(status_code=400, detail="Query parameter cannot be empty")
     
     # Enhanced firewall check with tracing
@@ -705,7 +1236,7 @@ async def get_response(
             except Exception:
                 pass
         
-        scan = await firewall_scan(query.strip(), current_span)
+        scan = await firewall_scan(query, current_span)
         if scan["pii"]["contains_pii"] or scan["secrets"]["contains_secrets"] or scan["toxicity"]["contains_toxicity"]:
             firewall_blocked = True
             firewall_reasons = scan
@@ -744,7 +1275,7 @@ async def get_response(
     
     try:
         result = await asyncio.wait_for(
-            generate_llm_response(query.strip(), session_id, user_id, model),
+            generate_llm_response(query, session_id, user_id, model),
             timeout=35.0  # Slightly longer timeout to account for cache calls
         )
         return result
@@ -761,7 +1292,56 @@ async def get_response(
             content={"error": f"Internal server error: {str(e)}"}
         )
 
-@app.post("/respond", response_model=QueryResponse)
+@app.get("/respond/stream")
+async def stream_response(
+    query: str = Query(..., description="User query to get LLM response for"),
+    session_id: str = Query("default", description="Session ID for caching"),
+    model: str = Query("gpt-3.5-turbo", description="LLM model to use")
+):
+    """
+    Stream the LLM response for a user query as plain text chunks.
+    
+    Args:
+        query: The user's question or prompt
+        session_id: Session ID for cache isolation
+        model: LLM model to use
+        
+    Returns:
+        Streaming text response; the answer is cached once the stream completes
+    """
+    query = query.strip() if query else ""
+    if not query:
+        raise HTTPException(status_code=400, detail="Query parameter cannot be empty")
+    
+    # The stream runs the firewall itself; its first chunk tells whether the query was blocked,
+    # so the scan happens once and a block still gets a 403 instead of a streamed body
+    meta = {}
+    stream = stream_llm_response(query, session_id, model, meta)
+    try:
+        first = await anext(stream, "")
+    except Exception as e:
+        # Nothing has been sent yet, so a failure before the first chunk still gets an error status
+        logger.error(f"Error in stream_response: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    if meta.get("firewall_blocked"):
+        async for _ in stream:
+            pass
+        return JSONResponse(
+            status_code=403,
+            content={
+                "error": "Content blocked by firewall",
+                "scan_results": meta.get("firewall_reasons")
+            }
+        )
+    
+    async def body():
+        yield first
+        async for delta in stream:
+            yield delta
+    
+    return StreamingResponse(body(), media_type="text/plain")
+
+@app.post("/respond")
 # Phoenix/OpenTelemetry tracing handled automatically
 async def post_response(request: QueryRequest):
     """
@@ -773,11 +1353,11 @@ async def post_response(request: QueryRequest):
     Returns:
         JSON response with the LLM's answer and cache metadata
     """
-    query = request.query
+    query = request.query.strip() if request.query else ""
     session_id = request.session_id or "default"
     model = request.model or "gpt-3.5-turbo"
     
-    if not query or not query.strip():
+    if not query:
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
     # Enhanced firewall check with tracing
@@ -790,7 +1370,7 @@ async def post_response(request: QueryRequest):
             except Exception:
                 pass
         
-        scan = await firewall_scan(query.strip(), current_span)
+        scan = await firewall_scan(query, current_span)
         if scan["pii"]["contains_pii"] or scan["secrets"]["contains_secrets"] or scan["toxicity"]["contains_toxicity"]:
             return JSONResponse(
                 status_code=403,
@@ -802,16 +1382,17 @@ async def post_response(request: QueryRequest):
     
     try:
         result = await asyncio.wait_for(
-            generate_llm_response(query.strip(), session_id, model=model),
+            generate_llm_response(query, session_id, model=model),
             timeout=35.0  # Slightly longer timeout to account for cache calls
         )
         
-        return QueryResponse(
-            answer=result["answer"],
-            session_id=result["session_id"],
-            from_cache=result["from_cache"],
-            similarity=result["similarity"]
-        )
+        # Serialize directly instead of re-validating through the QueryResponse model
+        return ORJSONResponse({
+            "answer": result["answer"],
+            "session_id": result["session_id"],
+            "from_cache": result["from_cache"],
+            "similarity": result["similarity"]
+        })
         
     except asyncio.TimeoutError:
         return JSONResponse(
@@ -980,25 +1561,13 @@ async def evaluate_response_comprehensive(request: QueryRequest):
         response_data = await generate_llm_response(request.query, request.session_id, model=request.model)
         answer = response_data["answer"]
         
-        # Run all evaluations in parallel
-        evaluations = await asyncio.gather(
-            evaluate_answer_correctness(request.query, answer),
-            evaluate_answer_relevance(request.query, answer),
-            evaluate_goal_accuracy(request.query, answer),
-            evaluate_hallucination(request.query, answer),
-            evaluate_summarization(request.query, answer)
-        )
+        # Score every metric with a single batched evaluator call
+        evaluations = await evaluate_comprehensive(request.query, answer)
         
         return {
             "query": request.query,
             "answer": answer,
-            "evaluations": {
-                "correctness": evaluations[0],
-                "relevance": evaluations[1],
-                "goal_accuracy": evaluations[2],
-                "hallucination": evaluations[3],
-                "summarization": evaluations[4]
-            },
+            "evaluations": evaluations,
             "session_id": request.session_id
         }
     except Exception as e:
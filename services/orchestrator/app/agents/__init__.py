@@ -1,9 +1,25 @@
 """Orchestrator agents package."""
 
+import asyncio
+import io
+import json
+import logging
 import os
 import sys
-from datetime import datetime
-from typing import Optional
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from secrets import token_hex
+from typing import List, Optional
+
+from openai import AsyncOpenAI
+from prometheus_client import Counter, Histogram
+from sqlalchemy import select, func
+
+from ..models.prompt_execution import PromptExecution
+from ..monitoring.utils.cost_calculator import calculate_cost, calculate_costs, estimate_tokens as count_model_tokens
+from ..services.Caching.cache import RedisCache, PromptRequest as CacheLookupRequest, settings as cache_settings
+from ..services.Caching.cache import process_prompt as cache_lookup, store_response as cache_store, embed_texts
 
 # Add path to main_response.py
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -11,47 +27,498 @@ main_response_path = os.path.join(current_dir, 'Prompt Response')
 sys.path.insert(0, main_response_path)
 
 try:
-    from main_response import generate_llm_response, QueryRequest, QueryResponse
+    from main_response import generate_llm_response, stream_llm_response, firewall_scan, QueryRequest, QueryResponse
+    from main_response import SYSTEM_INSTRUCTION, SYSTEM_PREFIX_HASH, FIREWALL_BLOCKED_ANSWER
+    from main_response import client as default_openai_client, http_client as shared_http_client
 finally:
     if main_response_path in sys.path:
         sys.path.remove(main_response_path)
 
+logger = logging.getLogger(__name__)
+
+# --------- Prometheus Metrics ---------
+PROMPT_LATENCY = Histogram(
+    "prompt_latency_ms", "End-to-end prompt processing latency in milliseconds",
+    buckets=(50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+)
+PROMPT_TOKENS = Counter("prompt_tokens_total", "Tokens processed by the prompt agent", ["model", "direction"])
+PROMPT_ERRORS = Counter("prompt_errors_total", "Prompt processing failures", ["kind"])
+
+# Batch API jobs are polled at this interval until they reach a terminal state
+BATCH_POLL_INTERVAL = float(os.getenv("OPENAI_BATCH_POLL_INTERVAL", "30"))
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+# Online batches are written to the database in chunks of this many rows as results arrive
+PERSIST_FLUSH_SIZE = 64
+
+# Coalesce concurrent single-prompt calls into short dispatch windows
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "false").lower() == "true"
+
+# Stored in place of a prompt the firewall blocked, which may contain PII or secrets
+BLOCKED_PROMPT_TEXT = "[redacted: blocked by firewall]"
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(prompt: str) -> int:
+    """Word-split token estimate for when the provider reports no usage"""
+    return int(len(prompt.split()) * 1.3)
+
+
+def _new_prompt_id(now: Optional[datetime] = None) -> str:
+    return f"prompt_{(now or datetime.utcnow()).strftime('%Y%m%d_%H%M%S')}_{token_hex(4)}"
+
+
+
+class AgentProcessingError(Exception):
+    """A prompt could not be answered; the underlying error is chained as __cause__"""
+
+class AgentResponse:
+    """Response object compatible with the API layer"""
+    def __init__(self, result, model, prompt_id=None):
+        # One wall-clock sample per response, shared by the id and the stored timestamp
+        now = datetime.utcnow()
+        self.prompt_id = prompt_id or _new_prompt_id(now)
+        self.response = result.get("answer", "")
+        self.model = model
+        self.input_tokens = result.get("prompt_tokens", 0)
+        self.output_tokens = result.get("completion_tokens", 0)
+        self.total_tokens = result.get("tokens_used", 0)
+        self.cost = result.get("cost", 0.0)
+        self.latency_ms = result.get("latency_ms", 0)
+        self.timestamp = now
+        # Add cache information
+        self.from_cache = result.get("from_cache", False)
+        self.cache_similarity = result.get("similarity", None)
+        self.firewall_blocked = result.get("firewall_blocked", False)
+
+
+def _scan_blocked(scan: dict) -> bool:
+    return scan["pii"]["contains_pii"] or scan["secrets"]["contains_secrets"] or scan["toxicity"]["contains_toxicity"]
+
+
+def _row_status(response: AgentResponse) -> str:
+    if response.firewall_blocked:
+        return "blocked"
+    return "cache_hit" if response.from_cache else "success"
+
+
+def _build_row(request, response: AgentResponse, organization_id: str) -> dict:
+    """Map a request/response pair onto prompt_executions columns; a blocked prompt's text is never stored"""
+    return {
+        "prompt_id": response.prompt_id,
+        "organization_id": organization_id,
+        "user_id": getattr(request, 'user_id', None) or "default_user",
+        "prompt_text": BLOCKED_PROMPT_TEXT if response.firewall_blocked else request.query,
+        "response_text": response.response,
+        "model": response.model,
+        "input_tokens": response.input_tokens,
+        "output_tokens": response.output_tokens,
+        "total_tokens": response.total_tokens,
+        "cost": response.cost,
+        "latency_ms": response.latency_ms,
+        "status": _row_status(response),
+        "cache_hit": response.from_cache,
+        "cache_prefix_hash": SYSTEM_PREFIX_HASH,
+        "session_id": request.session_id,
+        "timestamp": response.timestamp,
+        "created_at": response.timestamp
+    }
+
+
+async def _persist_rows(rows: List[dict], db, owns_transaction: bool = False) -> None:
+    """Write execution rows in one INSERT and commit them.
+    
+    Only a caller that passes owns_transaction gets a flush instead, and commits itself; a transaction
+    the session autobegan on an earlier read is still committed here.
+    """
+    if not rows:
+        return
+    insert = PromptExecution.__table__.insert()
+    if owns_transaction:
+        await db.execute(insert, rows)
+        await db.flush()
+    elif not db.in_transaction():
+        async with db.begin():
+            await db.execute(insert, rows)
+    else:
+        await db.execute(insert, rows)
+        await db.commit()
+
+
+class BatchCoalescer:
+    """Buffer independent prompts for a short window and dispatch them as one batch"""
+    
+    def __init__(self, dispatch, batch_size: int = 16, wait_ms: int = 30):
+        self.dispatch = dispatch
+        self.batch_size = batch_size
+        self.max_wait = wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight = set()
+    
+    async def submit(self, request):
+        """Return the response for request once its batch has been dispatched"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Dispatch in the background so the next batch is collected while this one is in flight
+            task = asyncio.create_task(self._dispatch_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+    
+    async def _dispatch_batch(self, batch):
+        try:
+            results = await self.dispatch([request for request, _ in batch])
+        except Exception as e:
+            # A failed dispatch fails its whole batch; waiting callers must not hang
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
 class PromptResponseAgent:
-    def __init__(self, openai_api_key=None, organization_id="default"):
+    def __init__(self, openai_api_key=None, organization_id="default", cache: Optional[RedisCache] = None):
         self.openai_api_key = openai_api_key
         self.organization_id = organization_id
+        self.openai_client = AsyncOpenAI(api_key=openai_api_key, http_client=shared_http_client) if openai_api_key else default_openai_client
+        self.cache = cache
+        self._background_tasks = set()
+        self._coalescer = BatchCoalescer(self._call_llm_batch) if COALESCE_ENABLED else None
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Token count with the model's tiktoken encoding, estimated if the tokenizer is unavailable"""
+        return count_model_tokens(text, model or DEFAULT_MODEL)
 
     async def process_prompt(self, request, db_session=None):
         """Process prompt using the main_response.py implementation"""
         try:
-            # Get model from request or use default
-            model = getattr(request, 'model', 'gpt-3.5-turbo')
-            
-            # Call the main_response function with model parameter
-            result = await generate_llm_response(request.query, request.session_id, model=model)
-            
-            # Return a response object compatible with the API
-            class AgentResponse:
-                def __init__(self, result, model):
-                    self.prompt_id = f"prompt_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    self.response = result.get("answer", "")
-                    self.model = model
-                    self.total_tokens = result.get("tokens_used", 0)
-                    self.cost = result.get("cost", 0.0)
-                    self.latency_ms = result.get("latency_ms", 0)
-                    self.timestamp = datetime.now()
-                    # Add cache information
-                    self.from_cache = result.get("from_cache", False)
-                    self.cache_similarity = result.get("similarity", None)
-            
-            return AgentResponse(result, model)
-            
+            if self._coalescer is not None:
+                response = await self._coalescer.submit(request)
+            else:
+                response = await self._call_llm(request)
+        except Exception as e:
+            PROMPT_ERRORS.labels(kind="llm").inc()
+            raise AgentProcessingError(f"Agent processing failed: {str(e)}") from e
+        
+        PROMPT_LATENCY.observe(response.latency_ms)
+        PROMPT_TOKENS.labels(response.model, "in").inc(response.input_tokens)
+        PROMPT_TOKENS.labels(response.model, "out").inc(response.output_tokens)
+        
+        try:
+            if db_session is not None:
+                await _persist_rows([_build_row(request, response, self.organization_id)], db_session)
+        except Exception as e:
+            PROMPT_ERRORS.labels(kind="db").inc()
+            raise AgentProcessingError(f"Agent processing failed: {str(e)}") from e
+        return response
+
+    async def stream_prompt(self, request, db_session=None):
+        """Yield the answer as it is generated; the execution row is written once the stream ends"""
+        model = getattr(request, 'model', None) or DEFAULT_MODEL
+        start_ns = time.monotonic_ns()
+        chunks = []
+        meta = {}
+        async for delta in stream_llm_response(request.query, request.session_id, model, meta,
+                                             user_id=getattr(request, 'user_id', None) or "default_user"):
+            chunks.append(delta)
+            yield delta
+        
+        answer = "".join(chunks)
+        if meta.get("from_cache") or meta.get("firewall_blocked"):
+            # Served without calling the provider, so nothing was spent
+            usage = {"prompt_tokens": 0, "completion_tokens": 0, "tokens_used": 0, "cost": 0.0}
+        elif "prompt_tokens" in meta:
+            # Fresh completion: the stream reported the provider's usage and its cost
+            usage = meta
+        else:
+            input_tokens = self.count_tokens(request.query, model)
+            output_tokens = self.count_tokens(answer, model)
+            usage = {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "tokens_used": input_tokens + output_tokens,
+                "cost": calculate_cost(model, input_tokens, output_tokens),
+            }
+        response = AgentResponse({
+            "answer": answer,
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
+            "tokens_used": usage["tokens_used"],
+            "cost": usage["cost"],
+            "from_cache": meta.get("from_cache", False),
+            "similarity": meta.get("similarity"),
+            "firewall_blocked": meta.get("firewall_blocked", False),
+            "latency_ms": (time.monotonic_ns() - start_ns) // 1_000_000
+        }, model)
+        if db_session is not None:
+            await _persist_rows([_build_row(request, response, self.organization_id)], db_session)
+
+    async def get_organization_metrics(self, db, days: int = 30) -> dict:
+        """Aggregate prompt usage for the organization in a single query"""
+        cutoff_date = datetime.utcnow() - timedelta(days=days)
+        query = select(
+            func.count(PromptExecution.prompt_id),
+            func.sum(PromptExecution.cost),
+            func.sum(PromptExecution.total_tokens),
+            func.avg(PromptExecution.latency_ms).filter(PromptExecution.status == "success")
+        ).where(
+            PromptExecution.organization_id == self.organization_id,
+            PromptExecution.timestamp >= cutoff_date
+        )
+        total_prompts, total_cost, total_tokens, avg_latency = (await db.execute(query)).one()
+        return {
+            "organization_id": self.organization_id,
+            "period_days": days,
+            "total_prompts": total_prompts or 0,
+            "total_cost": float(total_cost or 0.0),
+            "total_tokens": int(total_tokens or 0),
+            "avg_latency_ms": float(avg_latency or 0.0)
+        }
+
+    async def _call_llm(self, request) -> AgentResponse:
+        """Run one prompt through main_response without touching the database"""
+        start_ns = time.monotonic_ns()
+        # Get model from request or use default
+        model = getattr(request, 'model', 'gpt-3.5-turbo')
+        
+        # Semantic cache lookup runs before any OpenAI work
+        use_cache = self.cache is not None and cache_settings.ENABLED
+        if use_cache:
+            lookup = CacheLookupRequest(session_id=request.session_id, prompt=request.query)
+            try:
+                cached = await asyncio.to_thread(cache_lookup, self.cache, lookup)
+            except Exception as e:
+                # A cache outage must not fail the prompt; treat it as a miss
+                logger.warning(f"Semantic cache lookup failed: {e}")
+                cached = None
+            # A hit is only served to a prompt that passes the firewall; otherwise it is treated as a
+            # miss and generate_llm_response answers with its traced block response
+            if cached is not None and cached.from_cache and await self._passes_firewall(request.query):
+                return AgentResponse({
+                    "answer": cached.response,
+                    "from_cache": True,
+                    "similarity": cached.similarity,
+                    "latency_ms": (time.monotonic_ns() - start_ns) // 1_000_000
+                }, model)
+        
+        # Call the main_response function with model parameter
+        result = await generate_llm_response(request.query, request.session_id, model=model)
+        
+        if use_cache and not result.get("from_cache") and not result.get("firewall_blocked"):
+            task = asyncio.create_task(asyncio.to_thread(cache_store, self.cache, request.session_id, request.query, result.get("answer", "")))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+        
+        result["latency_ms"] = (time.monotonic_ns() - start_ns) // 1_000_000
+        return AgentResponse(result, model)
+
+    async def _passes_firewall(self, query: str) -> bool:
+        try:
+            scan = await firewall_scan(query)
         except Exception as e:
-            raise Exception(f"Agent processing failed: {str(e)}")
+            logger.warning(f"Firewall scan of cached prompt failed: {e}")
+            return False
+        return not _scan_blocked(scan)
+
+    async def process_prompt_batch(self, requests: List) -> List:
+        """Process several prompts together; failures are returned in place of their responses"""
+        await self.prewarm_embeddings(requests)
+        return await asyncio.gather(*(self.process_prompt(request) for request in requests), return_exceptions=True)
+
+    async def prewarm_embeddings(self, requests: List):
+        """Embed every prompt in one forward pass so the per-prompt cache lookups and writes hit the memo"""
+        if self.cache is None or not cache_settings.ENABLED or not cache_settings.USE_SEMANTIC_CACHE:
+            return
+        try:
+            await asyncio.to_thread(embed_texts, [request.query for request in requests])
+        except Exception as e:
+            logger.warning(f"Batch embedding prewarm failed: {e}")
+
+    async def _call_llm_batch(self, requests: List) -> List:
+        """Run a coalesced batch; failures are returned in place so one bad prompt doesn't sink the rest"""
+        return await asyncio.gather(*(self._call_llm(request) for request in requests), return_exceptions=True)
 
 class PromptResponseService:
     def __init__(self, organization_id="default"):
         self.organization_id = organization_id
         self.agent = PromptResponseAgent(organization_id=organization_id)
+        self.max_concurrency = 5
+
+    async def process_batch(self, requests: List, use_batch_api: bool = False, db=None,
+                            owns_transaction: bool = False) -> List:
+        """Process many prompts, either online or through the OpenAI Batch API.
+        
+        Online results are persisted as they complete, in bulk inserts of PERSIST_FLUSH_SIZE rows;
+        a failed prompt leaves its exception in place of the response. Each insert is committed
+        unless owns_transaction says the caller will commit db itself.
+        """
+        if use_batch_api:
+            responses = await self.process_batch_offline(requests)
+            if db is not None:
+                rows = [
+                    _build_row(request, response, self.organization_id)
+                    for request, response in zip(requests, responses)
+                    if not isinstance(response, Exception)
+                ]
+                await _persist_rows(rows, db, owns_transaction)
+            return responses
+        
+        await self.agent.prewarm_embeddings(requests)
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def process_with_semaphore(index, request):
+            async with semaphore:
+                try:
+                    return index, await self.agent._call_llm(request)
+                except Exception as e:
+                    return index, e
+        
+        responses = [None] * len(requests)
+        pending_rows = []
+        tasks = [asyncio.ensure_future(process_with_semaphore(i, request)) for i, request in enumerate(requests)]
+        for next_done in asyncio.as_completed(tasks):
+            index, response = await next_done
+            responses[index] = response
+            if db is None or isinstance(response, Exception):
+                continue
+            pending_rows.append(_build_row(requests[index], response, self.organization_id))
+            if len(pending_rows) >= PERSIST_FLUSH_SIZE:
+                await _persist_rows(pending_rows, db, owns_transaction)
+                pending_rows = []
+        
+        if db is not None:
+            await _persist_rows(pending_rows, db, owns_transaction)
+        return responses
+
+    async def process_batch_offline(self, requests: List) -> List:
+        """Submit prompts as one Batch API job and demux the results by custom_id.
+        
+        Prompts are firewall-scanned first; blocked ones are answered in place and never uploaded.
+        A prompt the batch failed comes back as an AgentProcessingError in place of its response.
+        """
+        prompt_ids = [_new_prompt_id() for _ in requests]
+        models = [getattr(request, 'model', None) or 'gpt-3.5-turbo' for request in requests]
+        queries = [request.query.strip() for request in requests]
+        
+        scans = await asyncio.gather(*(firewall_scan(query) for query in queries))
+        blocked = {
+            prompt_id: {"answer": FIREWALL_BLOCKED_ANSWER, "firewall_blocked": True}
+            for prompt_id, scan in zip(prompt_ids, scans)
+            if _scan_blocked(scan)
+        }
+        
+        lines = []
+        for prompt_id, model, query in zip(prompt_ids, models, queries):
+            if prompt_id in blocked:
+                continue
+            lines.append(json.dumps({
+                "custom_id": prompt_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": model,
+                    "messages": [
+                        {"role": "system", "content": SYSTEM_INSTRUCTION},
+                        {"role": "user", "content": query}
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.2
+                }
+            }))
+        
+        results, errors = await self._run_batch_job(lines) if lines else ({}, {})
+        
+        # Price the whole batch in one vectorized pass
+        costs = calculate_costs(
+            models,
+            [results.get(prompt_id, {}).get("prompt_tokens", 0) for prompt_id in prompt_ids],
+            [results.get(prompt_id, {}).get("completion_tokens", 0) for prompt_id in prompt_ids]
+        )
+        for prompt_id, cost in zip(prompt_ids, costs):
+            if prompt_id in results:
+                results[prompt_id]["cost"] = float(cost)
+        
+        responses = []
+        for prompt_id, model in zip(prompt_ids, models):
+            if prompt_id in blocked:
+                responses.append(AgentResponse(blocked[prompt_id], model, prompt_id=prompt_id))
+            elif prompt_id in results:
+                responses.append(AgentResponse(results[prompt_id], model, prompt_id=prompt_id))
+            else:
+                PROMPT_ERRORS.labels(kind="llm").inc()
+                responses.append(AgentProcessingError(errors.get(prompt_id, "No result returned by the batch")))
+        return responses
+
+    async def _run_batch_job(self, lines: List[str]) -> tuple:
+        """Upload request lines, wait for the batch to finish and return (results, errors) by custom_id"""
+        openai_client = self.agent.openai_client
+        payload = io.BytesIO("\n".join(lines).encode("utf-8"))
+        
+        batch_file = await openai_client.files.create(file=("batch.jsonl", payload), purpose="batch")
+        batch = await openai_client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        while batch.status not in BATCH_TERMINAL_STATES:
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await openai_client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed":
+            raise AgentProcessingError(f"Batch {batch.id} finished with status {batch.status}")
+        
+        results = {}
+        errors = {}
+        # Failed requests land in the error file, but a non-200 line can also appear in the output file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await openai_client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                error = record.get("error") or body.get("error")
+                if error or response.get("status_code") != 200:
+                    errors[record["custom_id"]] = f"Batch request failed: {(error or {}).get('message') or response.get('status_code')}"
+                    continue
+                usage = body.get("usage") or {}
+                choices = body.get("choices") or [{}]
+                results[record["custom_id"]] = {
+                    "answer": (choices[0].get("message") or {}).get("content", ""),
+                    "tokens_used": usage.get("total_tokens", 0),
+                    "prompt_tokens": usage.get("prompt_tokens", 0),
+                    "completion_tokens": usage.get("completion_tokens", 0)
+                }
+        return results, errors
 
-__all__ = ["PromptResponseAgent", "PromptResponseService", "generate_llm_response", "QueryRequest", "QueryResponse"]
\ No newline at end of file
+__all__ = ["PromptResponseAgent", "PromptResponseService", "AgentResponse", "AgentProcessingError", "BatchCoalescer", "estimate_tokens", "generate_llm_response", "firewall_scan", "QueryRequest", "QueryResponse"]
\ No newline at end of file
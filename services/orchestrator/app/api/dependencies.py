@@ -1,17 +1,25 @@
 """FastAPI dependency providers for orchestrator services."""
 
+import os
+from functools import lru_cache
+
 from fastapi import Request
 
 
+@lru_cache(maxsize=1)
+def _fallback_agent():
+	"""Build the fallback prompt agent once per process."""
+	from ..agents import PromptResponseAgent
+	return PromptResponseAgent(
+		openai_api_key=os.getenv("OPENAI_API_KEY"),
+		organization_id=os.getenv("ORGANIZATION_ID", "default-org")
+	)
+
+
 async def get_prompt_agent(request: Request):
 	"""Dependency to get prompt response agent from app state."""
-	if hasattr(request.app.state, 'prompt_agent') and request.app.state.prompt_agent:
-		return request.app.state.prompt_agent
-	else:
-		# Fallback: create a new agent instance
-		import os
-		from ..agents import PromptResponseAgent
-		return PromptResponseAgent(
-			openai_api_key=os.getenv("OPENAI_API_KEY"),
-			organization_id=os.getenv("ORGANIZATION_ID", "default-org")
-		)
\ No newline at end of file
+	agent = getattr(request.app.state, 'prompt_agent', None)
+	if not agent:
+		# Fallback: share one agent and pin it to app state so later requests skip the factory
+		agent = request.app.state.prompt_agent = _fallback_agent()
+	return agent
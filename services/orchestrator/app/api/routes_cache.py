@@ -6,25 +6,35 @@ Provides endpoints for cache statistics, management, and monitoring.
 Integrates with the existing prompt-response agent Redis cache.
 """
 
-import json
+import csv
+import io
 import time
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import logging
+import orjson
 
 # Import the existing cache system (prompt-response agent cache)
-from ..services.Caching.cache import RedisCache, settings
+from ..services.Caching.cache import RedisCache, settings, embedding_cache_hit_rate, FULL_CSV_HEADER
 from ..services.Caching.settings import CacheConfig
 from ..db.database import db_manager
 
 logger = logging.getLogger(__name__)
 
 
-router = APIRouter(prefix="/api/v1/cache", tags=["cache"])
+class NumpyORJSONResponse(ORJSONResponse):
+    """FastAPI's ORJSONResponse, guaranteed to serialize numpy values from the cache natively"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+router = APIRouter(prefix="/api/v1/cache", tags=["cache"], default_response_class=NumpyORJSONResponse)
 
 
 class CacheStatsResponse(BaseModel):
@@ -36,6 +46,7 @@ class CacheStatsResponse(BaseModel):
     ttl_seconds: int
     similarity_threshold: float
     semantic_cache_enabled: bool
+    embedding_cache_hit_rate: Optional[float] = None
 
 
 class CacheEntry(BaseModel):
@@ -55,12 +66,17 @@ async def get_orchestrator_db():
     async for session in db_manager.get_session():
         yield session
 
+@lru_cache(maxsize=1)
+def _cache_singleton() -> RedisCache:
+    """Process-wide cache; handlers share its connection pool and config is loaded once"""
+    cache = RedisCache()
+    cache.load_config()  # Load persisted configuration
+    return cache
+
 def get_cache() -> RedisCache:
     """Dependency to get cache instance"""
     try:
-        cache = RedisCache()
-        cache.load_config()  # Load persisted configuration
-        return cache
+        return _cache_singleton()
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Cache service initialization failed: {str(e)}")
 
@@ -73,10 +89,11 @@ async def get_cache_statistics(
 ):
     """
     Get comprehensive cache statistics including hit rates and memory usage.
-    Queries Phoenix spans for actual cache request metrics.
+    The hit rate covers the time window, read from the cache's hourly lookup counters or,
+    when it served no lookups in the window, from Phoenix cache spans.
     
     Args:
-        time_window_hours: Number of hours to look back for cache metrics (default: 24)
+        time_window_hours: Number of hours to look back for cache metrics (default: 24, at most 720)
     
     Returns:
         CacheStatsResponse: Cache statistics and configuration
@@ -86,61 +103,62 @@ async def get_cache_statistics(
         if not cache.ping():
             raise HTTPException(status_code=503, detail="Cache service unavailable")
         
-        # Get cache entries count from Redis
+        # Count base keys only; payloads are never fetched
         try:
-            entries = cache.list_keys()
-            total_entries = len(entries)
+            total_entries = cache.count_entries()
         except Exception as e:
             logger.warning(f"Failed to get cache entries: {e}")
             total_entries = 0
         
-        # Query Phoenix for actual cache hit rate metrics
-        hit_rate = 0.0
-        try:
-            # Calculate time window
-            end_time = datetime.now(timezone.utc)
-            start_time = end_time - timedelta(hours=time_window_hours)
-            
-            # Query Phoenix spans for cache lookup metrics
-            query = text("""
-                WITH cache_lookups AS (
+        # Hit rate over the window comes from the hourly server-side counters maintained on every lookup
+        hits, accesses = cache.lookup_metrics(time_window_hours)
+        hit_rate = (hits * 100.0 / accesses) if accesses else 0.0
+        
+        # Fall back to Phoenix spans for the same window when this cache served no lookups in it
+        if not accesses:
+            try:
+                # Calculate time window
+                end_time = datetime.now(timezone.utc)
+                start_time = end_time - timedelta(hours=time_window_hours)
+                
+                # Query Phoenix spans for cache lookup metrics
+                query = text("""
+                    WITH cache_lookups AS (
+                        SELECT 
+                            COUNT(*) as total_requests,
+                            COUNT(*) FILTER (WHERE 
+                                (s.attributes->'moolai'->'cache'->>'hit')::boolean = true
+                            ) as cache_hits
+                        FROM phoenix.spans s
+                        WHERE s.name = 'moolai.cache.lookup'
+                        AND s.start_time >= :start_time
+                        AND s.start_time <= :end_time
+                    )
                     SELECT 
-                        COUNT(*) as total_requests,
-                        COUNT(*) FILTER (WHERE 
-                            (s.attributes->'moolai'->'cache'->>'hit')::boolean = true
-                        ) as cache_hits
-                    FROM phoenix.spans s
-                    WHERE s.name = 'moolai.cache.lookup'
-                    AND s.start_time >= :start_time
-                    AND s.start_time <= :end_time
-                )
-                SELECT 
-                    total_requests,
-                    cache_hits,
-                    CASE 
-                        WHEN total_requests > 0 THEN 
-                            (cache_hits * 100.0 / total_requests)
-                        ELSE 0 
-                    END as hit_rate
-                FROM cache_lookups;
-            """)
-            
-            result = await db.execute(query, {
-                'start_time': start_time,
-                'end_time': end_time
-            })
-            
-            row = result.fetchone()
-            if row:
-                hit_rate = float(row.hit_rate or 0)
-                logger.info(f"Cache metrics from Phoenix: {row.total_requests} requests, {row.cache_hits} hits, {hit_rate:.1f}% hit rate")
-            else:
-                logger.info(f"No cache metrics found in Phoenix for the last {time_window_hours} hours")
+                        total_requests,
+                        cache_hits,
+                        CASE 
+                            WHEN total_requests > 0 THEN 
+                                (cache_hits * 100.0 / total_requests)
+                            ELSE 0 
+                        END as hit_rate
+                    FROM cache_lookups;
+                """)
                 
-        except Exception as e:
-            logger.error(f"Failed to query Phoenix for cache metrics: {e}")
-            # Prometheus metrics are not needed since Phoenix is our source of truth
-            # The in-memory counters would reset on restart anyway
+                result = await db.execute(query, {
+                    'start_time': start_time,
+                    'end_time': end_time
+                })
+                
+                row = result.fetchone()
+                if row:
+                    hit_rate = float(row.hit_rate or 0)
+                    logger.info(f"Cache metrics from Phoenix: {row.total_requests} requests, {row.cache_hits} hits, {hit_rate:.1f}% hit rate")
+                else:
+                    logger.info(f"No cache metrics found in Phoenix for the last {time_window_hours} hours")
+                    
+            except Exception as e:
+                logger.error(f"Failed to query Phoenix for cache metrics: {e}")
         
         # Get memory usage info from Redis
         memory_usage = "unknown"
@@ -158,7 +176,8 @@ async def get_cache_statistics(
             cache_enabled=settings.ENABLED,
             ttl_seconds=settings.CACHE_TTL,
             similarity_threshold=settings.SIMILARITY_THRESHOLD,
-            semantic_cache_enabled=settings.USE_SEMANTIC_CACHE
+            semantic_cache_enabled=settings.USE_SEMANTIC_CACHE,
+            embedding_cache_hit_rate=embedding_cache_hit_rate()
         )
         
     except Exception as e:
@@ -169,32 +188,33 @@ async def get_cache_statistics(
 @router.get("/entries")
 async def get_cache_entries(
     limit: int = 100,
-    offset: int = 0,
+    cursor: int = 0,
+    skip: int = 0,
     cache: RedisCache = Depends(get_cache)
 ):
     """
-    Get paginated list of cache entries with metadata.
+    Get a page of cache entries with metadata.
+    
+    Pages are walked with a Redis SCAN cursor, so only the requested keys are read.
+    There is no total count; pass next_cursor and next_skip back until has_more is false.
     
     Args:
-        limit: Maximum number of entries to return (default: 100)
-        offset: Number of entries to skip (default: 0)
+        limit: Maximum number of entries to return per page (default: 100)
+        cursor: next_cursor returned by the previous page; 0 starts from the beginning
+        skip: next_skip returned by the previous page
         
     Returns:
-        List of cache entries with metadata
+        List of cache entries with metadata and the position of the next page
     """
     try:
         if not cache.ping():
             raise HTTPException(status_code=503, detail="Cache service unavailable")
         
-        # Get all records from cache
-        records = cache.export_records()
-        
-        # Apply pagination
-        paginated_records = records[offset:offset + limit]
+        next_cursor, next_skip, records = cache.scan_records(cursor=cursor, count=limit, skip=skip)
         
         # Convert to response format
         entries = []
-        for record in paginated_records:
+        for record in records:
             entry = CacheEntry(
                 key=record.get("key", ""),
                 session_id=record.get("session_id"),
@@ -209,10 +229,12 @@ async def get_cache_entries(
         
         return {
             "entries": entries,
-            "total": len(records),
             "limit": limit,
-            "offset": offset,
-            "has_more": (offset + limit) < len(records)
+            "cursor": cursor,
+            "skip": skip,
+            "next_cursor": next_cursor,
+            "next_skip": next_skip,
+            "has_more": next_cursor != 0 or next_skip != 0
         }
         
     except Exception as e:
@@ -232,8 +254,7 @@ async def clear_cache(cache: RedisCache = Depends(get_cache)):
             raise HTTPException(status_code=503, detail="Cache service unavailable")
         
         # Get count before clearing
-        entries = cache.list_keys()
-        entry_count = len(entries)
+        entry_count = cache.count_entries()
         
         # Clear the cache
         cache.clear()
@@ -386,33 +407,50 @@ async def export_cache_data(format: str = "json", cache: RedisCache = Depends(ge
     """
     Export cache data in specified format.
     
+    The export is streamed one SCAN batch at a time, so memory stays flat regardless of cache size.
+    
     Args:
         format: Export format ('json' or 'csv')
         
     Returns:
-        Cache data in requested format
+        Streamed cache data in requested format
     """
     try:
         if not cache.ping():
             raise HTTPException(status_code=503, detail="Cache service unavailable")
         
         if format.lower() == "json":
-            data = cache.export_json()
-            return {
-                "format": "json",
-                "data": data,
-                "entry_count": len(data),
-                "exported_at": time.time()
-            }
+            def generate_json():
+                yield b'{"format": "json", "data": {'
+                entry_count = 0
+                for key, value, _, _ in cache.iter_entries():
+                    yield (b"," if entry_count else b"") + orjson.dumps(key) + b": " + orjson.dumps(value)
+                    entry_count += 1
+                yield f'}}, "entry_count": {entry_count}, "exported_at": {time.time()}}}'.encode()
+            
+            return StreamingResponse(generate_json(), media_type="application/json")
         elif format.lower() == "csv":
-            csv_data = cache.export_full_csv()
-            return {
-                "format": "csv",
-                "data": csv_data,
-                "exported_at": time.time()
-            }
+            def generate_csv():
+                output = io.StringIO()
+                writer = csv.writer(output)
+                writer.writerow(FULL_CSV_HEADER)
+                for entry in cache.iter_entries():
+                    rec = cache._build_record(*entry)
+                    writer.writerow([rec.get(column) for column in FULL_CSV_HEADER])
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate(0)
+                yield output.getvalue()
+            
+            return StreamingResponse(
+                generate_csv(),
+                media_type="text/csv",
+                headers={"Content-Disposition": "attachment; filename=cache_export.csv"}
+            )
         else:
             raise HTTPException(status_code=400, detail="Unsupported format. Use 'json' or 'csv'")
             
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to export cache data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to export cache data: {str(e)}")
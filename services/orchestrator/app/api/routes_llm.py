@@ -6,12 +6,22 @@ Provides endpoints for LLM prompt processing with caching and agent integration.
 Integrates with the existing prompt-response agent and caching system.
 """
 
+import asyncio
+import functools
+import hashlib
 import os
+import threading
 import time
-import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from secrets import token_hex
 from typing import Dict, Any, Optional
+import numpy as np
+import orjson
 from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
 # Phoenix/OpenTelemetry observability
@@ -22,12 +32,267 @@ except ImportError:
     TRACING_AVAILABLE = False
 
 # Import the existing prompt-response agent
-from ..agents import PromptResponseAgent
+from ..agents import PromptResponseAgent, QueryRequest, BatchCoalescer, AgentProcessingError, firewall_scan, _scan_blocked
+from ..db.database import db_manager, get_db
+from ..services.Caching.cache import embed_texts, settings as cache_settings
 from .dependencies import get_prompt_agent
+from .routes_websocket import mark_analytics_dirty
 
 
-router = APIRouter(prefix="/api/v1/llm", tags=["llm"])
-agents_router = APIRouter(prefix="/api/v1/agents", tags=["agents"])
+router = APIRouter(prefix="/api/v1/llm", tags=["llm"], default_response_class=ORJSONResponse)
+agents_router = APIRouter(prefix="/api/v1/agents", tags=["agents"], default_response_class=ORJSONResponse)
+
+# Static model catalogue, built once at import rather than on every /models call
+AVAILABLE_MODELS = (
+    {
+        "id": "gpt-3.5-turbo",
+        "name": "GPT-3.5 Turbo",
+        "description": "Fast and efficient model for most tasks",
+        "max_tokens": 4096,
+        "input_cost_per_1k": 0.001,
+        "output_cost_per_1k": 0.002,
+        "available": True
+    },
+    {
+        "id": "gpt-4",
+        "name": "GPT-4",
+        "description": "Most capable model for complex reasoning",
+        "max_tokens": 8192,
+        "input_cost_per_1k": 0.03,
+        "output_cost_per_1k": 0.06,
+        "available": True
+    },
+)
+
+# /models body encoded once; the handler only appends the response timestamp
+_MODELS_PAYLOAD_PREFIX = orjson.dumps({"models": AVAILABLE_MODELS, "default_model": "gpt-3.5-turbo"})[:-1]
+
+
+@dataclass(slots=True, frozen=True)
+class AgentRequestInternal:
+    """Prompt handed to the agent by the HTTP endpoints"""
+    query: str
+    session_id: str
+    model: str = "gpt-3.5-turbo"
+    use_cache: bool = True
+
+
+# Process-local semantic cache consulted before the agent; a hit is one dot product against the stored prompts
+LOCAL_CACHE_ENABLED = os.getenv("LOCAL_CACHE_ENABLED", "true").lower() == "true"
+LOCAL_CACHE_THRESHOLD = float(os.getenv("LOCAL_CACHE_THRESHOLD", "0.87"))
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "10000"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", str(cache_settings.CACHE_TTL)))
+
+
+class LocalSemanticCache:
+    """Flat inner-product index over unit prompt embeddings, oldest entries overwritten once full.
+    
+    Entries are scoped to a (session_id, model) pair, so an answer is only served back to the
+    session that received it, matching the isolation of the agent's own cache, and expire after
+    LOCAL_CACHE_TTL seconds like its Redis entries. Searches run in cpu_pool threads while adds run
+    on the event loop; a threading lock keeps each row's vector, scope, timestamp and response
+    consistent, and is only held by searches to re-check the winning row.
+    """
+    
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, threshold: float = LOCAL_CACHE_THRESHOLD,
+                 ttl: float = LOCAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix: Optional[np.ndarray] = None
+        self._scopes = np.zeros(max_entries, dtype=np.int64)  # hash of each row's scope, for vectorized filtering
+        self._added_at = np.zeros(max_entries, dtype=np.float64)  # time.monotonic() of each row's write
+        self._entries: list = []  # (response, scope) per matrix row
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def embed(prompts: list) -> np.ndarray:
+        """Unit embeddings for all prompts, encoded in one forward pass"""
+        # Shares the semantic cache's embedding memo, so the agent's own lookups reuse these vectors
+        embeddings = np.stack(embed_texts(prompts)).astype(np.float32)
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    
+    def embed_and_search(self, prompts: list, scopes: list) -> tuple:
+        """CPU-bound half of a lookup: (unit embeddings, per-prompt hits)"""
+        embeddings = self.embed(prompts)
+        return embeddings, self.search(embeddings, scopes)
+    
+    def search(self, embeddings: np.ndarray, scopes: list) -> list:
+        """(response, similarity) of the closest live stored prompt in each row's (session_id, model) scope,
+        or None below the threshold"""
+        with self._lock:
+            size, matrix = self._size, self._matrix
+        if not size:
+            return [None] * len(scopes)
+        # Scored without the lock: a row overwritten meanwhile is caught by the re-check below
+        scores = embeddings @ matrix[:size].T
+        live = self._added_at[:size] >= time.monotonic() - self.ttl
+        row_scopes = self._scopes[:size]
+        hits = []
+        for row, scope in enumerate(scopes):
+            candidates = np.flatnonzero((row_scopes == hash(scope)) & live)
+            if not len(candidates):
+                hits.append(None)
+                continue
+            best = candidates[np.argmax(scores[row, candidates])]
+            with self._lock:
+                response, cached_scope = self._entries[best]
+                score = float(embeddings[row] @ matrix[best])
+                fresh = self._added_at[best] >= time.monotonic() - self.ttl
+            hits.append((response, score) if fresh and score >= self.threshold and cached_scope == scope else None)
+        return hits
+    
+    def add(self, embedding: np.ndarray, response: str, scope: tuple):
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+            row = self._next
+            self._matrix[row] = embedding
+            self._scopes[row] = hash(scope)
+            self._added_at[row] = time.monotonic()
+            if row < len(self._entries):
+                self._entries[row] = (response, scope)
+            else:
+                self._entries.append((response, scope))
+            self._next = (row + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+
+local_cache = LocalSemanticCache()
+
+# Embedding and similarity search run here rather than on the event loop or the default to_thread pool,
+# which DB and Redis calls share; torch and NumPy release the GIL, so threads run them in parallel
+# without a per-process copy of the embedding model. The pool lives as long as the process and is never
+# shut down by the app lifespan, so a second lifespan in the same process can still use it
+cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="llm-cpu")
+
+
+async def _screen_local_hits(requests: list, results: list):
+    """Firewall-scan the prompts answered from the local cache and trace the hits that pass.
+    
+    A blocked (or unscannable) prompt is turned back into a miss, so the agent applies the
+    firewall itself and answers with its traced block response.
+    """
+    hit_rows = [i for i, result in enumerate(results) if result is not None]
+    if not hit_rows:
+        return
+    scans = await asyncio.gather(*(firewall_scan(requests[i].query) for i in hit_rows), return_exceptions=True)
+    tracer = trace.get_tracer(__name__) if TRACING_AVAILABLE else None
+    for i, scan in zip(hit_rows, scans):
+        if isinstance(scan, BaseException) or _scan_blocked(scan):
+            results[i] = None
+        elif tracer:
+            with tracer.start_as_current_span("moolai.request.process") as span:
+                span.set_attribute("moolai.session_id", requests[i].session_id)
+                span.set_attribute("moolai.llm.model", requests[i].model)
+                span.set_attribute("moolai.firewall.blocked", False)
+                span.set_attribute("moolai.cache.hit", True)
+                span.set_attribute("moolai.cache.local", True)
+                span.set_attribute("moolai.cache.similarity", results[i][1])
+
+
+async def dispatch_prompts(agent: PromptResponseAgent, requests: list) -> list:
+    """Answer a batch from the local cache where possible and send the rest to the agent together.
+    
+    Hits come back as (response, similarity) tuples, failures as exceptions in place.
+    """
+    results = [None] * len(requests)
+    cacheable = [i for i, request in enumerate(requests) if LOCAL_CACHE_ENABLED and request.use_cache]
+    embeddings = {}
+    if cacheable:
+        try:
+            matrix, hits = await asyncio.get_running_loop().run_in_executor(
+                cpu_pool, local_cache.embed_and_search,
+                [requests[i].query for i in cacheable], [(requests[i].session_id, requests[i].model) for i in cacheable]
+            )
+            for row, i in enumerate(cacheable):
+                embeddings[i] = matrix[row]
+                results[i] = hits[row]
+        except Exception:
+            embeddings = {}
+        await _screen_local_hits(requests, results)
+    
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        miss_requests = [requests[i] for i in misses]
+        if hasattr(agent, "process_prompt_batch"):
+            responses = await agent.process_prompt_batch(miss_requests)
+        else:
+            responses = await asyncio.gather(*(agent.process_prompt(r) for r in miss_requests), return_exceptions=True)
+        for i, response in zip(misses, responses):
+            results[i] = response
+            if (i in embeddings and not isinstance(response, BaseException)
+                    and response.response and not response.firewall_blocked):
+                local_cache.add(embeddings[i], response.response, (requests[i].session_id, requests[i].model))
+        mark_analytics_dirty()
+    return results
+
+
+# Concurrent /prompt calls arriving within PROMPT_BATCH_TIMEOUT_MS are handed to the agent as one batch;
+# opt-in like COALESCE_ENABLED, since a lone prompt still waits out the window
+PROMPT_BATCHING_ENABLED = os.getenv("PROMPT_BATCHING_ENABLED", "false").lower() == "true"
+PROMPT_MAX_BATCH = int(os.getenv("PROMPT_MAX_BATCH", "16"))
+PROMPT_BATCH_TIMEOUT_MS = int(os.getenv("PROMPT_BATCH_TIMEOUT_MS", "15"))
+_prompt_batchers = weakref.WeakKeyDictionary()
+
+
+def get_prompt_batcher(agent: PromptResponseAgent) -> BatchCoalescer:
+    """One micro-batcher per agent; its worker task starts on the first submitted prompt"""
+    batcher = _prompt_batchers.get(agent)
+    if batcher is None:
+        batcher = _prompt_batchers[agent] = BatchCoalescer(
+            functools.partial(dispatch_prompts, agent), PROMPT_MAX_BATCH, PROMPT_BATCH_TIMEOUT_MS
+        )
+    return batcher
+
+
+# Identical prompts already in flight in the same session share one agent call:
+# (session_id, model, use_cache, prompt digest) -> future
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+
+async def _run_prompt(agent: PromptResponseAgent, agent_request: AgentRequestInternal):
+    """Answer one prompt through the micro-batcher (or directly), raising its failure"""
+    if PROMPT_BATCHING_ENABLED:
+        return await get_prompt_batcher(agent).submit(agent_request)
+    result = (await dispatch_prompts(agent, [agent_request]))[0]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+async def run_prompt_single_flight(agent: PromptResponseAgent, agent_request: AgentRequestInternal):
+    """Run a prompt, or wait on the identical one already running in its session and reuse its result.
+    
+    If that leader is cancelled, the first waiter to wake runs the prompt itself instead of failing.
+    """
+    digest = hashlib.blake2b(agent_request.query.encode(), digest_size=16).hexdigest()
+    key = (agent_request.session_id, agent_request.model, agent_request.use_cache, digest)
+    while (future := _inflight.get(key)) is not None:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _run_prompt(agent, agent_request)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so a leader without followers doesn't log a warning
+        raise
+    finally:
+        if _inflight.get(key) is future:
+            del _inflight[key]
 
 
 class PromptRequest(BaseModel):
@@ -76,7 +341,9 @@ class AgentRequest(BaseModel):
 
 
 
-@router.post("/prompt", response_model=PromptResponse)
+# PromptResponse documents the body; it is not declared as response_model, which would dump and
+# re-validate the model_construct result this route builds to skip validation
+@router.post("/prompt", responses={200: {"model": PromptResponse}})
 async def process_llm_prompt(
     request: PromptRequest,
     agent: PromptResponseAgent = Depends(get_prompt_agent)
@@ -95,11 +362,11 @@ async def process_llm_prompt(
     Returns:
         PromptResponse: Complete response with metrics and cache information
     """
-    start_time = time.time()
-    prompt_id = f"prompt_{uuid.uuid4().hex[:8]}"
+    start_ns = time.monotonic_ns()
+    prompt_id = f"prompt_{token_hex(4)}"
     
     # Generate session ID if not provided
-    session_id = request.session_id or f"session_{uuid.uuid4().hex[:8]}"
+    session_id = request.session_id or f"session_{token_hex(4)}"
     
     # Phoenix/OpenTelemetry tracing
     tracer = trace.get_tracer("llm-service") if TRACING_AVAILABLE else None
@@ -111,77 +378,138 @@ async def process_llm_prompt(
         span.set_attribute("llm.user_id", request.user_id or "anonymous")
         span.set_attribute("llm.use_cache", request.use_cache)
     
+    # Process using agent (main_response.py handles its own caching)
+    if not agent:
+        raise HTTPException(status_code=503, detail="Prompt response agent not available")
+    
+    agent_request = AgentRequestInternal(
+        query=request.prompt, session_id=session_id, model=request.model, use_cache=request.use_cache
+    )
+    
+    # Concurrent prompts share one embedding pass and local-cache search before reaching the agent;
+    # exact duplicates already in flight wait on the original instead
     try:
-        # Process using agent (main_response.py handles its own caching)
-        if not agent:
-            raise HTTPException(status_code=503, detail="Prompt response agent not available")
-        
-        # Create agent request
-        class AgentRequestInternal:
-            def __init__(self, query, session_id, model="gpt-3.5-turbo"):
-                self.query = query
-                self.session_id = session_id
-                self.model = model
-        
-        agent_request = AgentRequestInternal(request.prompt, session_id, request.model)
-        
-        # Process with agent (main_response.py handles caching internally)
-        agent_response = await agent.process_prompt(agent_request)
-        
-        # Calculate latency
-        latency_ms = int((time.time() - start_time) * 1000)
-        
-        # Prepare response (get cache info from agent response)
-        response = PromptResponse(
+        result = await run_prompt_single_flight(agent, agent_request)
+    except AgentProcessingError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process prompt: {str(e)}")
+    
+    # Calculate latency
+    latency_ms = (time.monotonic_ns() - start_ns) // 1_000_000
+    
+    # Paraphrases of an answered prompt are served from the local cache without reaching the agent
+    if isinstance(result, tuple):
+        cached_response, similarity = result
+        if span:
+            span.set_attribute("cache.hit", True)
+            span.set_attribute("cache.similarity", similarity)
+        return ORJSONResponse(PromptResponse.model_construct(
             prompt_id=prompt_id,
-            response=agent_response.response,
-            model=getattr(agent_response, 'model', request.model),
+            response=cached_response,
+            model=request.model,
             session_id=session_id,
             user_id=request.user_id,
-            timestamp=datetime.now(),
-            total_tokens=getattr(agent_response, 'total_tokens', 0),
-            prompt_tokens=len(request.prompt.split()),  # Approximate
-            completion_tokens=getattr(agent_response, 'total_tokens', 0) - len(request.prompt.split()),
-            cost=getattr(agent_response, 'cost', 0.0),
+            timestamp=datetime.utcnow(),
+            total_tokens=0,
+            prompt_tokens=agent.count_tokens(request.prompt, request.model),
+            completion_tokens=0,
+            cost=0.0,
             latency_ms=latency_ms,
-            from_cache=getattr(agent_response, 'from_cache', False),
-            cache_similarity=getattr(agent_response, 'cache_similarity', None)
-        )
-        
-        # Add cache information to Phoenix span if available
-        if span and TRACING_AVAILABLE:
-            span.set_attribute("cache.hit", response.from_cache)
-            if response.cache_similarity is not None:
-                span.set_attribute("cache.similarity", response.cache_similarity)
-            span.set_attribute("llm.response.cost", response.cost)
-            span.set_attribute("llm.response.latency_ms", response.latency_ms)
+            from_cache=True,
+            cache_similarity=similarity
+        ).model_dump())
+    agent_response = result
+    
+    # Token counts are read once; the prompt is only tokenized when the provider reported no usage
+    total_tokens = int(agent_response.total_tokens or 0)
+    prompt_tokens = int(agent_response.input_tokens or agent.count_tokens(request.prompt, request.model))
+    completion_tokens = int(agent_response.output_tokens or max(total_tokens - prompt_tokens, 0))
+    
+    # Prepare response (get cache info from agent response); every field is already typed, so skip validation
+    response = PromptResponse.model_construct(
+        prompt_id=prompt_id,
+        response=agent_response.response,
+        model=agent_response.model or request.model,
+        session_id=session_id,
+        user_id=request.user_id,
+        timestamp=agent_response.timestamp,
+        total_tokens=total_tokens,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=float(agent_response.cost or 0.0),
+        latency_ms=latency_ms,
+        from_cache=agent_response.from_cache,
+        cache_similarity=agent_response.cache_similarity
+    )
+    
+    # Add cache information to Phoenix span if available
+    if span and TRACING_AVAILABLE:
+        span.set_attribute("cache.hit", response.from_cache)
+        if response.cache_similarity is not None:
+            span.set_attribute("cache.similarity", response.cache_similarity)
+        span.set_attribute("llm.response.cost", response.cost)
+        span.set_attribute("llm.response.latency_ms", response.latency_ms)
+    
+    # Also set cache attributes on the current active span (likely the OpenAI span)
+    if TRACING_AVAILABLE:
+        try:
+            current_span = trace.get_current_span()
+            if current_span and current_span != span:
+                # Use OpenInference semantic conventions for cache tracking
+                current_span.set_attribute("cache.hit", response.from_cache)
+                if response.cache_similarity is not None:
+                    current_span.set_attribute("cache.similarity", response.cache_similarity)
+                current_span.set_attribute("llm.response.cost", response.cost)
+                current_span.set_attribute("llm.response.latency_ms", response.latency_ms)
+                
+                # Add token count for cache tracking (following OpenInference conventions)
+                if response.from_cache:
+                    current_span.set_attribute("llm.token_count.prompt_details.cache_read", response.prompt_tokens)
+                else:
+                    current_span.set_attribute("llm.token_count.prompt_details.cache_write", response.prompt_tokens)
+        except Exception as e:
+            # Log but don't fail the request
+            pass
+    
+    
+    return ORJSONResponse(response.model_dump())
+
+
+
+@router.post("/prompt/stream")
+async def stream_llm_prompt(
+    request: PromptRequest,
+    agent: PromptResponseAgent = Depends(get_prompt_agent)
+):
+    """
+    Stream an LLM response as Server-Sent Events.
+    
+    Each chunk of the answer is sent as a `data:` event as soon as the model produces it;
+    the execution record is persisted after the final chunk.
+    
+    Args:
+        request: Prompt request with text and parameters
         
-        # Also set cache attributes on the current active span (likely the OpenAI span)
-        if TRACING_AVAILABLE:
+    Returns:
+        StreamingResponse: text/event-stream of answer deltas followed by a done event
+    """
+    if not agent:
+        raise HTTPException(status_code=503, detail="Prompt response agent not available")
+    
+    session_id = request.session_id or f"session_{token_hex(4)}"
+    agent_request = QueryRequest(query=request.prompt, session_id=session_id, model=request.model)
+    
+    async def event_stream():
+        # The session is opened here so it outlives the request handler while the stream runs
+        async with db_manager.session() as db:
             try:
-                current_span = trace.get_current_span()
-                if current_span and current_span != span:
-                    # Use OpenInference semantic conventions for cache tracking
-                    current_span.set_attribute("cache.hit", response.from_cache)
-                    if response.cache_similarity is not None:
-                        current_span.set_attribute("cache.similarity", response.cache_similarity)
-                    current_span.set_attribute("llm.response.cost", response.cost)
-                    current_span.set_attribute("llm.response.latency_ms", response.latency_ms)
-                    
-                    # Add token count for cache tracking (following OpenInference conventions)
-                    if response.from_cache:
-                        current_span.set_attribute("llm.token_count.prompt_details.cache_read", response.prompt_tokens)
-                    else:
-                        current_span.set_attribute("llm.token_count.prompt_details.cache_write", response.prompt_tokens)
+                async for delta in agent.stream_prompt(agent_request, db):
+                    yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+                yield b"event: done\ndata: {}\n\n"
+                mark_analytics_dirty()
             except Exception as e:
-                # Log but don't fail the request
-                pass
-        
-        
-        return response
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to process prompt: {str(e)}")
+                yield b"event: error\ndata: " + orjson.dumps({"error": str(e)}) + b"\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
 @router.get("/models")
@@ -192,30 +520,32 @@ async def list_available_models():
     Returns:
         Available models with descriptions and pricing information
     """
-    return {
-        "models": [
-            {
-                "id": "gpt-3.5-turbo",
-                "name": "GPT-3.5 Turbo",
-                "description": "Fast and efficient model for most tasks",
-                "max_tokens": 4096,
-                "input_cost_per_1k": 0.001,
-                "output_cost_per_1k": 0.002,
-                "available": True
-            },
-            {
-                "id": "gpt-4",
-                "name": "GPT-4",
-                "description": "Most capable model for complex reasoning",
-                "max_tokens": 8192,
-                "input_cost_per_1k": 0.03,
-                "output_cost_per_1k": 0.06,
-                "available": True
-            }
-        ],
-        "default_model": "gpt-3.5-turbo",
-        "timestamp": datetime.now()
-    }
+    timestamp = datetime.now().isoformat().encode()
+    return Response(content=_MODELS_PAYLOAD_PREFIX + b',"timestamp":"' + timestamp + b'"}', media_type="application/json")
+
+
+@router.get("/metrics")
+async def get_llm_usage_metrics(
+    days: int = 30,
+    agent: PromptResponseAgent = Depends(get_prompt_agent),
+    db = Depends(get_db)
+):
+    """
+    Get prompt usage totals for the agent's organization.
+    
+    Args:
+        days: Number of days to look back (default: 30)
+        
+    Returns:
+        Prompt count, cost, token and latency aggregates
+    """
+    if not agent:
+        raise HTTPException(status_code=503, detail="Prompt response agent not available")
+    
+    try:
+        return await agent.get_organization_metrics(db, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get usage metrics: {str(e)}")
 
 
 @router.get("/health")
@@ -274,7 +604,7 @@ async def call_prompt_response_agent(
     start_time = time.time()
     
     # Generate session ID if not provided
-    session_id = request.session_id or f"agent_session_{uuid.uuid4().hex[:8]}"
+    session_id = request.session_id or f"agent_session_{token_hex(4)}"
     
     # Phoenix/OpenTelemetry tracing
     tracer = trace.get_tracer("agent-service") if TRACING_AVAILABLE else None
@@ -285,57 +615,52 @@ async def call_prompt_response_agent(
         span.set_attribute("agent.user_id", request.user_id or "anonymous")
         span.set_attribute("agent.evaluation_enabled", request.enable_evaluation)
     
+    if not agent:
+        raise HTTPException(status_code=503, detail="Prompt response agent not available")
+    
+    agent_request = AgentRequestInternal(query=request.query, session_id=session_id)
+    
+    # Process with agent
     try:
-        if not agent:
-            raise HTTPException(status_code=503, detail="Prompt response agent not available")
-        
-        # Create agent request
-        class AgentRequestInternal:
-            def __init__(self, query, session_id):
-                self.query = query
-                self.session_id = session_id
-        
-        agent_request = AgentRequestInternal(request.query, session_id)
-        
-        # Process with agent
         agent_response = await agent.process_prompt(agent_request)
+    except AgentProcessingError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    mark_analytics_dirty()
+    
+    # Calculate latency
+    latency_ms = int((time.time() - start_time) * 1000)
+    
+    # Prepare response
+    response = {
+        "agent_response_id": f"agent_{token_hex(4)}",
+        "query": request.query,
+        "response": agent_response.response,
+        "session_id": session_id,
+        "user_id": request.user_id,
+        "timestamp": datetime.now(),
         
-        # Calculate latency
-        latency_ms = int((time.time() - start_time) * 1000)
+        # Agent metrics
+        "model": getattr(agent_response, 'model', 'unknown'),
+        "total_tokens": getattr(agent_response, 'total_tokens', 0),
+        "cost": getattr(agent_response, 'cost', 0.0),
+        "latency_ms": latency_ms,
         
-        # Prepare response
-        response = {
-            "agent_response_id": f"agent_{uuid.uuid4().hex[:8]}",
-            "query": request.query,
-            "response": agent_response.response,
-            "session_id": session_id,
-            "user_id": request.user_id,
-            "timestamp": datetime.now(),
-            
-            # Agent metrics
-            "model": getattr(agent_response, 'model', 'unknown'),
-            "total_tokens": getattr(agent_response, 'total_tokens', 0),
-            "cost": getattr(agent_response, 'cost', 0.0),
-            "latency_ms": latency_ms,
-            
-            # Cache information
-            "from_cache": getattr(agent_response, 'from_cache', False),
-            "cache_similarity": getattr(agent_response, 'cache_similarity', None),
-            
-            # Quality evaluation (if available)
-            "evaluation_enabled": request.enable_evaluation,
-            "confidence_score": None,  # Would be calculated by evaluation system
-            "relevance_score": None,   # Would be calculated by evaluation system
-            
-            # Processing metadata
-            "processing_time_ms": latency_ms,
-            "organization_id": agent.organization_id
-        }
+        # Cache information
+        "from_cache": getattr(agent_response, 'from_cache', False),
+        "cache_similarity": getattr(agent_response, 'cache_similarity', None),
         
-        return response
+        # Quality evaluation (if available)
+        "evaluation_enabled": request.enable_evaluation,
+        "confidence_score": None,  # Would be calculated by evaluation system
+        "relevance_score": None,   # Would be calculated by evaluation system
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Agent processing failed: {str(e)}")
+        # Processing metadata
+        "processing_time_ms": latency_ms,
+        "organization_id": agent.organization_id
+    }
+    
+    return response
+
 
 
 @router.get("/agents/status")
@@ -1,118 +1,496 @@
 """Enhanced WebSocket endpoints with session management for real-time communication."""
 
 import logging
-import uuid
-import json
+import itertools
+import os
+import time
 import asyncio
-from typing import Optional, Dict, Any
+import orjson
+import weakref
+from functools import lru_cache
+from secrets import token_hex
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query, HTTPException
+from starlette.websockets import WebSocketState
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Session management imports
-from ..utils.session_dispatch import dispatch_session_message, get_session_stats, cleanup_expired_sessions
+from ..utils.session_dispatch import dispatch_session_message, dispatch_session_disconnect, get_session_stats, cleanup_expired_sessions
 from ..utils.session_config import session_config
 from ..utils.buffer_manager import buffer_manager
+from ..utils.clock import utc_now_iso
+from ..db.database import db_manager
 from ..monitoring.config.database import get_db
 from ..monitoring.config.settings import get_config
+from ..monitoring.api.routers.analytics import PhoenixAnalyticsService
+
+try:
+    from ..agents import stream_llm_response
+    AGENTS_AVAILABLE = True
+except ImportError as e:
+    stream_llm_response = None
+    AGENTS_AVAILABLE = False
+    _agents_import_error = e
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ws/v1", tags=["websocket", "session"])
 
 # Active WebSocket connections tracking
-active_connections: Dict[str, WebSocket] = {}
-session_connections: Dict[str, str] = {}  # session_id -> connection_id
+CONNECTION_SHARDS = 16
+CONNECTION_REAP_INTERVAL = 60  # seconds
+
+
+class ConnectionRegistry:
+    """Connection and session tables split into shards; writes lock one shard, reads take no lock.
+    
+    WebSockets are held weakly, so a socket that dies without reaching its cleanup path
+    drops out of the table instead of lingering until the next broadcast.
+    """
+    
+    def __init__(self, shards: int = CONNECTION_SHARDS):
+        self._connections = [weakref.WeakValueDictionary() for _ in range(shards)]  # connection_id -> WebSocket
+        self._sessions = [dict() for _ in range(shards)]  # session_id -> connection_id
+        self._session_sockets = [weakref.WeakValueDictionary() for _ in range(shards)]  # session_id -> WebSocket
+        self._locks = [asyncio.Lock() for _ in range(shards)]
+        self._reaper: Optional[asyncio.Task] = None
+    
+    def _shard(self, key: str) -> int:
+        return hash(key) % len(self._locks)
+    
+    async def register(self, session_id: str, connection_id: str, websocket: WebSocket):
+        connection_shard, session_shard = self._shard(connection_id), self._shard(session_id)
+        async with self._locks[connection_shard]:
+            self._connections[connection_shard][connection_id] = websocket
+        async with self._locks[session_shard]:
+            self._sessions[session_shard][session_id] = connection_id
+            self._session_sockets[session_shard][session_id] = websocket
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop())
+        relay.start()
+    
+    async def unregister(self, session_id: str, connection_id: str) -> bool:
+        """Remove a connection. Returns False if a newer connection has taken over the session."""
+        connection_shard, session_shard = self._shard(connection_id), self._shard(session_id)
+        async with self._locks[connection_shard]:
+            self._connections[connection_shard].pop(connection_id, None)
+        async with self._locks[session_shard]:
+            # A reconnect may already have pointed the session at a newer connection
+            current = self._sessions[session_shard].get(session_id)
+            if current == connection_id:
+                del self._sessions[session_shard][session_id]
+                self._session_sockets[session_shard].pop(session_id, None)
+            return current is None or current == connection_id
+    
+    async def discard(self, session_id: str, websocket: WebSocket):
+        """Drop a session whose socket failed, unless it has since moved to a new socket."""
+        session_shard = self._shard(session_id)
+        async with self._locks[session_shard]:
+            if self._session_sockets[session_shard].get(session_id) is not websocket:
+                return
+            connection_id = self._sessions[session_shard].pop(session_id, None)
+            self._session_sockets[session_shard].pop(session_id, None)
+        if connection_id is not None:
+            connection_shard = self._shard(connection_id)
+            async with self._locks[connection_shard]:
+                self._connections[connection_shard].pop(connection_id, None)
+    
+    def get(self, connection_id: str) -> Optional[WebSocket]:
+        return self._connections[self._shard(connection_id)].get(connection_id)
+    
+    def get_session(self, session_id: str) -> Optional[WebSocket]:
+        return self._session_sockets[self._shard(session_id)].get(session_id)
+    
+    def session_sockets(self) -> list:
+        """(session_id, WebSocket) for every live session, for fan-out."""
+        return [item for shard in self._session_sockets for item in list(shard.items())]
+    
+    def session_ids(self) -> list:
+        return [session_id for shard in self._sessions for session_id in list(shard)]
+    
+    def connection_count(self) -> int:
+        return sum(len(shard) for shard in self._connections)
+    
+    def session_count(self) -> int:
+        return sum(len(shard) for shard in self._sessions)
+    
+    async def reap(self) -> int:
+        """Drop sessions whose WebSocket is gone or no longer connected."""
+        reaped = 0
+        for session_id in self.session_ids():
+            session_shard = self._shard(session_id)
+            connection_id = self._sessions[session_shard].get(session_id)
+            websocket = self.get(connection_id) if connection_id else None
+            if websocket is None or websocket.client_state != WebSocketState.CONNECTED:
+                await self.unregister(session_id, connection_id)
+                reaped += 1
+        return reaped
+    
+    async def _reap_loop(self):
+        while self.session_count():
+            await asyncio.sleep(CONNECTION_REAP_INTERVAL)
+            try:
+                reaped = await self.reap()
+                if reaped:
+                    logger.info(f"Reaped {reaped} stale WebSocket sessions")
+            except Exception as e:
+                logger.error(f"Error reaping WebSocket sessions: {e}")
+
+
+connections = ConnectionRegistry()
+
+# With several uvicorn workers a session's socket lives in one process; broadcasts for sockets
+# held elsewhere travel over Redis pub/sub and each worker delivers to its own sockets
+WS_BROADCAST_CHANNEL = "ws:broadcast"
+WS_BROADCAST_REDIS_URL = os.getenv("WS_BROADCAST_REDIS_URL") or (
+    os.getenv("REDIS_URL") if int(os.getenv("UVICORN_WORKERS", "1")) > 1 else None
+)
+WORKER_ID = token_hex(4)
+
+
+class BroadcastRelay:
+    """Forward broadcast frames between worker processes over Redis pub/sub."""
+    
+    def __init__(self, redis_url: Optional[str]):
+        self.redis_url = redis_url
+        self._client = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    def start(self):
+        if not REDIS_AVAILABLE or not self.redis_url:
+            return
+        if self._listener is None or self._listener.done():
+            self._client = self._client or aioredis.from_url(self.redis_url)
+            self._listener = asyncio.create_task(self._listen())
+    
+    async def publish(self, session_id: Optional[str], frame: bytes) -> int:
+        """Hand a frame to the other workers; session_id None means every session. Returns receiver count."""
+        if self._client is None:
+            return 0
+        try:
+            envelope = orjson.dumps({"origin": WORKER_ID, "session_id": session_id, "frame": frame.decode()})
+            return await self._client.publish(WS_BROADCAST_CHANNEL, envelope)
+        except Exception as e:
+            logger.warning(f"Error relaying broadcast: {e}")
+            return 0
+    
+    async def _listen(self):
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.subscribe(WS_BROADCAST_CHANNEL)
+            async for item in pubsub.listen():
+                if item["type"] != "message":
+                    continue
+                envelope = orjson.loads(item["data"])
+                if envelope["origin"] == WORKER_ID:
+                    continue
+                text = envelope["frame"]
+                frame = text.encode()
+                if envelope["session_id"] is None:
+                    await _send_frame_to_local_sessions(frame, text)
+                else:
+                    await _send_frame_to_session(envelope["session_id"], frame, text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast relay stopped: {e}")
+        finally:
+            await pubsub.close()
+
+
+relay = BroadcastRelay(WS_BROADCAST_REDIS_URL)
+
+@dataclass(slots=True)
+class AnalyticsSubscriber:
+    """A session subscribed to live analytics."""
+    user_id: str
+    connection_id: str
+    subscribed_at: str
+    subscription_info: Dict[str, Any] = field(default_factory=dict)
+    time_range: str = "30d"  # Updated by analytics_request
+    queue: Optional[asyncio.Queue] = None
+    writer: Optional[asyncio.Task] = None
+
 
 # Analytics subscription tracking
-analytics_subscribers: Dict[str, Dict] = {}  # session_id -> {user_id, connection_id, subscription_info}
+analytics_subscribers: Dict[str, AnalyticsSubscriber] = {}  # session_id -> subscriber
 analytics_broadcast_task: Optional[Any] = None
 analytics_last_data: Dict[str, Any] = {}  # Cache for last analytics data
 
+# Live analytics are memoized just under the 30s broadcast interval so each tick does one query per key
+ANALYTICS_CACHE_TTL = 25.0  # seconds
+_analytics_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}  # "org_timerange" -> (monotonic ts, data)
+_analytics_inflight: Dict[str, asyncio.Future] = {}
+
+# Broadcasts run when new usage is signalled, at most once per MIN interval and at least once per MAX
+ANALYTICS_MIN_INTERVAL = float(os.getenv("ANALYTICS_MIN_INTERVAL", "5"))  # seconds
+ANALYTICS_MAX_INTERVAL = float(os.getenv("ANALYTICS_MAX_INTERVAL", "30"))  # seconds
+_analytics_dirty = asyncio.Event()
+
+# Unchanged snapshots are not re-sent until this many seconds have passed since the last send
+ANALYTICS_RESEND_INTERVAL = float(os.getenv("ANALYTICS_RESEND_INTERVAL", "120"))  # seconds
+_analytics_sent: Dict[str, Tuple[bytes, float]] = {}  # time_range -> (encoded data, monotonic ts)
+
+# Pending analytics frames per subscriber; the oldest is dropped when a slow client falls behind
+ANALYTICS_QUEUE_SIZE = 4
+
+# Disconnect cleanup runs off the teardown path; references are held until each task finishes
+_cleanup_tasks: set = set()
+
+
+# Frames are text by default because the dashboard client parses event.data as a string.
+# Clients that connect with ?binary=true get the orjson bytes as binary frames, skipping the
+# decode to str and the server's re-encode to UTF-8.
+_JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+
+# Connection and message ids only need to be unique, not unpredictable: a random per-process
+# prefix keeps workers apart and a counter avoids an os.urandom read per id
+_ID_PREFIX = token_hex(4)
+_id_counter = itertools.count()
+
+
+def make_id() -> str:
+    """Process-unique id for connections and messages."""
+    return f"{_ID_PREFIX}-{next(_id_counter):x}"
+
+
+def encode_frame(payload: Dict[str, Any]) -> bytes:
+    """Serialize a payload once so it can be sent to many sockets."""
+    return orjson.dumps(payload, option=_JSON_OPTIONS)
+
+
+def stamp_frame(frame: bytes) -> bytes:
+    """Append the current timestamp to a pre-encoded JSON object frame."""
+    return frame[:-1] + b',"timestamp":"' + utc_now_iso().encode() + b'"}'
+
+
+# Static error frames, encoded once; only the timestamp is added per send
+_INVALID_JSON_FRAME = encode_frame({"type": "error", "data": {"error": "Invalid JSON format"}})
+_SESSION_NOT_FOUND_FRAME = encode_frame({"type": "error", "data": {"error": "Session not found or expired"}})
+# Tail of the "agent unavailable" assistant_response data, after message_id/conversation_id
+_AGENT_UNAVAILABLE_TAIL = encode_frame({
+    "content_delta": "Agent system unavailable - check import paths",
+    "is_complete": True,
+    "sequence_number": 2,
+    "metadata": {"model": "error", "error": "import_failed"}
+})[1:]
+
+
+def _assistant_frame_prefix(message_id: str, conversation_id: Any) -> bytes:
+    """Encoded start of an assistant_response frame, up to and including the conversation_id."""
+    return (
+        b'{"type":"assistant_response","data":{"message_id":' + orjson.dumps(message_id)
+        + b',"conversation_id":' + orjson.dumps(conversation_id) + b','
+    )
+
+
+def delta_frame(prefix: bytes, delta: str, sequence_number: int) -> bytes:
+    """Streaming chunk frame built from a per-message prefix; only the delta is serialized."""
+    return stamp_frame(
+        prefix + b'"content_delta":' + orjson.dumps(delta)
+        + b',"is_complete":false,"sequence_number":' + str(sequence_number).encode() + b'}}'
+    )
+
+
+async def send_frame(websocket: WebSocket, frame: bytes, text: Optional[str] = None):
+    """Send an encoded frame in the format the connection negotiated.
+    
+    Fan-out callers pass the frame's decoded text so it is decoded once, not per text socket.
+    """
+    if getattr(websocket.state, "binary_frames", False):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(text if text is not None else frame.decode())
+
+
+async def send_json(websocket: WebSocket, payload: Dict[str, Any]):
+    """Serialize with orjson and send."""
+    await send_frame(websocket, encode_frame(payload))
+
+
+async def receive_json(websocket: WebSocket) -> Any:
+    """Receive one text or binary frame and parse it with orjson."""
+    frame = await websocket.receive()
+    if frame["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(frame.get("code", 1000))
+    return orjson.loads(frame.get("text") or frame.get("bytes") or b"")
+
+
+async def _drain_analytics(websocket: WebSocket, queue: asyncio.Queue, session_id: str):
+    """Write queued analytics frames to one subscriber until it goes away."""
+    try:
+        while True:
+            frame = await queue.get()
+            await send_frame(websocket, frame)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.info(f"Analytics writer for session {session_id} stopped: {e}")
+
+
+def add_analytics_subscriber(websocket: WebSocket, session_id: str, subscriber: AnalyticsSubscriber) -> AnalyticsSubscriber:
+    """Register a subscriber with its own bounded outbound queue and writer task."""
+    remove_analytics_subscriber(session_id)
+    subscriber.queue = asyncio.Queue(maxsize=ANALYTICS_QUEUE_SIZE)
+    subscriber.writer = asyncio.create_task(_drain_analytics(websocket, subscriber.queue, session_id))
+    analytics_subscribers[session_id] = subscriber
+    return subscriber
+
+
+def remove_analytics_subscriber(session_id: str) -> bool:
+    """Drop a subscriber and cancel its writer task. Returns True if it was subscribed."""
+    subscriber = analytics_subscribers.pop(session_id, None)
+    if subscriber is None:
+        return False
+    if subscriber.writer is not None:
+        subscriber.writer.cancel()
+    return True
+
+
+def enqueue_analytics_frame(queue: asyncio.Queue, frame: bytes):
+    """Queue a frame without blocking; analytics is latest-wins, so overflow evicts the oldest."""
+    try:
+        queue.put_nowait(frame)
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(frame)
+
+
+async def _safe_disconnect(user_id: str, session_id: str):
+    """Dispatch the disconnect message, logging rather than raising on failure."""
+    try:
+        await dispatch_session_disconnect(user_id, session_id, session_config)
+    except Exception as e:
+        logger.warning(f"Error during disconnect cleanup: {e}")
+
+
+def schedule_disconnect(user_id: str, session_id: str):
+    """Run disconnect cleanup in the background so the socket is released immediately."""
+    task = asyncio.create_task(_safe_disconnect(user_id, session_id))
+    _cleanup_tasks.add(task)
+    task.add_done_callback(_cleanup_tasks.discard)
+
+
+@lru_cache(maxsize=1)
+def get_organization_id() -> str:
+    """Organization ID for this process, resolved on first use (after .env has been loaded)."""
+    config = get_config()
+    return config.get_organization_id() if hasattr(config, 'get_organization_id') else 'org_001'
+
 
 async def get_session_config():
     """Get session configuration."""
     return session_config
 
 
-async def get_live_analytics_data(org_id: str, time_range: str = '30d') -> Dict[str, Any]:
+async def get_live_analytics_data(org_id: str, time_range: str = '30d', db: Optional[AsyncSession] = None) -> Dict[str, Any]:
     """Get current analytics data for broadcasting.
     
+    Results are memoized for ANALYTICS_CACHE_TTL seconds and concurrent callers for the
+    same key share one in-flight query.
+    
     Args:
         org_id: Organization ID
         time_range: Time range string ('1h', '24h', '7d', '30d', '90d')
+        db: Session to query with; a short-lived one is opened if omitted
     """
+    key = f"{org_id}_{time_range}"
+    cached = _analytics_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ANALYTICS_CACHE_TTL:
+        return cached[1]
+    
+    inflight = _analytics_inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+    
+    future = asyncio.get_running_loop().create_future()
+    _analytics_inflight[key] = future
     try:
-        # Import analytics service and database
-        from ..monitoring.api.routers.analytics import PhoenixAnalyticsService
-        from ..db.database import db_manager
-        
-        analytics_service = PhoenixAnalyticsService()
-        
-        # Calculate time range based on the requested period
-        end_date = datetime.now(timezone.utc)
-        
-        # Map time range to timedelta
-        if time_range == '1h':
-            start_date = end_date - timedelta(hours=1)
-        elif time_range == '24h':
-            start_date = end_date - timedelta(hours=24)
-        elif time_range == '7d':
-            start_date = end_date - timedelta(days=7)
-        elif time_range == '90d':
-            start_date = end_date - timedelta(days=90)
-        else:  # Default to 30d
-            start_date = end_date - timedelta(days=30)
-        
-        # Get database session from orchestrator DB manager
-        async for db in db_manager.get_session():
-            try:
-                analytics_data = await analytics_service.get_analytics_overview_from_phoenix(
-                    start_date=start_date,
-                    end_date=end_date,
-                    organization_id=org_id,
-                    db=db
-                )
-                break
-            finally:
-                await db.close()
-        
-        # Transform to the format expected by the frontend
-        if analytics_data and analytics_data.get('overview'):
-            overview = analytics_data['overview']
-            return {
-                "total_api_calls": overview.get('total_api_calls', 0),
-                "total_cost": overview.get('total_cost', 0.0),
-                "total_tokens": overview.get('total_tokens', 0),
-                "cache_hit_rate": overview.get('cache_hit_rate', 0.0),
-                "avg_response_time_ms": overview.get('avg_response_time_ms', 0),
-                "firewall_blocks": overview.get('firewall_blocks', 0),
-                "provider_breakdown": analytics_data.get('provider_breakdown', [])
-            }
+        if db is None:
+            async with db_manager.session() as db:
+                analytics_data = await _fetch_live_analytics_data(org_id, time_range, db)
         else:
-            # Return empty data structure if no analytics available
-            return {
-                "total_api_calls": 0,
-                "total_cost": 0.0,
-                "total_tokens": 0,
-                "cache_hit_rate": 0.0,
-                "avg_response_time_ms": 0,
-                "firewall_blocks": 0,
-                "provider_breakdown": []
-            }
-            
+            analytics_data = await _fetch_live_analytics_data(org_id, time_range, db)
+        _analytics_cache[key] = (time.monotonic(), analytics_data)
     except Exception as e:
         logger.error(f"Error getting live analytics data: {e}")
-        # Return empty data on error
-        return {
-            "total_api_calls": 0,
-            "total_cost": 0.0,
-            "total_tokens": 0,
-            "cache_hit_rate": 0.0,
-            "avg_response_time_ms": 0,
-            "firewall_blocks": 0,
-            "provider_breakdown": []
-        }
+        # Return empty data on error; it is not cached so the next call retries
+        analytics_data = _empty_analytics_data()
+    except BaseException:
+        # The owning task was cancelled mid-query; release any waiters
+        future.cancel()
+        raise
+    finally:
+        _analytics_inflight.pop(key, None)
+    future.set_result(analytics_data)
+    return analytics_data
+
+
+# Overview metrics sent to the frontend, with the default used when Phoenix omits one
+_OVERVIEW_FIELDS = (
+    ("total_api_calls", 0),
+    ("total_cost", 0.0),
+    ("total_tokens", 0),
+    ("cache_hit_rate", 0.0),
+    ("avg_response_time_ms", 0),
+    ("firewall_blocks", 0),
+)
+
+
+def _empty_analytics_data() -> Dict[str, Any]:
+    data = dict(_OVERVIEW_FIELDS)
+    data["provider_breakdown"] = []
+    return data
+
+
+def _overview_payload(analytics_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a Phoenix analytics overview into the frontend's metrics format."""
+    overview = analytics_data['overview']
+    data = {key: overview.get(key, default) for key, default in _OVERVIEW_FIELDS}
+    data["provider_breakdown"] = analytics_data.get('provider_breakdown', [])
+    return data
+
+
+async def _fetch_live_analytics_data(org_id: str, time_range: str, db: AsyncSession) -> Dict[str, Any]:
+    """Query the Phoenix analytics overview for the given time range."""
+    analytics_service = PhoenixAnalyticsService()
+    
+    # Calculate time range based on the requested period
+    end_date = datetime.now(timezone.utc)
+    
+    # Map time range to timedelta
+    if time_range == '1h':
+        start_date = end_date - timedelta(hours=1)
+    elif time_range == '24h':
+        start_date = end_date - timedelta(hours=24)
+    elif time_range == '7d':
+        start_date = end_date - timedelta(days=7)
+    elif time_range == '90d':
+        start_date = end_date - timedelta(days=90)
+    else:  # Default to 30d
+        start_date = end_date - timedelta(days=30)
+    
+    analytics_data = await analytics_service.get_analytics_overview_from_phoenix(
+        start_date=start_date,
+        end_date=end_date,
+        organization_id=org_id,
+        db=db
+    )
+    
+    # Transform to the format expected by the frontend
+    if analytics_data and analytics_data.get('overview'):
+        return _overview_payload(analytics_data)
+    # Return empty data structure if no analytics available
+    return _empty_analytics_data()
 
 
 async def broadcast_analytics_to_subscribers():
@@ -122,82 +500,104 @@ async def broadcast_analytics_to_subscribers():
     
     try:
         # Get analytics data for the default organization
-        config = get_config()
-        org_id = config.get_organization_id() if hasattr(config, 'get_organization_id') else 'org_001'
+        org_id = get_organization_id()
         
         # Group subscribers by time range to optimize data fetching
         time_range_groups = {}
-        for session_id, subscriber_info in analytics_subscribers.items():
-            time_range = subscriber_info.get('time_range', '30d')
+        for session_id, subscriber in analytics_subscribers.items():
+            time_range = subscriber.time_range
             if time_range not in time_range_groups:
                 time_range_groups[time_range] = []
-            time_range_groups[time_range].append((session_id, subscriber_info))
+            time_range_groups[time_range].append((session_id, subscriber))
         
-        # Fetch data for each unique time range
+        # Fetch data for each unique time range, sharing one read-only session across the tick
         analytics_data_by_range = {}
-        for time_range in time_range_groups.keys():
-            analytics_data = await get_live_analytics_data(org_id, time_range)
-            analytics_data_by_range[time_range] = analytics_data
-            # Cache the data
-            analytics_last_data[f"{org_id}_{time_range}"] = analytics_data
+        async with db_manager.session() as db:
+            for time_range in time_range_groups.keys():
+                analytics_data = await get_live_analytics_data(org_id, time_range, db)
+                # The analytics service swallows query errors, so end the read transaction
+                # to keep one failed range from poisoning the next
+                await db.rollback()
+                analytics_data_by_range[time_range] = analytics_data
+                # Cache the data
+                analytics_last_data[f"{org_id}_{time_range}"] = analytics_data
         
         # Broadcast to all subscribers with their respective time range data
         disconnected_sessions = []
         
+        timestamp = utc_now_iso().encode()
+        now = time.monotonic()
         for time_range, subscribers in time_range_groups.items():
-            analytics_data = analytics_data_by_range[time_range]
+            # Skip ranges whose snapshot is identical to the last one sent, unless it has gone stale
+            data = encode_frame(analytics_data_by_range[time_range])
+            last = _analytics_sent.get(time_range)
+            unchanged = last is not None and last[0] == data and now - last[1] < ANALYTICS_RESEND_INTERVAL
+            if not unchanged:
+                _analytics_sent[time_range] = (data, now)
+                # The payload is encoded once per time range; each subscriber's frame only appends its session_id
+                base_frame = (
+                    b'{"type":"analytics_response","data":' + data
+                    + b',"timestamp":"' + timestamp + b'","time_range":' + orjson.dumps(time_range)
+                )
             
-            for session_id, subscriber_info in subscribers:
-                try:
-                    connection_id = subscriber_info.get('connection_id')
-                    if connection_id in active_connections:
-                        websocket = active_connections[connection_id]
-                        
-                        response = {
-                            "type": "analytics_response",
-                            "data": analytics_data,
-                            "timestamp": datetime.now(timezone.utc).isoformat(),
-                            "session_id": session_id,
-                            "time_range": time_range
-                        }
-                        
-                        await websocket.send_text(json.dumps(response))
-                        logger.debug(f"Analytics data sent to session {session_id} with time range {time_range}")
-                    else:
-                        # Connection no longer active
-                        disconnected_sessions.append(session_id)
-                        
-                except Exception as e:
-                    logger.error(f"Error sending analytics to session {session_id}: {e}")
+            for session_id, subscriber in subscribers:
+                writer = subscriber.writer
+                if connections.get(subscriber.connection_id) is None or writer is None or writer.done():
+                    # Connection no longer active or its writer has failed
                     disconnected_sessions.append(session_id)
+                    continue
+                if unchanged:
+                    continue
+                # Hand off to the subscriber's writer so a slow client never stalls the broadcaster
+                enqueue_analytics_frame(
+                    subscriber.queue,
+                    base_frame + b',"session_id":' + orjson.dumps(session_id) + b'}'
+                )
         
         # Cleanup disconnected sessions
         for session_id in disconnected_sessions:
-            if session_id in analytics_subscribers:
-                del analytics_subscribers[session_id]
+            if remove_analytics_subscriber(session_id):
                 logger.info(f"Removed disconnected analytics subscriber: {session_id}")
                 
     except Exception as e:
         logger.error(f"Error in analytics broadcasting: {e}")
 
 
+def mark_analytics_dirty():
+    """Signal that new usage was recorded so subscribers get fresh analytics soon."""
+    _analytics_cache.clear()
+    _analytics_dirty.set()
+
+
 async def start_analytics_broadcasting():
-    """Start the periodic analytics broadcasting task."""
+    """Start the analytics broadcasting task."""
     global analytics_broadcast_task
     
     if analytics_broadcast_task is None:
         async def analytics_broadcast_loop():
+            last_broadcast = time.monotonic()
             while True:
                 try:
+                    # Wake on new usage, or after MAX interval so the dashboard never goes stale
+                    try:
+                        await asyncio.wait_for(_analytics_dirty.wait(), ANALYTICS_MAX_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    # Debounce: signals arriving during this wait share the next broadcast
+                    elapsed = time.monotonic() - last_broadcast
+                    if elapsed < ANALYTICS_MIN_INTERVAL:
+                        await asyncio.sleep(ANALYTICS_MIN_INTERVAL - elapsed)
+                    _analytics_dirty.clear()
+                    
                     if analytics_subscribers:  # Only broadcast if there are subscribers
                         await broadcast_analytics_to_subscribers()
-                    await asyncio.sleep(30)  # Broadcast every 30 seconds
+                    last_broadcast = time.monotonic()
                 except asyncio.CancelledError:
                     logger.info("Analytics broadcasting task cancelled")
                     break
                 except Exception as e:
                     logger.error(f"Error in analytics broadcast loop: {e}")
-                    await asyncio.sleep(30)  # Continue after error
+                    await asyncio.sleep(ANALYTICS_MIN_INTERVAL)  # Continue after error
         
         analytics_broadcast_task = asyncio.create_task(analytics_broadcast_loop())
         logger.info("Analytics broadcasting task started")
@@ -217,12 +617,263 @@ async def stop_analytics_broadcasting():
         logger.info("Analytics broadcasting task stopped")
 
 
+async def _stream_deltas(websocket: WebSocket, prefix: bytes, deltas) -> list:
+    """Relay streamed answer chunks to the client and return them.
+    
+    The model stream is read while earlier frames are still being written, so a slow socket
+    doesn't hold up generation; whichever side fails first cancels the other.
+    """
+    chunks = []
+    frames: asyncio.Queue = asyncio.Queue()
+    
+    async def write_frames():
+        while (frame := await frames.get()) is not None:
+            await send_frame(websocket, frame)
+    
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(write_frames())
+            try:
+                async for delta in deltas:
+                    chunks.append(delta)
+                    frames.put_nowait(delta_frame(prefix, delta, len(chunks) + 1))
+            finally:
+                frames.put_nowait(None)
+    except ExceptionGroup as eg:
+        raise eg.exceptions[0]
+    return chunks
+
+
+async def _handle_send_message(websocket: WebSocket, user_id: str, session_id: str, connection_id: str, org_id: str, message: Dict[str, Any], response: Dict[str, Any]):
+    """Stream the agent's answer to a chat message back to the client."""
+    try:
+        if not AGENTS_AVAILABLE:
+            raise ImportError(_agents_import_error)
+        
+        # Extract message content and conversation ID
+        user_message = message.get("message", "")
+        conversation_id = response.get("data", {}).get("conversation_id", "default")
+        
+        if user_message.strip():
+            # Stream the answer from the LLM agent system as it is generated
+            model = message.get("model", "gpt-3.5-turbo")  # Default model
+            message_id = make_id()
+            stream_meta = {}
+            chunks = await _stream_deltas(
+                websocket,
+                _assistant_frame_prefix(message_id, conversation_id),
+                stream_llm_response(user_message.strip(), conversation_id, model, stream_meta, user_id=user_id)
+            )
+            
+            # The completion frame carries the whole answer, so clients that only render
+            # complete frames still show it
+            assistant_response = {
+                "type": "assistant_response",
+                "data": {
+                    "message_id": message_id,
+                    "conversation_id": conversation_id,
+                    "content_delta": "".join(chunks),
+                    "is_complete": True,
+                    "sequence_number": len(chunks) + 2,
+                    "metadata": {
+                        "model": model,
+                        "endpoint": "/ws/v1/session",
+                        "from_cache": stream_meta.get("from_cache", False),
+                        "similarity": stream_meta.get("similarity"),
+                        "firewall_blocked": stream_meta.get("firewall_blocked", False)
+                    }
+                },
+                "timestamp": utc_now_iso()
+            }
+            await send_json(websocket, assistant_response)
+            mark_analytics_dirty()
+    
+    except ImportError as import_error:
+        # Fallback if agent system not available
+        logger.error(f"Agent system import failed: {import_error}")
+        prefix = _assistant_frame_prefix(make_id(), response.get("data", {}).get("conversation_id"))
+        await send_frame(websocket, stamp_frame(prefix + _AGENT_UNAVAILABLE_TAIL + b'}'))
+    except Exception as e:
+        # Error handling for agent system
+        logger.error(f"Agent system error: {e}")
+        error_response = {
+            "type": "assistant_response",
+            "data": {
+                "message_id": make_id(),
+                "conversation_id": response.get("data", {}).get("conversation_id"),
+                "content_delta": f"Error processing request: {str(e)}",
+                "is_complete": True,
+                "sequence_number": 2,
+                "metadata": {"model": "error", "error_type": "agent_error"}
+            },
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, error_response)
+
+
+async def _handle_analytics_request(websocket: WebSocket, user_id: str, session_id: str, connection_id: str, org_id: str, message: Dict[str, Any], response: Dict[str, Any]):
+    """Answer a one-off analytics overview request for the given date range."""
+    try:
+        analytics_service = PhoenixAnalyticsService()
+        request_data = message.get("data", {})
+        time_range = request_data.get("time_range", "30d")
+        
+        # Update the time range for this subscriber
+        if session_id in analytics_subscribers:
+            analytics_subscribers[session_id].time_range = time_range
+        
+        # Parse dates properly
+        start_date_str = request_data.get("start_date")
+        end_date_str = request_data.get("end_date")
+        
+        # Convert ISO strings to datetime objects
+        if start_date_str and end_date_str:
+            start_date = datetime.fromisoformat(start_date_str) if isinstance(start_date_str, str) else start_date_str
+            end_date = datetime.fromisoformat(end_date_str) if isinstance(end_date_str, str) else end_date_str
+        else:
+            # Default to last 30 days if no dates provided (matching frontend default)
+            end_date = datetime.now(timezone.utc)
+            start_date = end_date - timedelta(days=30)
+        
+        # Get analytics data with database session
+        async with db_manager.session() as db_session:
+            analytics_response = await analytics_service.get_analytics_overview_from_phoenix(
+                start_date=start_date,
+                end_date=end_date,
+                organization_id=org_id,
+                db=db_session
+            )
+        
+        # Extract the overview data for the expected format
+        if analytics_response and analytics_response.get('overview'):
+            data = _overview_payload(analytics_response)
+            data["data_source"] = analytics_response.get('data_source', 'phoenix')
+        else:
+            # Use existing data format
+            data = analytics_response
+        
+        # Send analytics response
+        response = {
+            "type": "analytics_response",
+            "data": data,
+            "correlation_id": message.get("message_id"),
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, response)
+        
+    except Exception as e:
+        logger.error(f"Analytics request error: {e}", exc_info=True)
+        error_response = {
+            "type": "analytics_error",
+            "data": {"error": str(e)},
+            "correlation_id": message.get("message_id"),
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, error_response)
+
+
+async def _handle_analytics_subscribe(websocket: WebSocket, user_id: str, session_id: str, connection_id: str, org_id: str, message: Dict[str, Any], response: Dict[str, Any]):
+    """Subscribe the session to live analytics and send the current snapshot."""
+    try:
+        # Add this session to analytics subscribers
+        subscriber = add_analytics_subscriber(websocket, session_id, AnalyticsSubscriber(
+            user_id=user_id,
+            connection_id=connection_id,
+            subscribed_at=utc_now_iso(),
+            subscription_info=message.get("data", {})
+        ))
+        
+        # Start broadcasting task if not already running
+        await start_analytics_broadcasting()
+        
+        # Send immediate analytics data with default time range
+        default_time_range = "30d"  # Default time range for initial subscription
+        
+        # Get cached data or fetch new data for the default time range
+        cache_key = f"{org_id}_{default_time_range}"
+        if cache_key in analytics_last_data:
+            analytics_data = analytics_last_data[cache_key]
+        else:
+            analytics_data = await get_live_analytics_data(org_id, default_time_range)
+            analytics_last_data[cache_key] = analytics_data
+        
+        # Immediate analytics response followed by the subscription confirmation. Both go through
+        # the subscriber's writer, which sends them back to back in one wakeup and keeps them
+        # ordered with the broadcasts that follow
+        timestamp = utc_now_iso()
+        enqueue_analytics_frame(subscriber.queue, encode_frame({
+            "type": "analytics_response",
+            "data": analytics_data,
+            "correlation_id": message.get("message_id"),
+            "timestamp": timestamp
+        }))
+        enqueue_analytics_frame(subscriber.queue, encode_frame({
+            "type": "analytics_subscription_confirmed",
+            "data": {"subscribed": True, "subscriber_count": len(analytics_subscribers)},
+            "correlation_id": message.get("message_id"),
+            "timestamp": timestamp
+        }))
+        
+        logger.info(f"Analytics subscription confirmed for session {session_id}. Total subscribers: {len(analytics_subscribers)}")
+        
+    except Exception as e:
+        logger.error(f"Analytics subscription error: {e}")
+        error_response = {
+            "type": "analytics_error",
+            "data": {"error": str(e)},
+            "correlation_id": message.get("message_id"),
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, error_response)
+
+
+async def _handle_analytics_unsubscribe(websocket: WebSocket, user_id: str, session_id: str, connection_id: str, org_id: str, message: Dict[str, Any], response: Dict[str, Any]):
+    """Remove the session from live analytics updates."""
+    try:
+        # Remove from analytics subscribers
+        remove_analytics_subscriber(session_id)
+            
+        response = {
+            "type": "analytics_unsubscribed",
+            "data": {"subscribed": False, "subscriber_count": len(analytics_subscribers)},
+            "correlation_id": message.get("message_id"),
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, response)
+        
+        logger.info(f"Analytics unsubscribed for session {session_id}. Remaining subscribers: {len(analytics_subscribers)}")
+        
+        # Stop broadcasting task if no subscribers left
+        if not analytics_subscribers:
+            await stop_analytics_broadcasting()
+        
+    except Exception as e:
+        logger.error(f"Analytics unsubscribe error: {e}")
+        error_response = {
+            "type": "analytics_error",
+            "data": {"error": str(e)},
+            "correlation_id": message.get("message_id"),
+            "timestamp": utc_now_iso()
+        }
+        await send_json(websocket, error_response)
+
+
+# Message types that need work beyond the session dispatcher's response
+MESSAGE_HANDLERS = {
+    "send_message": _handle_send_message,
+    "analytics_request": _handle_analytics_request,
+    "analytics_subscribe": _handle_analytics_subscribe,
+    "analytics_unsubscribe": _handle_analytics_unsubscribe,
+}
+
+
 @router.websocket("/session")
 async def websocket_unified_session_endpoint(
     websocket: WebSocket,
     user_id: Optional[str] = Query(None),
     session_id: Optional[str] = Query(None),
-    token: Optional[str] = Query(None)
+    token: Optional[str] = Query(None),
+    binary: bool = Query(False)
 ):
     """
     WebSocket endpoint for real-time chat with session management.
@@ -235,24 +886,23 @@ async def websocket_unified_session_endpoint(
     
     Development mode: Authentication bypass (assume approved)
     """
-    config = get_config()
-    org_id = config.get_organization_id() if hasattr(config, 'get_organization_id') else 'org_001'
+    org_id = get_organization_id()
     
     # Development authentication bypass
     if not user_id:
-        user_id = f"dev_user_{uuid.uuid4().hex[:8]}"
+        user_id = f"dev_user_{token_hex(4)}"
     if not session_id:
-        session_id = f"session_{uuid.uuid4().hex[:8]}"
+        session_id = f"session_{token_hex(4)}"
     
-    connection_id = str(uuid.uuid4())
+    connection_id = make_id()
     
     try:
         # Accept WebSocket connection
         await websocket.accept()
+        websocket.state.binary_frames = binary
         
         # Register connection
-        active_connections[connection_id] = websocket
-        session_connections[session_id] = connection_id
+        await connections.register(session_id, connection_id, websocket)
         
         # Send session establishment confirmation
         session_response = await dispatch_session_message(
@@ -261,7 +911,7 @@ async def websocket_unified_session_endpoint(
             session_id,
             session_config
         )
-        await websocket.send_text(json.dumps(session_response))
+        await send_json(websocket, session_response)
         
         logger.info(f"WebSocket chat connection established: {session_id} for user {user_id}")
         
@@ -269,12 +919,11 @@ async def websocket_unified_session_endpoint(
         while True:
             try:
                 # Receive message from client
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                message = await receive_json(websocket)
                 
                 # Add message ID if not present
                 if "message_id" not in message:
-                    message["message_id"] = str(uuid.uuid4())
+                    message["message_id"] = make_id()
                 
                 # Dispatch message through enhanced session system
                 response = await dispatch_session_message(
@@ -285,297 +934,43 @@ async def websocket_unified_session_endpoint(
                 )
                 
                 # Send response back to client
-                await websocket.send_text(json.dumps(response))
+                await send_json(websocket, response)
                 
                 # Handle special message types
-                if message.get("type") == "send_message":
-                    # Process through actual agent system
-                    try:
-                        # Import the actual agent system
-                        from ..agents import generate_llm_response
-                        
-                        # Extract message content and conversation ID
-                        user_message = message.get("message", "")
-                        conversation_id = response.get("data", {}).get("conversation_id", "default")
-                        
-                        if user_message.strip():
-                            # Call the actual LLM agent system
-                            model = message.get("model", "gpt-3.5-turbo")  # Default model
-                            agent_result = await generate_llm_response(
-                                query=user_message,
-                                session_id=conversation_id,
-                                user_id=user_id,
-                                model=model
-                            )
-                            
-                            # Format the response for WebSocket
-                            assistant_response = {
-                                "type": "assistant_response",
-                                "data": {
-                                    "message_id": str(uuid.uuid4()),
-                                    "conversation_id": conversation_id,
-                                    "content_delta": agent_result.get("answer", ""),
-                                    "is_complete": True,
-                                    "sequence_number": 2,
-                                    "metadata": {
-                                        "model": "gpt-3.5-turbo",
-                                        "endpoint": "/ws/v1/session",
-                                        "from_cache": agent_result.get("from_cache", False),
-                                        "similarity": agent_result.get("similarity")
-                                    }
-                                },
-                                "timestamp": datetime.now(timezone.utc).isoformat()
-                            }
-                            await websocket.send_text(json.dumps(assistant_response))
-                    
-                    except ImportError as import_error:
-                        # Fallback if agent system not available
-                        logger.error(f"Agent system import failed: {import_error}")
-                        assistant_response = {
-                            "type": "assistant_response",
-                            "data": {
-                                "message_id": str(uuid.uuid4()),
-                                "conversation_id": response.get("data", {}).get("conversation_id"),
-                                "content_delta": "Agent system unavailable - check import paths",
-                                "is_complete": True,
-                                "sequence_number": 2,
-                                "metadata": {"model": "error", "error": "import_failed"}
-                            },
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(assistant_response))
-                    except Exception as e:
-                        # Error handling for agent system
-                        logger.error(f"Agent system error: {e}")
-                        error_response = {
-                            "type": "assistant_response",
-                            "data": {
-                                "message_id": str(uuid.uuid4()),
-                                "conversation_id": response.get("data", {}).get("conversation_id"),
-                                "content_delta": f"Error processing request: {str(e)}",
-                                "is_complete": True,
-                                "sequence_number": 2,
-                                "metadata": {"model": "error", "error_type": "agent_error"}
-                            },
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(error_response))
-                
-                # Handle analytics requests
-                elif message.get("type") == "analytics_request":
-                    try:
-                        # Import analytics service
-                        from ..monitoring.api.routers.analytics import PhoenixAnalyticsService
-                        
-                        analytics_service = PhoenixAnalyticsService()
-                        request_data = message.get("data", {})
-                        time_range = request_data.get("time_range", "30d")
-                        
-                        # Update the time range for this subscriber
-                        if session_id in analytics_subscribers:
-                            analytics_subscribers[session_id]["time_range"] = time_range
-                        
-                        # Parse dates properly
-                        start_date_str = request_data.get("start_date")
-                        end_date_str = request_data.get("end_date")
-                        
-                        # Convert ISO strings to datetime objects
-                        if start_date_str and end_date_str:
-                            from dateutil import parser
-                            start_date = parser.parse(start_date_str) if isinstance(start_date_str, str) else start_date_str
-                            end_date = parser.parse(end_date_str) if isinstance(end_date_str, str) else end_date_str
-                        else:
-                            # Default to last 30 days if no dates provided (matching frontend default)
-                            end_date = datetime.now(timezone.utc)
-                            start_date = end_date - timedelta(days=30)
-                        
-                        # Get analytics data with database session
-                        from ..db.database import db_manager
-                        async for db_session in db_manager.get_session():
-                            try:
-                                analytics_response = await analytics_service.get_analytics_overview_from_phoenix(
-                                    start_date=start_date,
-                                    end_date=end_date,
-                                    organization_id=org_id,
-                                    db=db_session
-                                )
-                                break
-                            finally:
-                                await db_session.close()
-                        
-                        # Extract the overview data for the expected format
-                        if analytics_response and analytics_response.get('overview'):
-                            overview = analytics_response['overview']
-                            data = {
-                                "total_api_calls": overview.get('total_api_calls', 0),
-                                "total_cost": overview.get('total_cost', 0.0),
-                                "total_tokens": overview.get('total_tokens', 0),
-                                "cache_hit_rate": overview.get('cache_hit_rate', 0.0),
-                                "avg_response_time_ms": overview.get('avg_response_time_ms', 0),
-                                "firewall_blocks": overview.get('firewall_blocks', 0),
-                                "provider_breakdown": analytics_response.get('provider_breakdown', []),
-                                "data_source": analytics_response.get('data_source', 'phoenix')
-                            }
-                        else:
-                            # Use existing data format
-                            data = analytics_response
-                        
-                        # Send analytics response
-                        response = {
-                            "type": "analytics_response",
-                            "data": data,
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(response))
-                        
-                    except Exception as e:
-                        logger.error(f"Analytics request error: {e}", exc_info=True)
-                        error_response = {
-                            "type": "analytics_error",
-                            "data": {"error": str(e)},
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(error_response))
-                        
-                # Handle analytics subscription (live updates)
-                elif message.get("type") == "analytics_subscribe":
-                    try:
-                        # Add this session to analytics subscribers
-                        analytics_subscribers[session_id] = {
-                            "user_id": user_id,
-                            "connection_id": connection_id,
-                            "subscribed_at": datetime.now(timezone.utc).isoformat(),
-                            "subscription_info": message.get("data", {}),
-                            "time_range": "30d"  # Default time range, will be updated by analytics_request
-                        }
-                        
-                        # Start broadcasting task if not already running
-                        await start_analytics_broadcasting()
-                        
-                        # Send immediate analytics data with default time range
-                        config = get_config()
-                        current_org_id = config.get_organization_id() if hasattr(config, 'get_organization_id') else 'org_001'
-                        default_time_range = "30d"  # Default time range for initial subscription
-                        
-                        # Get cached data or fetch new data for the default time range
-                        cache_key = f"{current_org_id}_{default_time_range}"
-                        if cache_key in analytics_last_data:
-                            analytics_data = analytics_last_data[cache_key]
-                        else:
-                            analytics_data = await get_live_analytics_data(current_org_id, default_time_range)
-                            analytics_last_data[cache_key] = analytics_data
-                        
-                        # Send immediate analytics response (not subscription confirmation)
-                        response = {
-                            "type": "analytics_response",
-                            "data": analytics_data,
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(response))
-                        
-                        # Also send subscription confirmation
-                        confirmation = {
-                            "type": "analytics_subscription_confirmed",
-                            "data": {"subscribed": True, "subscriber_count": len(analytics_subscribers)},
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(confirmation))
-                        
-                        logger.info(f"Analytics subscription confirmed for session {session_id}. Total subscribers: {len(analytics_subscribers)}")
-                        
-                    except Exception as e:
-                        logger.error(f"Analytics subscription error: {e}")
-                        error_response = {
-                            "type": "analytics_error",
-                            "data": {"error": str(e)},
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(error_response))
-                        
-                # Handle analytics unsubscribe
-                elif message.get("type") == "analytics_unsubscribe":
-                    try:
-                        # Remove from analytics subscribers
-                        if session_id in analytics_subscribers:
-                            del analytics_subscribers[session_id]
-                            
-                        response = {
-                            "type": "analytics_unsubscribed",
-                            "data": {"subscribed": False, "subscriber_count": len(analytics_subscribers)},
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(response))
-                        
-                        logger.info(f"Analytics unsubscribed for session {session_id}. Remaining subscribers: {len(analytics_subscribers)}")
-                        
-                        # Stop broadcasting task if no subscribers left
-                        if not analytics_subscribers:
-                            await stop_analytics_broadcasting()
-                        
-                    except Exception as e:
-                        logger.error(f"Analytics unsubscribe error: {e}")
-                        error_response = {
-                            "type": "analytics_error",
-                            "data": {"error": str(e)},
-                            "correlation_id": message.get("message_id"),
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        }
-                        await websocket.send_text(json.dumps(error_response))
+                handler = MESSAGE_HANDLERS.get(message.get("type"))
+                if handler is not None:
+                    await handler(websocket, user_id, session_id, connection_id, org_id, message, response)
                 
             except WebSocketDisconnect:
                 logger.info(f"WebSocket chat disconnected: {session_id}")
                 break
-            except json.JSONDecodeError:
-                error_response = {
-                    "type": "error",
-                    "data": {"error": "Invalid JSON format"},
-                    "timestamp": datetime.now(timezone.utc).isoformat()
-                }
-                await websocket.send_text(json.dumps(error_response))
+            except orjson.JSONDecodeError:
+                await send_frame(websocket, stamp_frame(_INVALID_JSON_FRAME))
             except Exception as e:
                 logger.error(f"Error in chat WebSocket: {e}")
                 error_response = {
                     "type": "error", 
                     "data": {"error": str(e)},
-                    "timestamp": datetime.now(timezone.utc).isoformat()
+                    "timestamp": utc_now_iso()
                 }
-                await websocket.send_text(json.dumps(error_response))
+                await send_json(websocket, error_response)
                 
     except Exception as e:
         logger.error(f"Fatal error in chat WebSocket: {e}")
         await websocket.close()
     finally:
-        # Cleanup connection
-        if connection_id in active_connections:
-            del active_connections[connection_id]
-        if session_id in session_connections:
-            del session_connections[session_id]
-        
-        # Cleanup analytics subscription
-        if session_id in analytics_subscribers:
-            del analytics_subscribers[session_id]
-            logger.info(f"Removed analytics subscriber: {session_id}")
+        # Cleanup connection; if a reconnect already owns the session, its state is left alone
+        if await connections.unregister(session_id, connection_id):
+            # Cleanup analytics subscription
+            if remove_analytics_subscriber(session_id):
+                logger.info(f"Removed analytics subscriber: {session_id}")
+                
+                # Stop broadcasting if no subscribers left
+                if not analytics_subscribers:
+                    await stop_analytics_broadcasting()
             
-            # Stop broadcasting if no subscribers left
-            if not analytics_subscribers:
-                await stop_analytics_broadcasting()
-        
-        # Dispatch disconnect message
-        try:
-            await dispatch_session_message(
-                {"type": "disconnect", "session_id": session_id},
-                user_id,
-                session_id,
-                session_config
-            )
-        except Exception as e:
-            logger.warning(f"Error during disconnect cleanup: {e}")
+            # Dispatch disconnect message
+            schedule_disconnect(user_id, session_id)
 
 
 @router.websocket("/session/{session_id}")
@@ -583,7 +978,8 @@ async def websocket_session_endpoint(
     websocket: WebSocket,
     session_id: str,
     user_id: Optional[str] = Query(None),
-    token: Optional[str] = Query(None)
+    token: Optional[str] = Query(None),
+    binary: bool = Query(False)
 ):
     """
     WebSocket endpoint for joining existing session.
@@ -591,49 +987,43 @@ async def websocket_session_endpoint(
     Allows reconnection to existing sessions with state restoration.
     """
     if not user_id:
-        user_id = f"reconnect_user_{uuid.uuid4().hex[:8]}"
+        user_id = f"reconnect_user_{token_hex(4)}"
     
-    connection_id = str(uuid.uuid4())
+    connection_id = make_id()
     
     try:
         await websocket.accept()
+        websocket.state.binary_frames = binary
         
         # Check if session exists in buffer
         active_user = buffer_manager.get_active_user(user_id) if buffer_manager else None
         
         if active_user:
             # Restore existing session
-            active_connections[connection_id] = websocket
-            session_connections[session_id] = connection_id
+            await connections.register(session_id, connection_id, websocket)
             
             response = {
                 "type": "session_restored",
                 "data": {
                     "session_id": session_id,
                     "user_id": user_id,
-                    "restored_at": datetime.now(timezone.utc).isoformat(),
+                    "restored_at": utc_now_iso(),
                     "session_data": active_user
                 }
             }
-            await websocket.send_text(json.dumps(response))
+            await send_json(websocket, response)
             
             logger.info(f"Session restored: {session_id} for user {user_id}")
         else:
             # Session not found
-            error_response = {
-                "type": "error",
-                "data": {"error": "Session not found or expired"},
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-            await websocket.send_text(json.dumps(error_response))
+            await send_frame(websocket, stamp_frame(_SESSION_NOT_FOUND_FRAME))
             await websocket.close()
             return
         
         # Handle messages same as chat endpoint
         while True:
             try:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                message = await receive_json(websocket)
                 
                 response = await dispatch_session_message(
                     message,
@@ -642,7 +1032,7 @@ async def websocket_session_endpoint(
                     session_config
                 )
                 
-                await websocket.send_text(json.dumps(response))
+                await send_json(websocket, response)
                 
             except WebSocketDisconnect:
                 logger.info(f"Session WebSocket disconnected: {session_id}")
@@ -655,10 +1045,7 @@ async def websocket_session_endpoint(
         logger.error(f"Fatal error in session WebSocket: {e}")
     finally:
         # Cleanup
-        if connection_id in active_connections:
-            del active_connections[connection_id]
-        if session_id in session_connections:
-            del session_connections[session_id]
+        await connections.unregister(session_id, connection_id)
 
 
 @router.get("/stats")
@@ -667,15 +1054,15 @@ async def get_websocket_stats():
     try:
         session_stats = get_session_stats()
         connection_stats = {
-            "active_websockets": len(active_connections),
-            "active_sessions": len(session_connections),
-            "connection_mappings": len(session_connections)
+            "active_websockets": connections.connection_count(),
+            "active_sessions": connections.session_count(),
+            "connection_mappings": connections.session_count()
         }
         
         return {
             "websocket_stats": connection_stats,
             "session_stats": session_stats,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": utc_now_iso()
         }
     except Exception as e:
         logger.error(f"Error getting WebSocket stats: {e}")
@@ -690,7 +1077,7 @@ async def cleanup_sessions(timeout_seconds: int = 1800):
         return {
             "cleaned_sessions": cleaned_count,
             "timeout_seconds": timeout_seconds,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": utc_now_iso()
         }
     except Exception as e:
         logger.error(f"Error during session cleanup: {e}")
@@ -706,7 +1093,7 @@ async def get_active_sessions():
             return {
                 "active_sessions": active_users,
                 "count": len(active_users),
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": utc_now_iso()
             }
         else:
             return {
@@ -719,37 +1106,61 @@ async def get_active_sessions():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _send_frame_to_session(session_id: str, frame: bytes, text: Optional[str] = None) -> bool:
+    websocket = connections.get_session(session_id)
+    if websocket is None:
+        return False
+    try:
+        await send_frame(websocket, frame, text)
+        return True
+    except Exception as e:
+        logger.error(f"Error broadcasting to session {session_id}: {e}")
+        return False
+
+
+async def _send_frame_to_local_sessions(frame: bytes, text: Optional[str] = None) -> int:
+    """Send to every session on this worker at once; sessions whose send fails are dropped."""
+    if text is None:
+        text = frame.decode()
+    sockets = connections.session_sockets()
+    results = await asyncio.gather(
+        *(send_frame(websocket, frame, text) for _, websocket in sockets),
+        return_exceptions=True
+    )
+    delivered = 0
+    for (session_id, websocket), result in zip(sockets, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to broadcast to session {session_id}, dropping it: {result}")
+            await connections.discard(session_id, websocket)
+        else:
+            delivered += 1
+    return delivered
+
+
 async def broadcast_to_session(session_id: str, message: Dict[str, Any]) -> bool:
     """
     Broadcast message to specific session.
     
-    Returns True if message was sent successfully.
+    Sessions connected to another worker are reached through the broadcast relay.
+    
+    Returns True if message was sent successfully (or handed to another worker).
     """
-    try:
-        if session_id in session_connections:
-            connection_id = session_connections[session_id]
-            if connection_id in active_connections:
-                websocket = active_connections[connection_id]
-                await websocket.send_text(json.dumps(message))
-                return True
-        return False
-    except Exception as e:
-        logger.error(f"Error broadcasting to session {session_id}: {e}")
-        return False
+    frame = encode_frame(message)
+    if connections.get_session(session_id) is not None:
+        return await _send_frame_to_session(session_id, frame)
+    return await relay.publish(session_id, frame) > 0
 
 
 async def broadcast_to_all_sessions(message: Dict[str, Any]) -> int:
     """
     Broadcast message to all active sessions.
     
-    Returns count of sessions that received the message.
-    """
-    sent_count = 0
-    for session_id in list(session_connections.keys()):
-        try:
-            if await broadcast_to_session(session_id, message):
-                sent_count += 1
-        except Exception as e:
-            logger.warning(f"Failed to broadcast to session {session_id}: {e}")
+    The message is encoded once and sent to every session concurrently, so a slow
+    peer delays only its own delivery. Other workers deliver to their own sessions via the relay.
     
-    return sent_count
\ No newline at end of file
+    Returns count of sessions on this worker that received the message.
+    """
+    frame = encode_frame(message)
+    delivered = await _send_frame_to_local_sessions(frame)
+    await relay.publish(None, frame)
+    return delivered
\ No newline at end of file
@@ -8,11 +8,7 @@ from typing import Optional, List
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 
-# Import common models and utilities
-import sys
-import os
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../../../../common'))
-
+# Import common models and utilities (common/ sits on PYTHONPATH next to app/)
 from common.api.models import (
 	APIResponse, HealthResponse, PromptRequest, PromptResponse, 
 	TaskRequest, Task, Configuration, ConfigurationItem, User,
@@ -32,17 +28,7 @@ from ...services.controller_client import get_controller_client
 from ...db.database import get_db
 
 # Import agent models from main_response.py
-import os
-import sys
-current_dir = os.path.dirname(os.path.abspath(__file__))
-main_response_path = os.path.join(current_dir, '../../agents/Prompt Response')
-sys.path.insert(0, main_response_path)
-
-try:
-    from main_response import QueryRequest as AgentPromptRequest
-finally:
-    if main_response_path in sys.path:
-        sys.path.remove(main_response_path)
+from ...agents import QueryRequest as AgentPromptRequest
 
 router = APIRouter(prefix="/orchestrators/{organization_id}", tags=["Orchestrator"])
 
@@ -301,6 +287,9 @@ async def stream_prompt_response(
 		"organization_id": organization_id
 	}
 
+# Prompt history returns snippets; truncation happens in the SELECT so full texts never leave the database
+HISTORY_SNIPPET_LENGTH = 100
+
 @router.get("/prompts", response_model=APIResponse[PaginatedResponse[PromptResponse]])
 async def list_prompts(
 	organization_id: str = Path(...),
@@ -308,33 +297,79 @@ async def list_prompts(
 	user_id: Optional[str] = Query(None),
 	model: Optional[str] = Query(None),
 	start_date: Optional[datetime] = Query(None),
-	end_date: Optional[datetime] = Query(None)
+	end_date: Optional[datetime] = Query(None),
+	db: AsyncSession = Depends(get_db)
 ):
 	"""List prompt execution history"""
-	total_items = 150
-	total_pages = (total_items + pagination.page_size - 1) // pagination.page_size
-	
-	prompts = [
-		create_placeholder_prompt_response(f"prompt-{i:03d}")
-		for i in range(1, min(pagination.page_size + 1, total_items + 1))
-	]
-	
-	paginated_data = PaginatedResponse(
-		items=prompts,
-		page=pagination.page,
-		page_size=pagination.page_size,
-		total_items=total_items,
-		total_pages=total_pages,
-		has_next=pagination.page < total_pages,
-		has_prev=pagination.page > 1
-	)
-	
-	return create_success_response(
-		data=paginated_data,
-		service=f"orchestrator-{organization_id}",
-		message="Prompt history retrieved successfully",
-		organization_id=organization_id
-	)
+	try:
+		from sqlalchemy import select, func
+		from ...models.prompt_execution import PromptExecution
+		
+		filters = [PromptExecution.organization_id == organization_id]
+		if user_id:
+			filters.append(PromptExecution.user_id == user_id)
+		if model:
+			filters.append(PromptExecution.model == model)
+		if start_date:
+			filters.append(PromptExecution.timestamp >= start_date)
+		if end_date:
+			filters.append(PromptExecution.timestamp <= end_date)
+		
+		total_items = (await db.execute(
+			select(func.count(PromptExecution.prompt_id)).where(*filters)
+		)).scalar_one()
+		total_pages = (total_items + pagination.page_size - 1) // pagination.page_size
+		
+		query = (
+			select(
+				PromptExecution.prompt_id,
+				func.substr(PromptExecution.response_text, 1, HISTORY_SNIPPET_LENGTH).label("response_snippet"),
+				func.length(PromptExecution.response_text).label("response_length"),
+				PromptExecution.model,
+				PromptExecution.total_tokens,
+				PromptExecution.cost,
+				PromptExecution.latency_ms,
+				PromptExecution.timestamp
+			)
+			.where(*filters)
+			.order_by(PromptExecution.timestamp.desc())
+			.offset((pagination.page - 1) * pagination.page_size)
+			.limit(pagination.page_size)
+		)
+		rows = (await db.execute(query)).all()
+		
+		prompts = [
+			{
+				"prompt_id": row.prompt_id,
+				"response": (row.response_snippet or "") + ("..." if (row.response_length or 0) > HISTORY_SNIPPET_LENGTH else ""),
+				"model": row.model,
+				"tokens_used": row.total_tokens or 0,
+				"cost": row.cost or 0.0,
+				"latency_ms": row.latency_ms or 0,
+				"created_at": row.timestamp
+			}
+			for row in rows
+		]
+		
+		paginated_data = PaginatedResponse(
+			items=prompts,
+			page=pagination.page,
+			page_size=pagination.page_size,
+			total_items=total_items,
+			total_pages=total_pages,
+			has_next=pagination.page < total_pages,
+			has_prev=pagination.page > 1
+		)
+		
+		return create_success_response(
+			data=paginated_data,
+			service=f"orchestrator-{organization_id}",
+			message="Prompt history retrieved successfully",
+			organization_id=organization_id
+		)
+		
+	except Exception as e:
+		raise HTTPException(status_code=500, detail=f"Failed to retrieve prompt history: {str(e)}")
 
 # ============================================================================
 # TASK EXECUTION
@@ -495,13 +530,14 @@ async def list_api_keys(
 	active: Optional[bool] = Query(None)
 ):
 	"""List API keys for organization"""
+	now = datetime.utcnow().isoformat()
 	api_keys = [
 		{
 			"key_id": f"key-{i:03d}",
 			"name": f"API Key {i}",
 			"active": True,
-			"created_at": datetime.utcnow().isoformat(),
-			"last_used": datetime.utcnow().isoformat(),
+			"created_at": now,
+			"last_used": now,
 			"permissions": ["prompts", "tasks", "monitoring"]
 		}
 		for i in range(1, 6)
@@ -1,36 +1,68 @@
 from __future__ import annotations
+import asyncio
+import hashlib
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 import httpx, jwt
 from jwt import PyJWKClient
-from cachetools import TTLCache
 
 TENANT = "moolaib2c.onmicrosoft.com"
 POLICY = "B2C_1_susi"
 API_CLIENT_ID = "0263d89f-754d-4861-a401-8a44a0611618"  
 
 OPENID_CONFIG = f"https://{TENANT}.b2clogin.com/{TENANT}/{POLICY}/v2.0/.well-known/openid-configuration"
-_cfg = TTLCache(maxsize=1, ttl=3600)
-_jwks = TTLCache(maxsize=1, ttl=3600)
+METADATA_TTL = 3600  # seconds
 
+# OpenID config and the JWKS client built from it, refreshed together once the TTL lapses
+_openid_cfg: Optional[Dict[str, Any]] = None
+_jwks_client: Optional[PyJWKClient] = None
+_expires_at = 0.0
+_refresh_lock = asyncio.Lock()
 
-async def _openid() -> Dict[str, Any]:
-    if "v" in _cfg: return _cfg["v"]
+# Claims of recently verified tokens: blake2b(token) -> (reuse deadline, claims)
+CLAIMS_CACHE_TTL = 60  # seconds
+CLAIMS_CACHE_SIZE = 10_000
+_claims_cache: Dict[bytes, Tuple[float, Dict[str, Any]]] = {}
+
+
+async def _refresh_metadata() -> None:
+    global _openid_cfg, _jwks_client, _expires_at
     async with httpx.AsyncClient(timeout=10) as c:
         r = await c.get(OPENID_CONFIG)
         r.raise_for_status()
-        _cfg["v"] = r.json()
-        return _cfg["v"]
+        cfg = r.json()
+    _openid_cfg, _jwks_client = cfg, PyJWKClient(cfg["jwks_uri"])
+    _expires_at = time.monotonic() + METADATA_TTL
 
-async def _jwks() -> PyJWKClient:
-    if "v" in _jwks: return _jwks["v"]
-    jwks_uri = (await _openid())["jwks_uri"]
-    _jwks["v"] = PyJWKClient(jwks_uri)
-    return _jwks["v"]
+async def _metadata() -> Tuple[Dict[str, Any], PyJWKClient]:
+    if time.monotonic() >= _expires_at:
+        # One request refreshes; the others wait for it instead of all hitting the tenant
+        async with _refresh_lock:
+            if time.monotonic() >= _expires_at:
+                await _refresh_metadata()
+    return _openid_cfg, _jwks_client
+
+def _cache_claims(digest: bytes, claims: Dict[str, Any]) -> None:
+    now = time.time()
+    if len(_claims_cache) >= CLAIMS_CACHE_SIZE:
+        for k in [k for k, (deadline, _) in _claims_cache.items() if deadline <= now]:
+            del _claims_cache[k]
+        if len(_claims_cache) >= CLAIMS_CACHE_SIZE:
+            del _claims_cache[next(iter(_claims_cache))]  # oldest insert
+    # Never reuse claims past the token's own expiry
+    _claims_cache[digest] = (min(now + CLAIMS_CACHE_TTL, int(claims["exp"])), claims)
 
 async def validate_b2c_token(token: str) -> Dict[str, Any]:
-    cfg = await _openid()
-    key = (await _jwks()).get_signing_key_from_jwt(token).key
+    """Verify a B2C access token; tokens verified in the last minute skip the RS256 check."""
+    digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _claims_cache.get(digest)
+    if cached is not None:
+        if time.time() < cached[0]:
+            return cached[1]
+        _claims_cache.pop(digest, None)
+
+    cfg, jwks_client = await _metadata()
+    key = jwks_client.get_signing_key_from_jwt(token).key
     claims = jwt.decode(
         token,
         key,
@@ -50,6 +82,7 @@ async def validate_b2c_token(token: str) -> Dict[str, Any]:
     if now > int(claims["exp"]):
         raise jwt.ExpiredSignatureError("Token expired")
 
+    _cache_claims(digest, claims)
     return claims
 
 
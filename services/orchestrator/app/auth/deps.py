@@ -1,17 +1,39 @@
 from __future__ import annotations
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, Tuple
 
 from fastapi import Depends, Header, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.b2c import validate_b2c_token
 from app.db.database import get_db
 from app.models.user import User  # adjust import if your User model is in a different path
 
+# Resolved user records by B2C subject: sub -> (expires_at, {"id", "email", "roles"})
+USER_CACHE_TTL = 300  # seconds
+USER_CACHE_SIZE = 50_000
+_user_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+def _cache_user(sub: str, record: Dict[str, Any]) -> None:
+    now = time.monotonic()
+    if len(_user_cache) >= USER_CACHE_SIZE:
+        for k in [k for k, (expires_at, _) in _user_cache.items() if expires_at <= now]:
+            del _user_cache[k]
+        if len(_user_cache) >= USER_CACHE_SIZE:
+            del _user_cache[next(iter(_user_cache))]  # oldest insert
+    _user_cache[sub] = (now + USER_CACHE_TTL, record)
+
+
+def invalidate_user(sub: str) -> None:
+    """Forget a cached user, e.g. on logout or after changing their record."""
+    _user_cache.pop(sub, None)
+
 
 async def get_current_user(
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Dict[str, Any]:
     # Expect "Authorization: Bearer <token>"
     if not authorization or not authorization.lower().startswith("bearer "):
@@ -27,20 +49,27 @@ async def get_current_user(
     sub = claims.get("sub")
     email = (claims.get("emails") or [claims.get("email")])[0]
 
+    # Known users skip the database unless their email has changed
+    cached = _user_cache.get(sub)
+    if cached is not None and time.monotonic() < cached[0] and (not email or email == cached[1]["email"]):
+        return {**cached[1], "claims": claims}
+
     # Minimal upsert of the user record
-    user = db.query(User).filter(User.b2c_sub == sub).one_or_none()
+    result = await db.execute(select(User).where(User.b2c_sub == sub))
+    user = result.scalar_one_or_none()
     if not user:
         user = User(b2c_sub=sub, email=email, roles="[]")
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     elif email and email != user.email:
         user.email = email
-        db.commit()
+        await db.commit()
 
-    return {
+    record = {
         "id": user.id,
         "email": user.email,
         "roles": user.roles,
-        "claims": claims,
     }
+    _cache_user(sub, record)
+    return {**record, "claims": claims}
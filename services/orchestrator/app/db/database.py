@@ -1,12 +1,44 @@
 """Database configuration for orchestrator service."""
 
 import os
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+# Connection pool sizing shared by the async engines; connections are reused across requests
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+COMMAND_TIMEOUT = int(os.getenv("DB_COMMAND_TIMEOUT", "30"))
+# Per-connection prepared statements and per-engine compiled SQL, so hot queries skip parse/compile
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+
+
+def _connect_args(database_url: str) -> dict:
+	"""Driver options for asyncpg connections; other drivers get none."""
+	if "+asyncpg" not in database_url:
+		return {}
+	return {
+		"command_timeout": COMMAND_TIMEOUT,
+		"prepared_statement_cache_size": STATEMENT_CACHE_SIZE,
+		# JIT compilation costs more than it saves on short OLTP queries
+		"server_settings": {"jit": "off"},
+	}
+
+
+# create_all() only creates missing tables, never alters existing ones; columns and indexes added to
+# the models after a deployment's tables were created are brought in here. Every statement is idempotent.
+SCHEMA_UPGRADES = (
+	"ALTER TABLE prompt_executions ADD COLUMN IF NOT EXISTS cache_hit BOOLEAN DEFAULT FALSE",
+	"ALTER TABLE prompt_executions ADD COLUMN IF NOT EXISTS cache_prefix_hash VARCHAR(64)",
+	"CREATE INDEX IF NOT EXISTS ix_prompt_executions_cache_prefix_hash ON prompt_executions (cache_prefix_hash)",
+	"CREATE INDEX IF NOT EXISTS ix_prompt_executions_org_timestamp ON prompt_executions (organization_id, timestamp)",
+)
 
 class DatabaseManager:
 	"""Manages database connections for orchestrator service."""
@@ -69,8 +101,13 @@ class DatabaseManager:
 			self._async_engine = create_async_engine(
 				database_url,
 				echo=False,
+				pool_size=POOL_SIZE,
+				max_overflow=MAX_OVERFLOW,
+				pool_timeout=POOL_TIMEOUT,
 				pool_pre_ping=True,
-				pool_recycle=3600,
+				pool_recycle=POOL_RECYCLE,
+				query_cache_size=QUERY_CACHE_SIZE,
+				connect_args=_connect_args(database_url),
 			)
 		return self._async_engine
 	
@@ -107,8 +144,13 @@ class DatabaseManager:
 			self._monitoring_async_engine = create_async_engine(
 				monitoring_url,
 				echo=False,
+				pool_size=POOL_SIZE,
+				max_overflow=MAX_OVERFLOW,
+				pool_timeout=POOL_TIMEOUT,
 				pool_pre_ping=True,
-				pool_recycle=3600,
+				pool_recycle=POOL_RECYCLE,
+				query_cache_size=QUERY_CACHE_SIZE,
+				connect_args=_connect_args(monitoring_url),
 			)
 		return self._monitoring_async_engine
 	
@@ -123,21 +165,32 @@ class DatabaseManager:
 			)
 		return self._monitoring_async_session_factory
 	
-	async def get_session(self) -> AsyncSession:
-		"""Get an orchestrator database session."""
-		session_factory = self.async_session_factory
-		session = session_factory()
+	@asynccontextmanager
+	async def session(self) -> AsyncIterator[AsyncSession]:
+		"""Orchestrator database session as a context manager, for use outside FastAPI dependencies."""
+		session = self.async_session_factory()
 		try:
 			yield session
+		except Exception:
+			await session.rollback()
+			raise
 		finally:
 			await session.close()
 	
+	async def get_session(self) -> AsyncSession:
+		"""Get an orchestrator database session."""
+		async with self.session() as session:
+			yield session
+	
 	async def get_monitoring_session(self) -> AsyncSession:
 		"""Get a monitoring database session."""
 		session_factory = self.monitoring_async_session_factory
 		session = session_factory()
 		try:
 			yield session
+		except Exception:
+			await session.rollback()
+			raise
 		finally:
 			await session.close()
 	
@@ -176,6 +229,11 @@ class DatabaseManager:
 		
 		async with self.async_engine.begin() as conn:
 			await conn.run_sync(OrchestratorBase.metadata.create_all)
+			if conn.dialect.name == "postgresql":
+				for statement in SCHEMA_UPGRADES:
+					await conn.execute(text(statement))
+			else:
+				print(f"Skipping schema upgrades on {conn.dialect.name}; existing tables may lack newer columns")
 		
 		print(f"Orchestrator database tables created successfully!")
 	
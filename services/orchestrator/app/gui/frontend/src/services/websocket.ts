@@ -53,6 +53,8 @@ export class MoolAIWebSocketService {
   private listeners = new Map<string, Set<(data: any) => void>>();
   private stateListeners = new Set<(state: ConnectionState) => void>();
   private sessionListeners = new Set<(session: SessionData | null) => void>();
+  // Frames arrive as binary UTF-8 JSON, so the server can send orjson output without re-encoding
+  private decoder = new TextDecoder();
 
   constructor(config: WebSocketConfig = {}) {
     this.config = {
@@ -173,8 +175,10 @@ export class MoolAIWebSocketService {
       if (params.user_id) url.searchParams.set('user_id', params.user_id);
       if (params.session_id) url.searchParams.set('session_id', params.session_id);
       if (params.token) url.searchParams.set('token', params.token);
+      url.searchParams.set('binary', 'true');
 
       this.ws = new WebSocket(url.toString());
+      this.ws.binaryType = 'arraybuffer';
       
       return new Promise((resolve, reject) => {
         const timeout = setTimeout(() => {
@@ -189,7 +193,8 @@ export class MoolAIWebSocketService {
 
         this.ws!.onmessage = (event) => {
           try {
-            const message: WebSocketMessage = JSON.parse(event.data);
+            const raw = typeof event.data === 'string' ? event.data : this.decoder.decode(event.data);
+            const message: WebSocketMessage = JSON.parse(raw);
             this.handleMessage(message);
 
             // Handle session establishment
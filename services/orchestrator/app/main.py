@@ -1,6 +1,7 @@
 """Main FastAPI application for orchestrator service."""
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
@@ -28,24 +29,23 @@ from .monitoring.api.routers.streaming import router as monitoring_streaming_rou
 # from .monitoring.api.routers.websocket import router as monitoring_websocket_router
 from .monitoring.api.routers.analytics import router as analytics_router
 
-# Import agents
-from .agents import PromptResponseAgent
 
-# Phoenix Arize AI observability client
-try:
-    from opentelemetry import trace, metrics
-    from opentelemetry.sdk.trace import TracerProvider
-    from opentelemetry.sdk.metrics import MeterProvider
-    from opentelemetry.sdk.resources import Resource
-    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-    from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
-    from opentelemetry.sdk.trace.export import BatchSpanProcessor
-    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
-    from opentelemetry.instrumentation.openai import OpenAIInstrumentor
-    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-    PHOENIX_AVAILABLE = True
-except ImportError:
-    PHOENIX_AVAILABLE = False
+def _module_available(name: str) -> bool:
+    """Check that a module can be imported without importing it."""
+    try:
+        return find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+# Phoenix Arize AI observability client; the exporters are imported in lifespan only when present
+PHOENIX_AVAILABLE = all(_module_available(name) for name in (
+    "opentelemetry.sdk",
+    "opentelemetry.exporter.otlp.proto.grpc",
+    "opentelemetry.instrumentation.openai",
+    "opentelemetry.instrumentation.fastapi",
+))
+if not PHOENIX_AVAILABLE:
     print("Warning: Phoenix/OpenTelemetry not available - continuing without LLM observability")
 
 # Load environment variables
@@ -84,10 +84,20 @@ async def lifespan(app: FastAPI):
     
     # Initialize prompt-response agent
     try:
+        from .agents import PromptResponseAgent
+        from .services.Caching.cache import RedisCache
+        
         organization_id = os.getenv("ORGANIZATION_ID", "default-org")
+        try:
+            prompt_cache = RedisCache()
+            prompt_cache.load_config()
+        except Exception as e:
+            print(f"Semantic cache unavailable for prompt agent: {e}")
+            prompt_cache = None
         app.state.prompt_agent = PromptResponseAgent(
             openai_api_key=os.getenv("OPENAI_API_KEY"),
-            organization_id=organization_id
+            organization_id=organization_id,
+            cache=prompt_cache
         )
         print(f"Prompt-Response Agent initialized for organization: {organization_id}")
     except Exception as e:
@@ -163,6 +173,17 @@ async def lifespan(app: FastAPI):
     # Initialize Phoenix AI observability for LLM monitoring
     try:
         if PHOENIX_AVAILABLE:
+            from opentelemetry import trace, metrics
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.metrics import MeterProvider
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+            from opentelemetry.instrumentation.openai import OpenAIInstrumentor
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+            
             print("Initializing Phoenix AI observability...")
             
             # Get Phoenix configuration
@@ -1,6 +1,6 @@
 """Prompt execution model for orchestrator service."""
 
-from sqlalchemy import Column, String, DateTime, Text, Integer, Float
+from sqlalchemy import Column, String, DateTime, Text, Integer, Float, Boolean, Index
 from sqlalchemy import ForeignKey
 from datetime import datetime
 from ..db.database import Base
@@ -9,6 +9,10 @@ from ..db.database import Base
 class PromptExecution(Base):
     """Prompt execution records for tracking LLM usage."""
     __tablename__ = "prompt_executions"
+    __table_args__ = (
+        # Serves the per-organization time-window aggregates in one index range scan
+        Index("ix_prompt_executions_org_timestamp", "organization_id", "timestamp"),
+    )
     
     # Primary key
     prompt_id = Column(String(255), primary_key=True)  # Format: "prompt_123456789_abc12345"
@@ -30,7 +34,9 @@ class PromptExecution(Base):
     
     # Performance metrics
     latency_ms = Column(Integer, default=0)
-    status = Column(String(50), default="pending")  # pending, success, error
+    status = Column(String(50), default="pending")  # pending, success, cache_hit, blocked, error
+    cache_hit = Column(Boolean, default=False)
+    cache_prefix_hash = Column(String(64), index=True)  # Hash of the fixed system prefix sent ahead of the prompt
     
     # Session and context
     session_id = Column(String(255), index=True)
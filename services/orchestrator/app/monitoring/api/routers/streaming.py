@@ -11,18 +11,7 @@ import redis.asyncio as redis
 
 from ...config.database import get_db
 from ...config.settings import get_config
-import sys
-import os
-
-# Add common directory to path (works in both local and container environments)
-common_path = os.path.join(os.path.dirname(__file__), '../../../../../common')
-if os.path.exists(common_path):
-	sys.path.append(common_path)
-else:
-	# Fallback for container environment
-	sys.path.append('/app/common')
-
-from realtime import SSEManager, EventBus, EventType
+from common.realtime import SSEManager, EventBus, EventType
 from ..dependencies import get_system_monitoring_middleware
 
 logger = logging.getLogger(__name__)
@@ -10,18 +10,7 @@ import json
 
 from ...config.database import get_db
 from ...config.settings import get_config
-import sys
-import os
-
-# Add common directory to path (works in both local and container environments)
-common_path = os.path.join(os.path.dirname(__file__), '../../../../../common')
-if os.path.exists(common_path):
-	sys.path.append(common_path)
-else:
-	# Fallback for container environment
-	sys.path.append('/app/common')
-
-from realtime import (
+from common.realtime import (
 	WebSocketManager,
 	WebSocketMessage,
 	MessageType,
@@ -379,6 +368,7 @@ async def handle_config_update(connection, message: WebSocketMessage):
 		}
 		
 		# Broadcast config change to all connections in organization
+		now = datetime.utcnow()
 		await ws_manager.broadcast_to_organization(
 			connection.organization_id,
 			WebSocketMessage(
@@ -387,9 +377,9 @@ async def handle_config_update(connection, message: WebSocketMessage):
 					"section": config_section,
 					"values": config_values,
 					"updated_by": connection.user_id,
-					"timestamp": datetime.utcnow().isoformat()
+					"timestamp": now.isoformat()
 				},
-				timestamp=datetime.utcnow()
+				timestamp=now
 			)
 		)
 		
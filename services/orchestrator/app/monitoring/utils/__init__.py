@@ -1,3 +1,3 @@
-from .cost_calculator import calculate_cost, estimate_tokens, get_model_info
+from .cost_calculator import calculate_cost, calculate_costs, estimate_tokens
 
-__all__ = ["calculate_cost", "estimate_tokens", "get_model_info"]
\ No newline at end of file
+__all__ = ["calculate_cost", "calculate_costs", "estimate_tokens"]
\ No newline at end of file
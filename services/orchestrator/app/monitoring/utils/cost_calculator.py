@@ -1,12 +1,20 @@
 """Cost calculation utilities using Phoenix pricing data."""
 
 from decimal import Decimal
-from typing import Union, Optional, Dict
+from functools import lru_cache
+from typing import Union, Optional, Dict, Sequence
 import asyncio
+import numpy as np
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # Cache for model costs to avoid repeated DB queries
@@ -157,6 +165,36 @@ def calculate_cost(
     return round(total_cost, 6)
 
 
+def calculate_costs(
+    models: Sequence[str],
+    input_tokens: Sequence[Union[int, float]],
+    output_tokens: Sequence[Union[int, float]]
+) -> np.ndarray:
+    """
+    Vectorized calculate_cost for a batch of calls.
+    Builds one rate table for the distinct models and prices every call in a single array expression.
+    
+    Args:
+        models: Model name per call
+        input_tokens: Input/prompt tokens per call
+        output_tokens: Output/completion tokens per call
+    
+    Returns:
+        Array of total costs in USD, rounded like calculate_cost
+    """
+    fallback = {"input": 0.0005, "output": 0.0015}
+    keys = [model.lower() for model in models]
+    model_idx = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+    rates = [_model_cost_cache.get(key, fallback) for key in model_idx]
+    in_rates = np.array([rate["input"] for rate in rates]) / 1000.0
+    out_rates = np.array([rate["output"] for rate in rates]) / 1000.0
+    
+    idx = np.fromiter((model_idx[key] for key in keys), dtype=np.intp, count=len(keys))
+    in_toks = np.asarray(input_tokens, dtype=np.float64)
+    out_toks = np.asarray(output_tokens, dtype=np.float64)
+    return np.round(in_toks * in_rates[idx] + out_toks * out_rates[idx], 6)
+
+
 async def store_cost_in_phoenix(
     span_id: int,
     trace_id: int,
@@ -256,20 +294,36 @@ async def store_cost_in_phoenix(
         return False
 
 
-def estimate_tokens(text: str) -> int:
+@lru_cache(maxsize=8)
+def _encoding_for(model: str):
+    """tiktoken encoding for a model, built once per model"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
     """
-    Estimate token count from text.
-    Rule of thumb: 1 token ≈ 4 characters or 0.75 words
+    Count tokens in text with the model's tiktoken encoding.
+    Without tiktoken, falls back to the rule of thumb: 1 token ≈ 4 characters or 0.75 words
     
     Args:
         text: The text to estimate tokens for
+        model: Model whose tokenizer to use
     
     Returns:
-        Estimated token count
+        Token count
     """
     if not text:
         return 0
     
+    if TIKTOKEN_AVAILABLE:
+        try:
+            return len(_encoding_for(model).encode(text))
+        except Exception as e:
+            logger.debug(f"tiktoken unavailable for {model}, estimating: {e}")
+    
     # Use character count method (more accurate for code/technical content)
     char_estimate = len(text) / 4
     
@@ -4,11 +4,14 @@ from __future__ import annotations
 import csv
 import hashlib
 import io
-import json
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Optional
 
 import numpy as np
+import orjson
 import redis
 import zlib
 from pydantic import BaseModel, Field, model_validator
@@ -27,6 +30,20 @@ CACHE_MISSES = Counter("cache_misses_total", "Total cache misses")
 
 # --------- Config persistence ---------
 CONFIG_KEY = "chat:v1:config"
+# Fixed SCAN COUNT hint for paged reads, so a page can resume mid-batch whatever its limit
+SCAN_PAGE_BATCH = 100
+FULL_CSV_HEADER = [
+    "session_id", "key", "key_hash", "has_vector",
+    "created_at", "last_accessed", "prompt", "response", "label", "source"
+]
+
+# Hit/access counters live outside the chat:v1 namespace so exports and scans skip them.
+# They are bucketed per hour (cache:metrics:<hours since epoch>) and expire after the retention window.
+METRICS_KEY = "cache:metrics"
+METRICS_RETENTION_HOURS = 24 * 30
+
+def _metrics_bucket(hour: int) -> str:
+    return f"{METRICS_KEY}:{hour}"
 
 def _coerce_bool(v: Any, default: bool) -> bool:
     if isinstance(v, bool):
@@ -48,7 +65,7 @@ def _coerce_int(v: Any, default: int) -> int:
         return default
 
 
-# --------- Pydantic Models ---------
+# --------- Request / Response Models ---------
 class PromptRequest(BaseModel):
     session_id: str = Field(..., description="Unique session ID")
     message: Optional[str] = None
@@ -61,9 +78,11 @@ class PromptRequest(BaseModel):
         return self
 
 
-class PromptResponse(BaseModel):
+@dataclass(slots=True, frozen=True)
+class PromptResponse:
+    """Result of one cache lookup; built internally, so it skips model validation"""
     session_id: str
-    response: str = ""
+    response: str
     from_cache: bool
     similarity: Optional[float] = None
     label: Optional[str] = None
@@ -79,14 +98,16 @@ class CacheWarmRequest(BaseModel):
 class RedisCache:
     """Redis backend with compression, metadata, persistence, and utilities."""
     def __init__(self):
-        self.client = redis.Redis(
+        pool = redis.ConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
+            max_connections=50,
             decode_responses=False,
             socket_timeout=2,
             socket_connect_timeout=2,
             health_check_interval=30,
         )
+        self.client = redis.Redis(connection_pool=pool)
 
     # ---- Config persistence ----
     def load_config(self) -> None:
@@ -147,18 +168,16 @@ class RedisCache:
         return key
 
     def _compress(self, value: Any) -> bytes:
-        if isinstance(value, np.ndarray):
-            value = value.tolist()
-        if isinstance(value, (list, dict)):
-            value = json.dumps(value)
+        if isinstance(value, (list, dict, np.ndarray)):
+            return zlib.compress(orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY))
         return zlib.compress(value.encode())
 
     def _decompress(self, value: bytes) -> Any:
-        decompressed = zlib.decompress(value).decode()
+        decompressed = zlib.decompress(value)
         try:
-            return json.loads(decompressed)
-        except json.JSONDecodeError:
-            return decompressed
+            return orjson.loads(decompressed)
+        except orjson.JSONDecodeError:
+            return decompressed.decode()
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         if not settings.ENABLED:
@@ -190,11 +209,11 @@ class RedisCache:
         return None
 
     def scan_iter(self, match: Optional[str] = None) -> Iterable[bytes]:
+        # redis-py's scan_iter is lazy, so errors surface while iterating, not when it is created
         try:
-            return self.client.scan_iter(match=match)
+            yield from self.client.scan_iter(match=match)
         except redis.exceptions.RedisError as e:
             print(f"[RedisCache] SCAN failed: {e}")
-            return []
 
     def list_keys(self) -> List[Dict[str, Any]]:
         """Return base keys and their metadata (skip :meta)."""
@@ -210,6 +229,47 @@ class RedisCache:
             print(f"[RedisCache] LIST_KEYS failed: {e}")
             return []
 
+    def count_entries(self) -> int:
+        """Count base keys without fetching their payloads."""
+        try:
+            return sum(
+                1 for k in self.client.scan_iter(match="chat:v1:*", count=1000)
+                if not (k.endswith(b":meta") or k.endswith(b":vec")) and k != CONFIG_KEY.encode()
+            )
+        except redis.exceptions.RedisError as e:
+            print(f"[RedisCache] COUNT_ENTRIES failed: {e}")
+            return 0
+
+    # ---- Lookup accounting ----
+    def record_lookup(self, hit: bool) -> None:
+        key = _metrics_bucket(int(time.time() // 3600))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hincrby(key, "accesses", 1)
+            if hit:
+                pipe.hincrby(key, "hits", 1)
+            pipe.expire(key, METRICS_RETENTION_HOURS * 3600)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[RedisCache] RECORD_LOOKUP failed: {e}")
+
+    def lookup_metrics(self, hours: int = 24) -> tuple[int, int]:
+        """Return (hits, accesses) over the last `hours` hourly buckets, current hour included."""
+        current = int(time.time() // 3600)
+        hours = max(1, min(hours, METRICS_RETENTION_HOURS))
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for hour in range(current - hours + 1, current + 1):
+                pipe.hmget(_metrics_bucket(hour), "hits", "accesses")
+            buckets = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[RedisCache] LOOKUP_METRICS failed: {e}")
+            return 0, 0
+        return (
+            sum(int(hits or 0) for hits, _ in buckets),
+            sum(int(accesses or 0) for _, accesses in buckets),
+        )
+
     def clear(self) -> None:
         try:
             self.client.flushdb()
@@ -238,7 +298,7 @@ class RedisCache:
                 if (isinstance(k, bytes) and k.endswith(b":meta")) or (isinstance(k, str) and k.endswith(":meta")):
                     continue
                 k_str = k.decode() if isinstance(k, bytes) else str(k)
-                writer.writerow([k_str, json.dumps(self.get(k_str))])
+                writer.writerow([k_str, orjson.dumps(self.get(k_str)).decode()])
         except redis.exceptions.RedisError as e:
             print(f"[RedisCache] EXPORT_CSV failed: {e}")
         return output.getvalue()
@@ -257,6 +317,29 @@ class RedisCache:
             return parts[2], parts[3], is_vec  # session_id, hash, is_vec
         return None, None, is_vec
 
+    def _build_record(self, key_str: str, val: Any, meta: Any, has_vector: bool) -> Dict[str, Any]:
+        session_id, key_hash, _ = self._parse_key(key_str)
+        if isinstance(val, dict):
+            prompt = val.get("prompt")
+            response = val.get("response")
+            label = val.get("label")
+            source = val.get("source")
+        else:
+            prompt, response, label, source = None, val, None, None
+        meta = meta if isinstance(meta, dict) else {}
+        return {
+            "session_id": session_id,
+            "key": key_str,
+            "key_hash": key_hash,
+            "has_vector": bool(has_vector),
+            "created_at": meta.get("created_at"),
+            "last_accessed": meta.get("last_accessed"),
+            "prompt": prompt,
+            "response": response,
+            "label": label,
+            "source": source,
+        }
+
     def export_records(self) -> List[Dict[str, Any]]:
         """
         One record per base key (no :vec/:meta), including:
@@ -277,48 +360,82 @@ class RedisCache:
                 if key_str == "chat:v1:config":
                     continue
 
-                session_id, key_hash, _ = self._parse_key(key_str)
-
-                val = self.get(key_str)
-                if isinstance(val, dict):
-                    prompt = val.get("prompt")
-                    response = val.get("response")
-                    label = val.get("label")
-                    source = val.get("source")
-                else:
-                    prompt, response, label, source = None, val, None, None
-
                 meta_raw = self.client.get(f"{key_str}:meta")
                 meta = self._decompress(meta_raw) if meta_raw else {}
+                has_vector = self.client.exists(f"{key_str}:vec") == 1
 
-                vec_key = f"{key_str}:vec"
-                has_vector = self.client.exists(vec_key) == 1
-
-                rec = {
-                    "session_id": session_id,
-                    "key": key_str,
-                    "key_hash": key_hash,
-                    "has_vector": bool(has_vector),
-                    "created_at": meta.get("created_at"),
-                    "last_accessed": meta.get("last_accessed"),
-                    "prompt": prompt,
-                    "response": response,
-                    "label": label,
-                    "source": source,
-                }
-                records.append(rec)
+                records.append(self._build_record(key_str, self.get(key_str), meta, has_vector))
         except redis.exceptions.RedisError as e:
             print(f"[RedisCache] EXPORT_RECORDS failed: {e}")
         return records
 
+    def _scan_keys(self, cursor: int, count: int) -> tuple[int, List[bytes]]:
+        """One SCAN step, keeping only base keys (no :vec/:meta, no config row)."""
+        cursor, keys = self.client.scan(cursor=cursor, match="chat:v1:*", count=count)
+        return cursor, [
+            k for k in keys
+            if not (k.endswith(b":meta") or k.endswith(b":vec")) and k != CONFIG_KEY.encode()
+        ]
+
+    def _fetch_entries(self, base_keys: List[bytes]) -> List[tuple]:
+        """Values and metadata for base_keys in a single pipelined MGET; expired keys are dropped."""
+        entries: List[tuple] = []
+        if base_keys:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.mget(base_keys + [k + b":meta" for k in base_keys])
+            for k in base_keys:
+                pipe.exists(k + b":vec")
+            blobs, *vector_flags = pipe.execute()
+            for i, k in enumerate(base_keys):
+                val_raw, meta_raw = blobs[i], blobs[len(base_keys) + i]
+                if val_raw is None:
+                    continue  # expired between SCAN and MGET
+                meta = self._decompress(meta_raw) if meta_raw else {}
+                entries.append((k.decode(), self._decompress(val_raw), meta, vector_flags[i] == 1))
+        return entries
+
+    def _scan_batch(self, cursor: int, count: int) -> tuple[int, List[tuple]]:
+        """One SCAN step over base keys together with their entries."""
+        cursor, base_keys = self._scan_keys(cursor, count)
+        return cursor, self._fetch_entries(base_keys)
+
+    def scan_records(self, cursor: int = 0, count: int = 100, skip: int = 0) -> tuple[int, int, List[Dict[str, Any]]]:
+        """
+        One page of at most count export_records driven by a SCAN cursor.
+        Returns (next_cursor, next_skip, records): the next page rescans next_cursor and skips its
+        first next_skip base keys, which were already returned. (0, 0) means the keyspace is exhausted.
+        Redis errors propagate rather than looking like the end of the keyspace.
+        """
+        records: List[Dict[str, Any]] = []
+        while True:
+            batch_cursor = cursor
+            cursor, base_keys = self._scan_keys(batch_cursor, SCAN_PAGE_BATCH)
+            remaining = base_keys[skip:]
+            needed = count - len(records)
+            records.extend(self._build_record(*entry) for entry in self._fetch_entries(remaining[:needed]))
+            if len(remaining) > needed:
+                # Page is full mid-batch: resume this batch after the last key returned
+                return batch_cursor, skip + needed, records
+            skip = 0
+            if cursor == 0 or len(records) >= count:
+                return cursor, 0, records
+
+    def iter_entries(self, count: int = 500) -> Iterable[tuple]:
+        """
+        Yield (key, value, meta, has_vector) for every base key, one SCAN batch in memory at a time.
+        A RedisError propagates so a streamed export aborts instead of ending early.
+        """
+        cursor = 0
+        while True:
+            cursor, entries = self._scan_batch(cursor, count)
+            yield from entries
+            if cursor == 0:
+                break
+
     def export_full_csv(self) -> str:
         output = io.StringIO()
         writer = csv.writer(output)
-        header = [
-            "session_id","key","key_hash","has_vector",
-            "created_at","last_accessed","prompt","response","label","source"
-        ]
-        writer.writerow(header)
+        writer.writerow(FULL_CSV_HEADER)
         for rec in self.export_records():
             writer.writerow([
                 rec.get("session_id"),
@@ -347,13 +464,48 @@ def get_embedder() -> SentenceTransformer:
 def generate_key(session_id: str, message: str) -> str:
     return f"chat:{session_id}:{hashlib.sha256(message.encode()).hexdigest()}"
 
+# Bounded LRU memo of prompt embeddings. Kept explicit (rather than functools.lru_cache) so
+# embed_texts can fill it from one batched encode; stored arrays are shared and read-only.
+EMBED_MEMO_SIZE = 4096
+_embed_memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_embed_memo_lock = threading.Lock()
+_embed_memo_stats = {"hits": 0, "misses": 0}
+
+def embed_texts(texts: List[str]) -> List[np.ndarray]:
+    """Embed many texts with a single encode call for the ones not already memoized."""
+    found: Dict[str, np.ndarray] = {}
+    with _embed_memo_lock:
+        for text in texts:
+            if text in found:
+                continue
+            if text in _embed_memo:
+                _embed_memo.move_to_end(text)
+                found[text] = _embed_memo[text]
+                _embed_memo_stats["hits"] += 1
+    missing = list(dict.fromkeys(text for text in texts if text not in found))
+    if missing:
+        vectors = get_embedder().encode(missing)
+        with _embed_memo_lock:
+            _embed_memo_stats["misses"] += len(missing)
+            for text, vector in zip(missing, vectors):
+                embedding = np.array(vector)
+                embedding.setflags(write=False)
+                found[text] = _embed_memo[text] = embedding
+            while len(_embed_memo) > EMBED_MEMO_SIZE:
+                _embed_memo.popitem(last=False)
+    return [found[text] for text in texts]
+
 def embed_text(text: str) -> Optional[np.ndarray]:
     try:
-        return np.array(get_embedder().encode([text])[0])
+        return embed_texts([text])[0]
     except Exception as e:
         print(f"[Embedding Error] {e}")
         return None
 
+def embedding_cache_hit_rate() -> float:
+    lookups = _embed_memo_stats["hits"] + _embed_memo_stats["misses"]
+    return _embed_memo_stats["hits"] / lookups if lookups else 0.0
+
 def cosine_similarity(vec1: np.ndarray, vec2: np.ndarray) -> float:
     if vec1 is None or vec2 is None:
         return 0.0
@@ -411,11 +563,12 @@ def process_prompt(cache: RedisCache, req: PromptRequest) -> PromptResponse:
             base_key = match_key.replace(":vec", "")
             entry = cache.get(base_key)
             if isinstance(entry, dict):
+                cache.record_lookup(hit=True)
                 return PromptResponse(
                     session_id=req.session_id,
                     response=entry.get("response", ""),
                     from_cache=True,
-                    similarity=cosine_similarity(embedding, np.array(cache.get(match_key))),
+                    similarity=float(cosine_similarity(embedding, np.array(cache.get(match_key)))),
                     label=entry.get("label"),
                 )
 
@@ -425,6 +578,7 @@ def process_prompt(cache: RedisCache, req: PromptRequest) -> PromptResponse:
     if cached:
         CACHE_HITS.labels(type="exact").inc()
         if isinstance(cached, dict):
+            cache.record_lookup(hit=True)
             return PromptResponse(
                 session_id=req.session_id,
                 response=cached.get("response", ""),
@@ -435,6 +589,7 @@ def process_prompt(cache: RedisCache, req: PromptRequest) -> PromptResponse:
 
     # Cache miss - return indication that no cache hit occurred
     CACHE_MISSES.inc()
+    cache.record_lookup(hit=False)
     return PromptResponse(
         session_id=req.session_id, 
         response="", 
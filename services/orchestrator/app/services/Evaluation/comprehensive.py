@@ -0,0 +1,91 @@
+"""
+Comprehensive Evaluation Module
+Scores correctness, relevance, goal accuracy, hallucination and summarization in a single LLM call
+"""
+
+import os
+import json
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+METRICS = ("correctness", "relevance", "goal_accuracy", "hallucination", "summarization")
+
+
+def _normalize_metric(result) -> dict:
+    """Clamp the score and coerce the reasoning into a single string"""
+    if not isinstance(result, dict):
+        return {"score": 0.0, "reasoning": "No evaluation returned"}
+
+    score = max(0.0, min(1.0, float(result.get("score", 0.0))))
+    reasoning = result.get("reasoning", "No reasoning provided")
+
+    if isinstance(reasoning, dict):
+        reasoning = "; ".join(f"{key.replace('_', ' ').title()}: {value}" for key, value in reasoning.items())
+    elif not isinstance(reasoning, str):
+        reasoning = str(reasoning)
+
+    return {"score": score, "reasoning": reasoning}
+
+
+async def evaluate_comprehensive(query: str, answer: str) -> dict:
+    """
+    Evaluate an answer on every comprehensive metric with one round-trip
+
+    Args:
+        query: The original question or prompt
+        answer: The AI's response to evaluate
+
+    Returns:
+        dict: {metric: {"score": float, "reasoning": str}} for each metric in METRICS
+    """
+
+    prompt = f"""
+    You are an expert evaluator assessing AI responses on several criteria at once.
+
+    Evaluate the following answer:
+
+    Query: {query}
+    Answer: {answer}
+
+    Score each criterion from 0.0 (worst) to 1.0 (best):
+    1. correctness - Factual accuracy, logical consistency, completeness and precision
+    2. relevance - Does the answer directly address the query and stay in scope?
+    3. goal_accuracy - Does the answer help the user accomplish what they set out to do?
+    4. hallucination - 1.0 means no fabricated facts, sources or overconfident claims were found
+    5. summarization - Is the information presented concisely, clearly and coherently?
+
+    Provide your evaluation as a JSON object with exactly this format:
+    {{
+        "correctness": {{"score": 0.85, "reasoning": "..."}},
+        "relevance": {{"score": 0.85, "reasoning": "..."}},
+        "goal_accuracy": {{"score": 0.85, "reasoning": "..."}},
+        "hallucination": {{"score": 0.85, "reasoning": "..."}},
+        "summarization": {{"score": 0.85, "reasoning": "..."}}
+    }}
+
+    IMPORTANT: Each reasoning field must be a single string, not an object or array.
+    """
+
+    try:
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are an expert AI response evaluator. Always respond with valid JSON where every 'reasoning' is a single string."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=1500,
+            response_format={"type": "json_object"}
+        )
+
+        result = json.loads(response.choices[0].message.content)
+        return {metric: _normalize_metric(result.get(metric)) for metric in METRICS}
+
+    except json.JSONDecodeError as e:
+        return {metric: {"score": 0.0, "reasoning": f"JSON parsing error: {str(e)}"} for metric in METRICS}
+    except Exception as e:
+        return {metric: {"score": 0.0, "reasoning": f"Error during evaluation: {str(e)}"} for metric in METRICS}
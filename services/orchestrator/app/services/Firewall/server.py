@@ -71,6 +71,7 @@ SECRET_PATTERNS = [
     ("Twilio Auth Token",    re.compile(r"\b[0-9a-fA-F]{32}\b"), 0),
     ("Private Key Block",    re.compile(r"-----BEGIN (?:RSA |EC |DSA )?PRIVATE KEY-----"), 0),
 ]
+HIGH_ENTROPY_CANDIDATE = re.compile(r"\b[A-Za-z0-9/\+=]{20,}\b")
 
 # ---- LLM secret scrubber (server-side final safeguard) ----
 SUSPECT_KEYS = {
@@ -101,7 +102,7 @@ def scan_secrets_regex(text: str, entropy_threshold: float = 3.5):
             full = m.group(grp) if (grp and (m.lastindex or 0) >= grp) else m.group(0)
             findings.append({"detector":name,"redacted":_redact(full),
                              "entropy":round(_entropy(full),3),"start":m.start(),"end":m.end()})
-    for m in re.finditer(r"\b[A-Za-z0-9/\+=]{20,}\b", text):
+    for m in HIGH_ENTROPY_CANDIDATE.finditer(text):
         s=m.group(0); ent=_entropy(s)
         already=any(d["start"]<=m.start()<=d["end"] for d in findings)
         if ent>=entropy_threshold and not already:
@@ -115,6 +116,8 @@ def scan_secrets_regex(text: str, entropy_threshold: float = 3.5):
     return dedup
 
 # ========================= Toxicity (better_profanity only) ===============
+from better_profanity import profanity
+
 CUSTOM_TOXIC_WORDS = {
     "hate","hateful","disgusting","idiot","stupid","dumb","moron","loser",
     "trash","garbage","worthless","ugly"
@@ -126,7 +129,6 @@ def _init_better_profanity():
     global _BP_READY
     if _BP_READY:
         return
-    from better_profanity import profanity
     profanity.load_censor_words()
     try:
         profanity.add_censor_words(list(CUSTOM_TOXIC_WORDS))
@@ -135,6 +137,8 @@ def _init_better_profanity():
     _BP_READY = True
 
 
+_init_better_profanity()  # build the censor word set once at import, not on the first request
+
 _table = str.maketrans({c:" " for c in string.punctuation})
 
 
@@ -251,8 +255,6 @@ def _secrets_local(text: str):
 
 def _toxicity_local(text: str):
     try:
-        from better_profanity import profanity
-        _init_better_profanity()
         flagged = bool(profanity.contains_profanity(text or ""))
         return {"contains_toxicity": flagged}
     except Exception as e:
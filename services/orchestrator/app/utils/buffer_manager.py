@@ -4,7 +4,7 @@ import threading
 import time
 from collections import deque
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone
+from .clock import utc_now_iso
 
 
 class OrchestratorBufferManager:
@@ -122,7 +122,7 @@ class OrchestratorBufferManager:
                 "user_id": user_id,
                 "prompt": prompt,
                 "response": response,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": utc_now_iso(),
                 "updated_at": None,
                 "metadata": metadata or {},
             }
@@ -144,7 +144,7 @@ class OrchestratorBufferManager:
                 entry["response"] = response
             if metadata:
                 entry["metadata"].update(metadata)
-            entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+            entry["updated_at"] = utc_now_iso()
             self._push_prompt_id(prompt_id)  # bump recency
 
     def update_prompt_response(self, prompt_id: str, response_payload: Dict[str, Any]) -> None:
@@ -153,7 +153,7 @@ class OrchestratorBufferManager:
             if not entry:
                 return
             entry["response"] = response_payload
-            entry["updated_at"] = datetime.now(timezone.utc).isoformat()
+            entry["updated_at"] = utc_now_iso()
             self._push_prompt_id(prompt_id)
 
     def get_prompt(self, prompt_id: str) -> Optional[Dict[str, Any]]:
@@ -185,7 +185,7 @@ class OrchestratorBufferManager:
             entry = {
                 "task_id": task_id,
                 "task_type": task_type,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": utc_now_iso(),
                 "metadata": metadata or {},
             }
             self._task_store[task_id] = entry
@@ -0,0 +1,22 @@
+"""Coarse UTC timestamps for response payloads and WebSocket frames."""
+
+import time
+from datetime import datetime, timezone
+
+# Cached timestamps are re-formatted at most once per window (100 ms)
+RESOLUTION_NS = 100_000_000
+
+# (tick, iso string), swapped as one reference so readers never see a torn pair
+_cached = (-1, "")
+
+
+def utc_now_iso() -> str:
+    """Current UTC time in ISO format, truncated to RESOLUTION_NS."""
+    global _cached
+    tick = time.time_ns() // RESOLUTION_NS
+    cached_tick, cached_iso = _cached
+    if tick == cached_tick:
+        return cached_iso
+    iso = datetime.fromtimestamp(tick * RESOLUTION_NS / 1e9, timezone.utc).isoformat(timespec="milliseconds")
+    _cached = (tick, iso)
+    return iso
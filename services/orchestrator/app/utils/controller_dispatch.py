@@ -9,12 +9,13 @@ try:
 except Exception:
     buffer_manager = None
 
+from .clock import utc_now_iso
 from .provisioning import apply_provisioning
 
 logger = logging.getLogger("o_dispatch")
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    return utc_now_iso()
 
 # --- throttle presence writes ---
 _TOUCH_MIN_SECS = float(os.getenv("O_CONFIG_TOUCH_MIN_SECS", "30"))
@@ -6,6 +6,7 @@ from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 from datetime import datetime, timezone
 
+from .clock import utc_now_iso
 from .session_state import SessionState, SessionManager, get_session_manager
 
 logger = logging.getLogger("session_actions")
@@ -27,7 +28,7 @@ class ActionResult:
 
 def _now_iso() -> str:
     """Get current timestamp in ISO format."""
-    return datetime.now(timezone.utc).isoformat()
+    return utc_now_iso()
 
 class SessionActionProcessor:
     """Processes session actions with state validation."""
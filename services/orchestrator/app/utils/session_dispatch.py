@@ -1,10 +1,12 @@
 # Enhanced Session-aware message dispatch with state management
 from __future__ import annotations
-import os, time, uuid, logging
+import os, time, logging
+from secrets import token_hex
 from typing import Any, Dict, Optional
 from datetime import datetime, timezone
 
 # Import new hybrid system components
+from .clock import utc_now_iso
 from .session_state import SessionState, get_session_manager
 from .session_actions import get_action_processor, ActionResult
 from .session_responses import get_response_generator
@@ -17,7 +19,7 @@ except ImportError:
 logger = logging.getLogger("session_dispatch")
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    return utc_now_iso()
 
 # --- throttle presence writes ---
 _TOUCH_MIN_SECS = float(os.getenv("SESSION_CONFIG_TOUCH_MIN_SECS", "30"))
@@ -102,7 +104,7 @@ async def dispatch_session_message(msg: Dict[str, Any], user_id: str, session_id
     try:
         # Ensure session exists and get/create session_id
         if not session_id:
-            session_id = f"session_{uuid.uuid4().hex[:12]}"
+            session_id = f"session_{token_hex(6)}"
         
         if session_id not in session_manager.sessions:
             current_state = session_manager.create_session(session_id, user_id)
@@ -171,6 +173,20 @@ async def dispatch_session_message(msg: Dict[str, Any], user_id: str, session_id
         
         return fallback_response
 
+async def dispatch_session_disconnect(user_id: str, session_id: str, cfg_mgr) -> Optional[Dict[str, Any]]:
+    """
+    Dispatch a disconnect for a session that is still live.
+    
+    Returns None without touching the buffer manager when the session is unknown or has
+    already expired, rather than creating a session just to tear it down.
+    """
+    session = get_session_manager().get_session(session_id)
+    if session is None or session.state == SessionState.EXPIRED:
+        return None
+    return await dispatch_session_message(
+        {"type": "disconnect", "session_id": session_id}, user_id, session_id, cfg_mgr
+    )
+
 def get_session_stats() -> Dict[str, Any]:
     """Get current session statistics from hybrid system."""
     session_manager = get_session_manager()
@@ -4,13 +4,14 @@ import logging
 from typing import Dict, Any, Callable
 from datetime import datetime, timezone
 
+from .clock import utc_now_iso
 from .session_actions import ActionResult
 
 logger = logging.getLogger("session_responses")
 
 def _now_iso() -> str:
     """Get current timestamp in ISO format."""
-    return datetime.now(timezone.utc).isoformat()
+    return utc_now_iso()
 
 class SessionResponseGenerator:
     """Generates consistent WebSocket responses based on action results."""
@@ -0,0 +1,50 @@
+"""Tests for the vectorized cost calculation."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sqlalchemy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.orchestrator.app.monitoring.utils import cost_calculator
+from services.orchestrator.app.monitoring.utils.cost_calculator import calculate_cost, calculate_costs
+
+
+@pytest.fixture
+def cached_pricing(monkeypatch):
+    """Seed the pricing cache as if Phoenix had been queried for two models."""
+    monkeypatch.setattr(cost_calculator, "_model_cost_cache", {
+        "gpt-4": {"input": 0.03, "output": 0.06},
+        "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
+    })
+
+
+class TestCalculateCosts:
+    """calculate_costs must agree with calculate_cost call for call."""
+
+    def test_matches_scalar_elementwise(self, cached_pricing):
+        """Mixed cached, uncached and differently-cased models price identically to the scalar path."""
+        models = ["gpt-4", "GPT-4", "gpt-4o-mini", "unknown-model", "gpt-3.5-turbo", "gpt-4"]
+        input_tokens = [1000, 1, 0, 12345, 250.5, 7]
+        output_tokens = [500, 0, 999, 6789, 100, 3]
+
+        costs = calculate_costs(models, input_tokens, output_tokens)
+        expected = [calculate_cost(*call) for call in zip(models, input_tokens, output_tokens)]
+
+        assert costs.shape == (len(models),)
+        np.testing.assert_allclose(costs, expected, rtol=0, atol=1e-12)
+
+    def test_uses_fallback_pricing_without_cache(self, monkeypatch):
+        """With nothing cached every model falls back to the default rates."""
+        monkeypatch.setattr(cost_calculator, "_model_cost_cache", {})
+        costs = calculate_costs(["a", "b"], [1000, 2000], [1000, 0])
+
+        np.testing.assert_allclose(costs, [calculate_cost("a", 1000, 1000), calculate_cost("b", 2000, 0)])
+
+    def test_empty_batch(self, cached_pricing):
+        """An empty batch returns an empty array instead of failing."""
+        assert calculate_costs([], [], []).shape == (0,)
@@ -0,0 +1,146 @@
+"""Tests for coalescing of identical in-flight prompts in the LLM router."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_asyncio")
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.orchestrator.app.api import routes_llm
+from services.orchestrator.app.api.routes_llm import AgentRequestInternal, run_prompt_single_flight
+
+pytest_plugins = ["pytest_asyncio"]
+
+
+class FakeRun:
+    """Stands in for routes_llm._run_prompt; each call blocks until released."""
+
+    def __init__(self, result="answer", error=None):
+        self.result = result
+        self.error = error
+        self.calls = []
+        self.release = asyncio.Event()
+
+    async def __call__(self, agent, agent_request):
+        self.calls.append(agent_request)
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"{self.result}:{agent_request.session_id}"
+
+
+@pytest.fixture
+def fake_run(monkeypatch):
+    """Patch the agent call and make sure no in-flight entry leaks between tests."""
+    run = FakeRun()
+    monkeypatch.setattr(routes_llm, "_run_prompt", run)
+    monkeypatch.setattr(routes_llm, "_inflight", {})
+    return run
+
+
+async def wait_for_calls(run: FakeRun, count: int):
+    """Let the event loop run until the fake has been called `count` times."""
+    while len(run.calls) < count:
+        await asyncio.sleep(0)
+
+
+class TestSingleFlight:
+    """run_prompt_single_flight shares one agent call between identical prompts."""
+
+    @pytest.mark.asyncio
+    async def test_followers_share_leader_result(self, fake_run):
+        """Concurrent identical prompts in one session trigger a single agent call."""
+        request = AgentRequestInternal(query="hello", session_id="s1")
+        tasks = [asyncio.create_task(run_prompt_single_flight(None, request)) for _ in range(3)]
+        await wait_for_calls(fake_run, 1)
+        fake_run.release.set()
+
+        assert await asyncio.gather(*tasks) == ["answer:s1"] * 3
+        assert len(fake_run.calls) == 1
+        assert routes_llm._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_leader_failure_propagates_to_followers(self, fake_run):
+        """Followers see the leader's exception rather than hanging or retrying."""
+        fake_run.error = ValueError("upstream failed")
+        request = AgentRequestInternal(query="hello", session_id="s1")
+        leader = asyncio.create_task(run_prompt_single_flight(None, request))
+        await wait_for_calls(fake_run, 1)
+        follower = asyncio.create_task(run_prompt_single_flight(None, request))
+        await asyncio.sleep(0)
+        fake_run.release.set()
+
+        for task in (leader, follower):
+            with pytest.raises(ValueError, match="upstream failed"):
+                await task
+        assert len(fake_run.calls) == 1
+        assert routes_llm._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_follower_takes_over_cancelled_leader(self, fake_run):
+        """A cancelled leader doesn't fail its followers; one of them runs the prompt instead."""
+        request = AgentRequestInternal(query="hello", session_id="s1")
+        leader = asyncio.create_task(run_prompt_single_flight(None, request))
+        await wait_for_calls(fake_run, 1)
+        follower = asyncio.create_task(run_prompt_single_flight(None, request))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        await wait_for_calls(fake_run, 2)
+        fake_run.release.set()
+
+        assert await follower == "answer:s1"
+        assert routes_llm._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_cancelled_follower_leaves_leader_running(self, fake_run):
+        """Cancelling a follower cancels only that caller, not the shared call."""
+        request = AgentRequestInternal(query="hello", session_id="s1")
+        leader = asyncio.create_task(run_prompt_single_flight(None, request))
+        await wait_for_calls(fake_run, 1)
+        follower = asyncio.create_task(run_prompt_single_flight(None, request))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        fake_run.release.set()
+
+        assert await leader == "answer:s1"
+        assert len(fake_run.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_sessions_are_not_coalesced(self, fake_run):
+        """The same prompt in different sessions runs separately and keeps its own answer."""
+        tasks = [
+            asyncio.create_task(run_prompt_single_flight(None, AgentRequestInternal(query="hello", session_id=session)))
+            for session in ("s1", "s2")
+        ]
+        await wait_for_calls(fake_run, 2)
+        fake_run.release.set()
+
+        assert await asyncio.gather(*tasks) == ["answer:s1", "answer:s2"]
+        assert sorted(call.session_id for call in fake_run.calls) == ["s1", "s2"]
+
+    @pytest.mark.asyncio
+    async def test_model_and_cache_mode_are_part_of_the_key(self, fake_run):
+        """Prompts differing only in model or use_cache are not merged."""
+        requests = [
+            AgentRequestInternal(query="hello", session_id="s1"),
+            AgentRequestInternal(query="hello", session_id="s1", model="gpt-4"),
+            AgentRequestInternal(query="hello", session_id="s1", use_cache=False),
+        ]
+        tasks = [asyncio.create_task(run_prompt_single_flight(None, request)) for request in requests]
+        await wait_for_calls(fake_run, 3)
+        fake_run.release.set()
+
+        await asyncio.gather(*tasks)
+        assert len(fake_run.calls) == 3